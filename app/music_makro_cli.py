@@ -0,0 +1,506 @@
+"""
+Music-Makro - Linha de Comando
+Análise sem interface gráfica para bibliotecas inteiras
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+
+from config import settings
+
+# Registros acumulados antes de cada append no armazenamento colunar (batch --store)
+STORE_FLUSH_RECORDS = 256
+
+
+def selected_features(args):
+    """Features pedidas por --description-only, --features e --timeline (None = todas as seções)
+
+    A timeline (opcional na descrição) só entra com --timeline: ela não é
+    reaproveitada de uma análise completa em cache e desliga as impressões digitais.
+    """
+    features = None
+    if args.description_only:
+        from core.description_generator import DescriptionGenerator
+        features = list(DescriptionGenerator.REQUIRED_FEATURES)
+    elif args.features:
+        from core.audio_analyzer import parse_features
+        features = [name.strip() for name in args.features.split(",") if name.strip()]
+        parse_features(features)
+    if args.timeline and (features is None or "timeline" not in features):
+        from core.audio_analyzer import SECTIONS
+        features = (features or list(SECTIONS)) + ["timeline"]
+    return features
+
+
+def cmd_batch(args):
+    """Analisa diretórios ou listas de arquivos em um pool de processos"""
+    from core.batch import BatchRunner, find_audio_files
+    from core.feature_cache import default_cache_path
+
+    extensions = args.extensions.split(",") if args.extensions else None
+    files = find_audio_files(args.paths, extensions=extensions, file_list=args.file_list)
+    if not files:
+        print("Nenhum arquivo de áudio encontrado.", file=sys.stderr)
+        return 1
+
+    store, pending = None, []
+    if args.store:
+        from core.result_store import ResultStore
+        store = ResultStore(args.store)
+
+    def report(record, summary):
+        if store is not None:
+            pending.append(record)
+            if len(pending) >= STORE_FLUSH_RECORDS:
+                store.append(pending)
+                pending.clear()
+        processed = summary["ok"] + summary["error"] + summary["timeout"]
+        elapsed = record["timings"]["total"]
+        print(f"[{processed}/{summary['total']}] {record['status']:<7} {elapsed:>7.1f}s  {record['file']}",
+              file=sys.stderr)
+
+    try:
+        features = selected_features(args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    cache_path = None
+    if settings.CACHE_ENABLED and not args.no_cache:
+        cache_path = args.cache or default_cache_path()
+
+    pcm_cache_dir = None
+    if args.pcm_cache is not None or settings.PCM_CACHE_ENABLED:
+        from core.pcm_cache import default_pcm_cache_dir
+        pcm_cache_dir = args.pcm_cache or default_pcm_cache_dir()
+
+    runner = BatchRunner(workers=args.workers, timeout=args.timeout, cache_path=cache_path, mode=args.mode,
+                         features=features, prefetch=args.prefetch, pcm_cache_dir=pcm_cache_dir)
+    summary = runner.run(files, args.output, resume=not args.no_resume, on_record=report)
+    if store is not None:
+        store.append(pending)
+
+    print(f"\n✓ Concluído: {summary['ok']} ok, {summary['error']} erros, "
+          f"{summary['timeout']} timeouts, {summary['skipped']} já processados", file=sys.stderr)
+    if "pipeline" in summary:
+        stats = summary["pipeline"]
+        bottleneck = "decodificação" if stats["bottleneck"] == "decode" else "análise"
+        print(f"  Pré-carga (profundidade {stats['depth']}): decodificação {stats['decode']:.1f}s, "
+              f"análise {stats['analysis']:.1f}s, espera da análise {stats['wait']:.1f}s, "
+              f"ociosidade da pré-carga {stats['idle']:.1f}s — gargalo: {bottleneck}", file=sys.stderr)
+    return 0 if summary["error"] == 0 and summary["timeout"] == 0 else 2
+
+
+def cmd_cache(args):
+    """Consulta e mantém o cache de features"""
+    from core.feature_cache import FeatureCache
+    from core.pcm_cache import PCMCache, default_pcm_cache_dir
+
+    cache = FeatureCache(args.cache)
+    pcm_dir = args.pcm_cache or default_pcm_cache_dir()
+    pcm_cache = PCMCache(pcm_dir) if os.path.isdir(pcm_dir) else None
+    if args.action == "clear":
+        cache.clear()
+        if pcm_cache is not None:
+            pcm_cache.clear()
+        print("✓ Cache limpo")
+    elif args.action == "evict":
+        print(f"✓ {cache.evict()} entradas removidas")
+        if pcm_cache is not None:
+            print(f"✓ {pcm_cache.evict()} arquivos de áudio decodificado removidos")
+    elif args.action == "purge":
+        from core.batch import create_analyzer
+        removed = cache.purge({mode: create_analyzer(None, mode).params() for mode in ("full", "stream", "preview")})
+        print(f"✓ {removed} entradas com parâmetros antigos removidas")
+    else:
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups * 100 if lookups else 0.0
+        print(f"Arquivo:   {cache.path}")
+        print(f"Entradas:  {stats['entries']} ({stats['bytes'] / 1024 / 1024:.1f} MB)")
+        print(f"Acertos:   {stats['hits']} / {lookups} ({hit_rate:.1f}%)")
+        print(f"Impressões digitais: {stats['fingerprints']} faixas")
+        if pcm_cache is not None:
+            pcm = pcm_cache.stats()
+            print(f"Áudio decodificado: {pcm['entries']} arquivos ({pcm['bytes'] / 1024 / 1024:.1f} MB) em {pcm_dir}")
+    return 0
+
+
+def cmd_describe(args):
+    """Regenera as descrições de resultados JSONL a partir das features gravadas, sem reabrir o áudio"""
+    import json
+    from core.description_generator import DescriptionGenerator, describable, feature_table
+
+    records = []
+    for path in args.results:
+        with open(path, 'r', encoding='utf-8') as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+
+    rows = [i for i, record in enumerate(records)
+            if record.get("status") == "ok" and describable(record.get("features", {}))]
+    if rows:
+        table = feature_table(records[i]["features"] for i in rows)
+        for i, description in zip(rows, DescriptionGenerator(table=table).generate_all()):
+            records[i]["description"] = description
+
+    with open(args.output, 'w', encoding='utf-8') as out:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    print(f"✓ {len(rows)} descrições regeneradas em {args.output} "
+          f"({len(records) - len(rows)} registros sem as features necessárias mantidos)", file=sys.stderr)
+    return 0
+
+
+def cmd_export(args):
+    """Anexa resultados JSONL ao armazenamento colunar"""
+    from core.result_store import ResultStore
+
+    store = ResultStore(args.store or settings.RESULT_STORE)
+    added = store.import_jsonl(args.results, skip_existing=not args.keep_duplicates)
+    print(f"✓ {added} registros anexados a {store.path} ({len(store)} no total, "
+          f"{len(store.columns)} colunas)", file=sys.stderr)
+    return 0
+
+
+def cmd_index(args):
+    """Monta o índice de similaridade a partir de resultados do modo batch"""
+    from core.similarity import SimilarityIndex
+
+    approximate = {"auto": None, "exact": False, "ivf": True}[args.search]
+    index, skipped = SimilarityIndex.from_results(args.results, approximate=approximate)
+    if not len(index):
+        print("Nenhuma faixa com os vetores de similaridade nos resultados "
+              "(reanalise com a versão atual).", file=sys.stderr)
+        return 1
+
+    output = args.index or settings.SIMILARITY_INDEX
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    index.save(output)
+    mode = "aproximado (IVF)" if index.centroids is not None else "exato"
+    print(f"✓ {len(index)} faixas indexadas em {output} (busca {mode}, {skipped} ignoradas)")
+    return 0
+
+
+def cmd_similar(args):
+    """Lista as faixas mais parecidas com uma faixa do índice ou um arquivo novo"""
+    import json
+    from core.similarity import SimilarityIndex, VECTOR_FEATURES, track_vector
+
+    index = SimilarityIndex.load(args.index or settings.SIMILARITY_INDEX)
+    if args.track in index.ids:
+        vector = index.vector_of(args.track)
+    elif os.path.isfile(args.track):
+        from core.audio_analyzer import AudioAnalyzer
+        from core.feature_cache import FeatureCache
+
+        cache = FeatureCache(args.cache) if settings.CACHE_ENABLED and not args.no_cache else None
+        vector = track_vector(AudioAnalyzer(args.track, cache=cache).analyze(VECTOR_FEATURES))
+    else:
+        print(f"Faixa não encontrada no índice nem no disco: {args.track}", file=sys.stderr)
+        return 1
+
+    results = index.search(vector, n=args.count, n_probe=args.n_probe, exclude=[args.track])[0]
+    if args.json:
+        print(json.dumps([{"file": f, "similarity": round(s, 4)} for f, s in results], ensure_ascii=False, indent=2))
+    else:
+        for rank, (track, similarity) in enumerate(results, 1):
+            print(f"{rank:>3}. {similarity:6.3f}  {track}")
+    return 0
+
+
+def cmd_watch(args):
+    """Monitora pastas e mantém o índice da biblioteca em dia"""
+    import json
+    from core.feature_cache import default_cache_path
+    from core.watcher import WATCHDOG_AVAILABLE, FolderWatcher, LibraryIndex, lower_priority
+
+    try:
+        features = selected_features(args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    cache_path = None
+    if settings.CACHE_ENABLED and not args.no_cache:
+        cache_path = args.cache or default_cache_path()
+
+    output = open(args.output, 'a', encoding='utf-8') if args.output else None
+
+    def report(record):
+        print(f"{record['status']:<7} {record['timings']['total']:>7.1f}s  {record['file']}", file=sys.stderr)
+        if output is not None:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+    def cycle(scanned, processed):
+        print(f"· {scanned['new']} novos, {scanned['changed']} alterados, {processed['removed']} removidos; "
+              f"{processed['analyzed']} analisados, {processed['reused']} reaproveitados, "
+              f"{processed['touched']} só tocados, {processed['pending']} aguardando", file=sys.stderr)
+
+    lower_priority(args.nice)
+    index = LibraryIndex(args.index)
+    watcher = FolderWatcher(args.paths, index=index, interval=args.interval, settle=args.settle,
+                            batch_size=args.batch, workers=args.workers, timeout=args.timeout,
+                            cache_path=cache_path, mode=args.mode, features=features,
+                            extensions=args.extensions.split(",") if args.extensions else None,
+                            on_record=report)
+    if not args.once:
+        source = "eventos do sistema de arquivos" if WATCHDOG_AVAILABLE else f"varredura a cada {watcher.interval:g}s"
+        print(f"Monitorando {len(watcher.roots)} pasta(s) ({source}); Ctrl+C para sair", file=sys.stderr)
+    try:
+        watcher.run(once=args.once, on_cycle=cycle)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if output is not None:
+            output.close()
+
+    stats = index.stats()
+    print(f"\n✓ Índice: {stats['files']} arquivos ({stats.get('ok', 0)} ok) em {index.path}", file=sys.stderr)
+    return 0
+
+
+def cmd_live(args):
+    """Analisa áudio ao vivo e emite features e descrições a cada intervalo"""
+    import json
+    import wave
+    from core.live_analyzer import DeviceInput, LiveAnalyzer, RawInput, WavInput
+
+    if args.device is not None:
+        device = int(args.device) if args.device.isdigit() else (args.device or None)
+        source = DeviceInput(device, sr=args.sr, channels=args.channels)
+    else:
+        if args.raw and not args.sr:
+            print("--raw requer --sr (taxa de amostragem do PCM)", file=sys.stderr)
+            return 1
+        stream = sys.stdin.buffer if args.input == "-" else open(args.input, 'rb')
+        try:
+            source = RawInput(stream, args.sr, args.channels) if args.raw else WavInput(stream)
+        except (EOFError, wave.Error) as e:
+            print(f"Entrada WAV inválida: {e}", file=sys.stderr)
+            return 1
+
+    analyzer = LiveAnalyzer(source.sr, window=args.window, interval=args.interval, bitrate=source.bitrate,
+                            genre=args.genre)
+
+    def emit(update):
+        if args.json:
+            print(json.dumps(update, ensure_ascii=False), flush=True)
+            return
+        features = update["features"]
+        print(f"\n[{update['time']:.1f}s] {features['rhythmic']['tempo_bpm']:.1f} BPM · "
+              f"loudness {features['energy']['loudness_mean']:.1f} dB · "
+              f"harmônico {features['harmonic']['harmonic_ratio']:.2f} · "
+              f"atualização em {update['latency'] * 1000:.0f} ms")
+        print(update["description"], flush=True)
+
+    print(f"Ao vivo: {source.sr} Hz, janela de {analyzer.window:g}s, atualização a cada {analyzer.interval:g}s "
+          f"de áudio; Ctrl+C para sair", file=sys.stderr)
+    emitted = 0
+    try:
+        for block in source.blocks(max(1, int(source.sr * settings.LIVE_BLOCK))):
+            update = analyzer.feed(block)
+            if update is not None:
+                emit(update)
+                emitted = analyzer.samples
+    except KeyboardInterrupt:
+        pass
+    # Fim da entrada: descreve o trecho desde a última atualização
+    if analyzer.samples > emitted and analyzer.samples >= 2048:
+        emit(analyzer.update())
+    return 0
+
+
+def cmd_feed(args):
+    """Escreve um arquivo como WAV em stdout no ritmo de reprodução (entrada de teste do comando live)"""
+    from core.live_analyzer import feed_wav
+
+    if sys.stdout.isatty():
+        print("Redirecione a saída (ex.: feed faixa.mp3 | music_makro_cli.py live)", file=sys.stderr)
+        return 1
+    try:
+        feed_wav(args.file, speed=args.speed)
+    except BrokenPipeError:
+        # O leitor encerrou (ex.: Ctrl+C no live): não é um erro do feed
+        sys.stderr.close()
+    return 0
+
+
+def cmd_serve(args):
+    """Serviço HTTP local com workers aquecidos"""
+    from core.feature_cache import default_cache_path
+    from core.service import serve
+
+    cache_path = None
+    if settings.CACHE_ENABLED and not args.no_cache:
+        cache_path = args.cache or default_cache_path()
+
+    serve(host=args.host, port=args.port, workers=args.workers, queue_size=args.queue,
+          timeout=args.timeout, cache_path=cache_path, analysis_workers=args.analysis_workers)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="music_makro_cli",
+        description=f"{settings.APP_NAME} v{settings.APP_VERSION} - análise de áudio sem interface gráfica"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("batch", help="Analisa uma biblioteca inteira e grava JSONL")
+    batch.add_argument("paths", nargs="*", help="Arquivos ou diretórios a analisar")
+    batch.add_argument("--file-list", help="Arquivo texto com um caminho por linha")
+    batch.add_argument("-o", "--output", default="music_makro_results.jsonl",
+                       help="Arquivo JSONL de resultados (também serve de checkpoint)")
+    batch.add_argument("-w", "--workers", type=int, default=None,
+                       help="Número de processos (padrão: um por núcleo)")
+    batch.add_argument("-t", "--timeout", type=float, default=None,
+                       help=f"Tempo limite por arquivo em segundos (padrão: {settings.BATCH_TIMEOUT:g})")
+    batch.add_argument("--extensions", help="Extensões aceitas, separadas por vírgula")
+    batch.add_argument("--mode", choices=["full", "stream", "preview"], default="full",
+                       help="stream: blocos com memória constante (gravações longas); "
+                            "preview: trechos em taxa reduzida para triagem")
+    selection = batch.add_mutually_exclusive_group()
+    selection.add_argument("--description-only", action="store_true",
+                           help="Calcula apenas as features usadas pela descrição textual")
+    selection.add_argument("--features",
+                           help="Features a calcular, separadas por vírgula (ex.: rhythmic.tempo_bpm,spectral)")
+    batch.add_argument("--timeline", action="store_true",
+                       help="Inclui a evolução das features ao longo da faixa e as seções detectadas "
+                            "(modos full e stream)")
+    batch.add_argument("--prefetch", type=int, default=None,
+                       help="Arquivos lidos e decodificados à frente por processo (0 desativa; "
+                            f"padrão: {settings.PREFETCH_DEPTH})")
+    batch.add_argument("--no-resume", action="store_true",
+                       help="Ignora resultados existentes e reescreve o arquivo de saída")
+    batch.add_argument("--store", help="Também anexa os resultados a um armazenamento colunar (diretório)")
+    batch.add_argument("--cache", help="Arquivo SQLite do cache de features")
+    batch.add_argument("--no-cache", action="store_true", help="Não consulta nem grava o cache de features")
+    batch.add_argument("--pcm-cache", nargs="?", const="", metavar="DIR",
+                       help="Guarda o áudio decodificado (float32) e o reaproveita por memory-map nas próximas "
+                            "análises, ex.: ao variar parâmetros (modo full; diretório opcional)")
+    batch.set_defaults(func=cmd_batch)
+
+    describe = subparsers.add_parser("describe",
+                                     help="Regenera as descrições de resultados JSONL (após mudar as regras)")
+    describe.add_argument("results", nargs="+", help="Arquivos JSONL gerados pelo comando batch")
+    describe.add_argument("-o", "--output", required=True, help="Arquivo JSONL de saída")
+    describe.set_defaults(func=cmd_describe)
+
+    export = subparsers.add_parser("export", help="Anexa resultados JSONL ao armazenamento colunar")
+    export.add_argument("results", nargs="+", help="Arquivos JSONL gerados pelo comando batch")
+    export.add_argument("--store", help=f"Diretório do armazenamento (padrão: {settings.RESULT_STORE})")
+    export.add_argument("--keep-duplicates", action="store_true",
+                        help="Anexa também arquivos que já estão no armazenamento")
+    export.set_defaults(func=cmd_export)
+
+    index = subparsers.add_parser("index", help="Monta o índice de similaridade a partir de resultados JSONL")
+    index.add_argument("results", nargs="+", help="Arquivos JSONL gerados pelo comando batch")
+    index.add_argument("--index", help=f"Arquivo do índice (padrão: {settings.SIMILARITY_INDEX})")
+    index.add_argument("--search", choices=["auto", "exact", "ivf"], default="auto",
+                       help="exact: compara com todas as faixas; ivf: aproximado, para bibliotecas grandes "
+                            "(auto escolhe pelo tamanho)")
+    index.set_defaults(func=cmd_index)
+
+    similar = subparsers.add_parser("similar", help="Faixas mais parecidas com uma faixa de referência")
+    similar.add_argument("track", help="Caminho de uma faixa do índice ou de um arquivo de áudio novo")
+    similar.add_argument("-n", "--count", type=int, default=10, help="Quantidade de resultados")
+    similar.add_argument("--index", help=f"Arquivo do índice (padrão: {settings.SIMILARITY_INDEX})")
+    similar.add_argument("--n-probe", type=int, default=8,
+                         help="Listas do IVF visitadas por consulta (mais = mais preciso)")
+    similar.add_argument("--json", action="store_true", help="Saída em JSON")
+    similar.add_argument("--cache", help="Arquivo SQLite do cache de features")
+    similar.add_argument("--no-cache", action="store_true", help="Não consulta nem grava o cache de features")
+    similar.set_defaults(func=cmd_similar)
+
+    watch = subparsers.add_parser("watch", help="Monitora pastas e analisa só arquivos novos ou alterados")
+    watch.add_argument("paths", nargs="+", help="Diretórios a monitorar")
+    watch.add_argument("--index", help=f"Arquivo SQLite do índice da biblioteca (padrão: {settings.WATCH_INDEX})")
+    watch.add_argument("-o", "--output", help="Também anexa cada registro analisado a um arquivo JSONL")
+    watch.add_argument("--once", action="store_true",
+                       help="Faz uma varredura, analisa o que mudou e sai (ex.: agendado pelo cron)")
+    watch.add_argument("--interval", type=float, default=None,
+                       help=f"Segundos entre varreduras (padrão: {settings.WATCH_INTERVAL:g})")
+    watch.add_argument("--settle", type=float, default=None,
+                       help=f"Segundos sem mudança antes de analisar um arquivo (padrão: {settings.WATCH_SETTLE:g})")
+    watch.add_argument("--batch", type=int, default=None,
+                       help=f"Arquivos analisados por ciclo (padrão: {settings.WATCH_BATCH})")
+    watch.add_argument("-w", "--workers", type=int, default=None,
+                       help=f"Processos de análise (padrão: {settings.WATCH_WORKERS})")
+    watch.add_argument("--nice", type=int, default=None,
+                       help=f"Redução de prioridade do processo (padrão: {settings.WATCH_NICE})")
+    watch.add_argument("-t", "--timeout", type=float, default=None,
+                       help=f"Tempo limite por arquivo em segundos (padrão: {settings.BATCH_TIMEOUT:g})")
+    watch.add_argument("--extensions", help="Extensões aceitas, separadas por vírgula")
+    watch.add_argument("--mode", choices=["full", "stream", "preview"], default="full",
+                       help="Modo de análise (ver o comando batch)")
+    watch_selection = watch.add_mutually_exclusive_group()
+    watch_selection.add_argument("--description-only", action="store_true",
+                                 help="Calcula apenas as features usadas pela descrição textual")
+    watch_selection.add_argument("--features", help="Features a calcular, separadas por vírgula")
+    watch.add_argument("--timeline", action="store_true",
+                       help="Inclui a evolução das features ao longo da faixa e as seções detectadas")
+    watch.add_argument("--cache", help="Arquivo SQLite do cache de features")
+    watch.add_argument("--no-cache", action="store_true", help="Não consulta nem grava o cache de features")
+    watch.set_defaults(func=cmd_watch)
+
+    live = subparsers.add_parser("live", help="Analisa áudio ao vivo (stdin, pipe WAV ou dispositivo) "
+                                              "e emite descrições periódicas")
+    live.add_argument("input", nargs="?", default="-",
+                      help="WAV PCM ou PCM cru: arquivo, FIFO ou - para stdin (padrão)")
+    live.add_argument("--raw", action="store_true", help="Entrada em PCM cru s16le intercalado (requer --sr)")
+    live.add_argument("--device", nargs="?", const="",
+                      help="Captura de um dispositivo de som (índice ou nome; vazio = padrão; requer sounddevice)")
+    live.add_argument("--sr", type=int, default=None, help="Taxa de amostragem (PCM cru ou dispositivo)")
+    live.add_argument("--channels", type=int, default=1, help="Canais (PCM cru ou dispositivo)")
+    live.add_argument("--window", type=float, default=None,
+                      help=f"Segundos de áudio considerados em cada atualização (padrão: {settings.LIVE_WINDOW:g})")
+    live.add_argument("--interval", type=float, default=None,
+                      help=f"Segundos de áudio entre atualizações (padrão: {settings.LIVE_INTERVAL:g})")
+    live.add_argument("--genre", default='Unknown', help="Gênero informado à descrição (não há tags ao vivo)")
+    live.add_argument("--json", action="store_true", help="Uma atualização por linha em JSON")
+    live.set_defaults(func=cmd_live)
+
+    feed = subparsers.add_parser("feed", help="Reproduz um arquivo como WAV em stdout no ritmo real "
+                                              "(para testar o comando live)")
+    feed.add_argument("file", help="Arquivo de áudio")
+    feed.add_argument("--speed", type=float, default=1.0,
+                      help="Velocidade em relação ao tempo real (0 = sem pausas; padrão: 1)")
+    feed.set_defaults(func=cmd_feed)
+
+    serve = subparsers.add_parser("serve", help="Serviço HTTP local de análise (POST /analyze, GET /status)")
+    serve.add_argument("--host", default=None, help=f"Endereço (padrão: {settings.SERVICE_HOST})")
+    serve.add_argument("--port", type=int, default=None, help=f"Porta (padrão: {settings.SERVICE_PORT})")
+    serve.add_argument("-w", "--workers", type=int, default=None,
+                       help="Processos aquecidos (padrão: um por núcleo)")
+    serve.add_argument("--analysis-workers", type=int, default=None,
+                       help=f"Processos de cada worker para os extratores de uma faixa "
+                            f"(padrão: {settings.ANALYSIS_WORKERS})")
+    serve.add_argument("--queue", type=int, default=None,
+                       help=f"Pedidos aguardando na fila antes de responder 503 (padrão: {settings.SERVICE_QUEUE_SIZE})")
+    serve.add_argument("-t", "--timeout", type=float, default=None,
+                       help=f"Tempo limite por pedido em segundos (padrão: {settings.SERVICE_TIMEOUT:g})")
+    serve.add_argument("--cache", help="Arquivo SQLite do cache de features")
+    serve.add_argument("--no-cache", action="store_true", help="Não consulta nem grava o cache de features")
+    serve.set_defaults(func=cmd_serve)
+
+    cache = subparsers.add_parser("cache", help="Estatísticas e manutenção do cache de features")
+    cache.add_argument("action", nargs="?", default="stats", choices=["stats", "evict", "purge", "clear"])
+    cache.add_argument("--cache", help="Arquivo SQLite do cache de features")
+    cache.add_argument("--pcm-cache", metavar="DIR", help="Diretório do cache de áudio decodificado")
+    cache.set_defaults(func=cmd_cache)
+
+    return parser
+
+
+def main(argv=None):
+    """Função principal"""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
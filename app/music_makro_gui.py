@@ -9,20 +9,70 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import json
 import tkinter as tk
 from tkinter import filedialog, scrolledtext, messagebox, ttk
-import threading
 
-from core.audio_analyzer import AudioAnalyzer
+# Só módulos leves no import: a análise roda em processos (core.analysis_queue)
+# que importam o librosa e aquecem os kernels numba enquanto a janela abre
+from core.analysis_queue import AnalysisQueue, FINISHED, default_workers
+from core.batch import find_audio_files
+from core.feature_cache import default_cache_path
+from core import startup
 from config import settings
 
+try:
+    # Opcional: arrastar arquivos e pastas para a fila
+    from tkinterdnd2 import DND_FILES, TkinterDnD
+    DND_AVAILABLE = True
+except ImportError:
+    DND_AVAILABLE = False
+
+# Rótulos das etapas da análise exibidos no progresso
+STAGE_LABELS = {
+    "cache": "Consultando cache",
+    "load": "Carregando áudio",
+    "fingerprint": "Comparando impressão digital",
+    "metadata": "Lendo metadados",
+    "temporal": "Análise temporal",
+    "spectral": "Análise espectral",
+    "rhythmic": "Análise rítmica",
+    "harmonic": "Análise harmônica",
+    "energy": "Energia e dinâmica",
+    "blocks": "Analisando em blocos",
+    "timeline": "Linha do tempo e seções",
+    "description": "Gerando descrição para Ace Step 1.5"
+}
+
+# Estados dos jobs na tabela (em andamento, a coluna mostra a etapa atual)
+STATUS_LABELS = {
+    "queued": "Na fila",
+    "ok": "✓ Concluída",
+    "error": "✗ Erro",
+    "timeout": "✗ Tempo esgotado",
+    "cancelled": "Cancelada"
+}
+
+# Features pedidas aos workers: todas as seções e a timeline (ALL_FEATURES de
+# core.audio_analyzer, repetido aqui para a interface não importar o librosa)
+ANALYSIS_FEATURES = ["metadata", "temporal", "spectral", "rhythmic", "harmonic", "energy", "timeline"]
+
+# Intervalo de atualização da tabela da fila (ms)
+POLL_INTERVAL_MS = 200
+
 class MusicMakroGUI:
     def __init__(self, root):
         self.root = root
         self.root.title(f"{settings.APP_NAME} v{settings.APP_VERSION}")
-        self.root.geometry("1100x750")
+        self.root.geometry("1100x850")
         
         self.file_path = tk.StringVar()
-        self.analyzing = False
+        self.preview_mode = tk.BooleanVar(value=False)
+        self.workers = tk.IntVar(value=default_workers())
+        self.stage_times = {}
+        self.shown = None
+        cache_path = default_cache_path() if settings.CACHE_ENABLED else None
+        self.queue = AnalysisQueue(workers=self.workers.get(), cache_path=cache_path)
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.quit)
+        self.root.after(POLL_INTERVAL_MS, self.poll_jobs)
         
     def setup_ui(self):
         """Configura interface gráfica"""
@@ -45,17 +95,17 @@ class MusicMakroGUI:
         
         tk.Label(
             top_frame, 
-            text="Arquivo MP3:", 
+            text="Arquivo ou pasta:", 
             font=("Arial", 11, "bold"),
             bg="#ECF0F1"
         ).pack(side=tk.LEFT)
         
-        entry = tk.Entry(top_frame, textvariable=self.file_path, width=65, font=("Arial", 10))
+        entry = tk.Entry(top_frame, textvariable=self.file_path, width=45, font=("Arial", 10))
         entry.pack(side=tk.LEFT, padx=10)
         
         tk.Button(
             top_frame, 
-            text="📁 Selecionar", 
+            text="📁 Arquivos", 
             command=self.select_file,
             bg="#3498DB",
             fg="white",
@@ -64,6 +114,17 @@ class MusicMakroGUI:
             relief=tk.FLAT
         ).pack(side=tk.LEFT, padx=3)
         
+        tk.Button(
+            top_frame, 
+            text="📂 Pasta", 
+            command=self.select_folder,
+            bg="#2980B9",
+            fg="white",
+            font=("Arial", 10, "bold"),
+            padx=15,
+            relief=tk.FLAT
+        ).pack(side=tk.LEFT, padx=3)
+        
         tk.Button(
             top_frame, 
             text="▶ Analisar", 
@@ -75,6 +136,30 @@ class MusicMakroGUI:
             relief=tk.FLAT
         ).pack(side=tk.LEFT, padx=3)
         
+        tk.Checkbutton(
+            top_frame,
+            text="Prévia rápida",
+            variable=self.preview_mode,
+            font=("Arial", 9),
+            bg="#ECF0F1"
+        ).pack(side=tk.LEFT, padx=8)
+        
+        tk.Label(
+            top_frame,
+            text="Processos:",
+            font=("Arial", 9),
+            bg="#ECF0F1"
+        ).pack(side=tk.LEFT)
+        
+        tk.Spinbox(
+            top_frame,
+            from_=1,
+            to=os.cpu_count() or 1,
+            width=3,
+            textvariable=self.workers,
+            command=self.set_workers
+        ).pack(side=tk.LEFT, padx=3)
+        
         # Frame de progresso
         self.progress_frame = tk.Frame(self.root, padx=15, bg="#ECF0F1")
         self.progress_frame.pack(fill=tk.X)
@@ -87,7 +172,61 @@ class MusicMakroGUI:
         )
         self.progress_label.pack()
         
-        self.progress_bar = ttk.Progressbar(self.progress_frame, mode='indeterminate')
+        self.progress_bar = ttk.Progressbar(self.progress_frame, mode='determinate', maximum=100)
+        
+        self.cancel_button = tk.Button(
+            self.progress_frame,
+            text="⏹ Cancelar",
+            command=self.cancel_analysis,
+            bg="#E67E22",
+            fg="white",
+            font=("Arial", 9, "bold"),
+            padx=10,
+            relief=tk.FLAT
+        )
+        
+        self.timing_label = tk.Label(
+            self.progress_frame,
+            text="",
+            font=("Consolas", 8),
+            fg="#555555",
+            bg="#ECF0F1"
+        )
+        self.timing_label.pack()
+        
+        # Fila de análises: uma linha por arquivo
+        queue_frame = tk.LabelFrame(
+            self.root,
+            text="🎼 Fila de Análise",
+            padx=15,
+            pady=10,
+            font=("Arial", 10, "bold")
+        )
+        queue_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=(5, 10))
+        
+        self.jobs_table = ttk.Treeview(
+            queue_frame,
+            columns=("status", "bpm", "genre", "elapsed"),
+            height=7,
+            selectmode="extended"
+        )
+        for column, heading, width, anchor in (
+            ("#0", "Arquivo", 330, tk.W),
+            ("status", "Status", 200, tk.W),
+            ("bpm", "BPM", 60, tk.E),
+            ("genre", "Gênero", 330, tk.W),
+            ("elapsed", "Tempo", 80, tk.E)
+        ):
+            self.jobs_table.heading(column, text=heading, anchor=anchor)
+            self.jobs_table.column(column, width=width, anchor=anchor, stretch=column in ("#0", "genre"))
+        scrollbar = ttk.Scrollbar(queue_frame, orient=tk.VERTICAL, command=self.jobs_table.yview)
+        self.jobs_table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.jobs_table.pack(fill=tk.BOTH, expand=True)
+        self.jobs_table.bind("<<TreeviewSelect>>", self.on_select)
+        if DND_AVAILABLE:
+            self.jobs_table.drop_target_register(DND_FILES)
+            self.jobs_table.dnd_bind("<<Drop>>", self.on_drop)
         
         # Frame central - Análise técnica
         middle_frame = tk.LabelFrame(
@@ -101,7 +240,7 @@ class MusicMakroGUI:
         
         self.technical_text = scrolledtext.ScrolledText(
             middle_frame, 
-            height=10, 
+            height=8, 
             font=("Consolas", 9),
             bg="#FAFAFA"
         )
@@ -119,7 +258,7 @@ class MusicMakroGUI:
         
         self.description_text = scrolledtext.ScrolledText(
             bottom_frame, 
-            height=12, 
+            height=6, 
             font=("Arial", 10), 
             wrap=tk.WORD,
             bg="#FAFAFA"
@@ -166,7 +305,7 @@ class MusicMakroGUI:
         tk.Button(
             button_frame, 
             text="❌ Sair", 
-            command=self.root.quit,
+            command=self.quit,
             bg="#E74C3C",
             fg="white",
             font=("Arial", 9, "bold"),
@@ -175,70 +314,177 @@ class MusicMakroGUI:
         ).pack(side=tk.RIGHT, padx=5)
         
     def select_file(self):
-        """Abre diálogo para selecionar arquivo MP3"""
-        filename = filedialog.askopenfilename(
-            title="Selecionar arquivo MP3",
-            filetypes=[("MP3 files", "*.mp3"), ("All files", "*.*")]
+        """Abre diálogo para selecionar arquivos de áudio e os coloca na fila"""
+        patterns = " ".join(f"*{ext}" for ext in settings.AUDIO_EXTENSIONS)
+        filenames = filedialog.askopenfilenames(
+            title="Selecionar arquivos de áudio",
+            filetypes=[("Arquivos de áudio", patterns), ("All files", "*.*")]
         )
-        if filename:
-            self.file_path.set(filename)
-    
+        if filenames:
+            self.enqueue(filenames)
+        
+    def select_folder(self):
+        """Coloca na fila todos os arquivos de áudio de uma pasta (e subpastas)"""
+        folder = filedialog.askdirectory(title="Selecionar pasta")
+        if folder:
+            self.file_path.set(folder)
+            self.enqueue([folder])
+        
+    def on_drop(self, event):
+        """Arquivos e pastas arrastados para a tabela"""
+        self.enqueue(self.root.tk.splitlist(event.data))
+        
     def analyze_file(self):
-        """Inicia análise do arquivo em thread separada"""
+        """Coloca na fila o arquivo ou a pasta digitados"""
         if not self.file_path.get():
-            messagebox.showwarning("Aviso", "Selecione um arquivo MP3 primeiro")
+            messagebox.showwarning("Aviso", "Selecione um arquivo de áudio primeiro")
             return
         
         if not os.path.exists(self.file_path.get()):
             messagebox.showerror("Erro", "Arquivo não encontrado")
             return
         
-        if self.analyzing:
+        self.enqueue([self.file_path.get()])
+        
+    def enqueue(self, paths):
+        """Adiciona arquivos (pastas são expandidas) à fila e à tabela"""
+        files = find_audio_files(paths)
+        if not files:
+            messagebox.showwarning("Aviso", "Nenhum arquivo de áudio encontrado")
             return
         
-        self.analyzing = True
-        self.progress_label.config(text="Analisando arquivo...")
-        self.progress_bar.pack(fill=tk.X, pady=5)
-        self.progress_bar.start(10)
+        mode = "preview" if self.preview_mode.get() else "full"
+        for path in files:
+            # Com a timeline, a descrição da estrutura vem das seções reais da faixa
+            job = self.queue.submit(path, mode, ANALYSIS_FEATURES)
+            self.jobs_table.insert("", tk.END, iid=str(job.id), text=os.path.basename(path),
+                                   values=self.row_values(job))
+        self.update_overall()
         
-        thread = threading.Thread(target=self.run_analysis, daemon=True)
-        thread.start()
-    
-    def run_analysis(self):
-        """Executa análise completa do arquivo"""
+    def set_workers(self):
+        """Ajusta o número de processos de análise"""
         try:
-            analyzer = AudioAnalyzer(self.file_path.get())
-            
-            self.root.after(0, self.progress_label.config, {"text": "Extraindo features de áudio..."})
-            technical_data = analyzer.analyze()
-            
-            self.root.after(0, self.progress_label.config, {"text": "Gerando descrição para Ace Step 1.5..."})
-            description = analyzer.generate_description(technical_data)
-            
-            self.root.after(0, self.update_results, technical_data, description)
-            
-        except Exception as e:
-            self.root.after(
-                0, 
-                messagebox.showerror, 
-                "Erro", 
-                f"Erro na análise:\n{str(e)}\n\nVerifique se o FFmpeg está instalado."
+            self.queue.resize(self.workers.get())
+        except tk.TclError:
+            # Valor digitado inválido: mantém o atual
+            self.workers.set(self.queue.workers)
+        
+    def row_values(self, job) -> tuple:
+        """Valores das colunas status, BPM, gênero e tempo de um job"""
+        if job.status == "running":
+            status = f"{STAGE_LABELS.get(job.stage, 'Iniciando')}..."
+        else:
+            status = STATUS_LABELS[job.status]
+        
+        bpm = genre = ""
+        if job.status == "ok":
+            tempo = job.record["features"].get("rhythmic", {}).get("tempo_bpm")
+            bpm = f"{tempo:.0f}" if tempo is not None else ""
+            # Primeira linha da descrição: "Gênero / Estilo: ..."
+            genre = (job.record.get("description") or "").split("\n")[0].split(":")[0]
+        elif job.record is not None:
+            genre = job.record.get("error", "")
+        
+        elapsed = f"{job.elapsed:.1f}s" if job.started is not None else ""
+        return status, bpm, genre, elapsed
+        
+    def poll_jobs(self):
+        """Atualiza só as linhas que mudaram (chamado pelo Tk a cada POLL_INTERVAL_MS)"""
+        selected = self.selected_jobs()
+        for job in self.queue.changes():
+            item = str(job.id)
+            if self.jobs_table.exists(item):
+                self.jobs_table.item(item, values=self.row_values(job))
+            if selected[:1] == [job.id]:
+                if job.done:
+                    self.show_job(job)
+                elif job.status == "running":
+                    self.show_stage_times(job)
+        self.update_overall()
+        self.root.after(POLL_INTERVAL_MS, self.poll_jobs)
+        
+    def update_overall(self):
+        """Progresso geral da fila"""
+        counts = self.queue.counts()
+        total = sum(counts.values())
+        finished = sum(counts.get(status, 0) for status in FINISHED)
+        if finished < total:
+            self.progress_label.config(
+                text=f"Analisando: {finished}/{total} concluídas · {counts.get('running', 0)} em andamento"
             )
-        finally:
-            self.analyzing = False
-            self.root.after(0, self.progress_bar.stop)
-            self.root.after(0, self.progress_bar.pack_forget)
-            self.root.after(0, self.progress_label.config, {"text": ""})
-    
-    def update_results(self, technical_data, description):
-        """Atualiza interface com resultados"""
-        self.technical_text.delete(1.0, tk.END)
-        tech_str = json.dumps(technical_data, indent=2, ensure_ascii=False)
-        self.technical_text.insert(1.0, tech_str)
+            # Jobs em andamento entram com a fração das etapas já concluídas
+            self.progress_bar.config(value=self.queue.progress() * 100)
+            if not self.progress_bar.winfo_ismapped():
+                self.progress_bar.pack(fill=tk.X, pady=5, before=self.timing_label)
+                self.cancel_button.pack(pady=(0, 5), before=self.timing_label)
+        else:
+            failed = finished - counts.get("ok", 0) - counts.get("cancelled", 0)
+            self.progress_label.config(
+                text=f"{counts.get('ok', 0)} concluídas, {failed} com erro" if total else ""
+            )
+            if self.progress_bar.winfo_ismapped():
+                self.progress_bar.pack_forget()
+                self.cancel_button.pack_forget()
+        
+    def selected_jobs(self) -> list:
+        return [int(item) for item in self.jobs_table.selection()]
+        
+    def on_select(self, event=None):
+        """Mostra nos painéis o resultado da linha selecionada"""
+        selected = self.selected_jobs()
+        if selected:
+            self.show_job(self.queue.job(selected[0]))
         
+    def show_job(self, job):
+        """Preenche os painéis com o JSON e a descrição de um job (só quando muda)"""
+        if self.shown == (job.id, job.status):
+            return
+        self.shown = (job.id, job.status)
+        
+        self.technical_text.delete(1.0, tk.END)
         self.description_text.delete(1.0, tk.END)
-        self.description_text.insert(1.0, description)
-    
+        self.stage_times = {}
+        if job.status == "ok":
+            tech_str = json.dumps(job.record["features"], indent=2, ensure_ascii=False)
+            self.technical_text.insert(1.0, tech_str)
+            self.description_text.insert(1.0, job.record.get("description") or "")
+            self.stage_times = job.record.get("timings", {}).get("stages", {})
+        elif job.record is not None:
+            self.technical_text.insert(
+                1.0, f"Erro na análise:\n{job.record.get('error', '')}\n\nVerifique se o FFmpeg está instalado."
+            )
+        elif job.status == "running":
+            self.show_stage_times(job)
+            return
+        self.timing_label.config(text=self.format_timings())
+        
+    def show_stage_times(self, job):
+        """Tempos por etapa de um job em andamento, com a etapa atual ainda contando"""
+        self.stage_times = job.stage_times
+        self.timing_label.config(text=self.format_timings(current=job.stage))
+        
+    def format_timings(self, current: str = None) -> str:
+        """Resumo "etapa tempo" das etapas, com a mais lenta destacada e a atual (current) marcada com …"""
+        if not self.stage_times:
+            return ""
+        slowest = max(self.stage_times, key=self.stage_times.get)
+        parts = [
+            f"{'▶ ' if stage == slowest else ''}{stage} {seconds:.2f}s{'…' if stage == current else ''}"
+            for stage, seconds in self.stage_times.items()
+        ]
+        total = sum(self.stage_times.values())
+        return "  ·  ".join(parts) + f"  |  total {total:.2f}s"
+        
+    def cancel_analysis(self):
+        """Cancela as linhas selecionadas ainda não concluídas, ou a fila inteira
+        
+        O job sai da lista na hora; a análise em andamento para na próxima
+        verificação do CancellationToken, ou tem o processo encerrado se não
+        parar em GUI_CANCEL_GRACE segundos.
+        """
+        pending = [job_id for job_id in self.selected_jobs() if not self.queue.job(job_id).done]
+        self.queue.cancel(pending or None)
+        
     def copy_description(self):
         """Copia descrição para clipboard"""
         description = self.description_text.get(1.0, tk.END).strip()
@@ -248,11 +494,9 @@ class MusicMakroGUI:
             messagebox.showinfo("Sucesso", "Descrição copiada para a área de transferência!")
     
     def save_json(self):
-        """Salva resultados em arquivo JSON"""
-        technical = self.technical_text.get(1.0, tk.END).strip()
-        description = self.description_text.get(1.0, tk.END).strip()
-        
-        if not technical or not description:
+        """Salva o resultado da linha selecionada em arquivo JSON"""
+        job = self.queue.job(self.shown[0]) if self.shown else None
+        if job is None or job.status != "ok":
             messagebox.showwarning("Aviso", "Nenhum dado para salvar")
             return
         
@@ -264,21 +508,32 @@ class MusicMakroGUI:
         if filename:
             try:
                 data = {
-                    "file": self.file_path.get(),
-                    "technical_analysis": json.loads(technical),
-                    "ace_step_description": description
+                    "file": job.path,
+                    "technical_analysis": job.record["features"],
+                    "ace_step_description": job.record.get("description")
                 }
                 with open(filename, 'w', encoding='utf-8') as f:
                     json.dump(data, f, indent=2, ensure_ascii=False)
                 messagebox.showinfo("Sucesso", "Análise salva com sucesso!")
             except Exception as e:
                 messagebox.showerror("Erro", f"Erro ao salvar: {str(e)}")
-    
+        
     def clear_all(self):
-        """Limpa todos os campos"""
+        """Limpa os campos e remove da tabela as análises concluídas"""
         self.file_path.set("")
+        for job_id in self.queue.forget():
+            self.jobs_table.delete(str(job_id))
+        self.shown = None
+        self.stage_times = {}
+        self.timing_label.config(text="")
         self.technical_text.delete(1.0, tk.END)
         self.description_text.delete(1.0, tk.END)
+        self.update_overall()
+        
+    def quit(self):
+        """Encerra os processos de análise e fecha a janela"""
+        self.queue.close()
+        self.root.quit()
 
 def main():
     """Função principal"""
@@ -286,14 +541,7 @@ def main():
     print(f"{settings.APP_NAME} v{settings.APP_VERSION}")
     print("=" * 70)
     
-    required = ['librosa', 'numpy', 'soundfile', 'mutagen']
-    missing = []
-    
-    for module in required:
-        try:
-            __import__(module)
-        except ImportError:
-            missing.append(module)
+    missing = startup.missing_dependencies()
     
     if missing:
         print(f"\n⚠️  DEPENDÊNCIAS FALTANDO: {', '.join(missing)}")
@@ -304,7 +552,7 @@ def main():
     print("✓ Todas as dependências instaladas\n")
     print("Iniciando interface gráfica...\n")
     
-    root = tk.Tk()
+    root = TkinterDnD.Tk() if DND_AVAILABLE else tk.Tk()
     app = MusicMakroGUI(root)
     root.mainloop()
 
@@ -0,0 +1,351 @@
+"""
+Music-Makro - Accuracy Report
+Velocidade e precisão de configurações alternativas do analisador
+
+Cada configuração (taxa reduzida, hop maior, trechos, streaming, cache) é
+comparada com a análise de referência (AudioAnalyzer completo) no mesmo
+corpus. O relatório traz, por configuração:
+    - a distribuição do erro relativo de cada feature (mediana, P90, máximo e
+      viés), com destaque para as que decidem os ramos do DescriptionGenerator;
+    - a taxa de faixas cuja descrição muda, no total e por linha;
+    - o ganho de tempo mediano sobre a referência.
+
+O decodificador já entrega float32 e os espectros compartilhados vêm do
+FeatureContext; "cached" mede o custo de uma consulta ao cache de features
+(a primeira execução, que grava o cache, não entra na medição).
+
+Uso:
+    python benchmarks/accuracy_report.py                          # corpus sintético, todas as configurações
+    python benchmarks/accuracy_report.py --corpus PASTA --configs preview,sr22050
+    python benchmarks/accuracy_report.py --json resumo.json
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import contextlib
+import io
+import json
+import numbers
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import librosa
+import numpy as np
+
+from benchmarks.fixtures import ACCURACY_CORPUS, TrackSpec, build_corpus
+from core.audio_analyzer import HOP_LENGTH, N_FFT, SECTIONS, AudioAnalyzer
+from core.batch import find_audio_files
+from core.description_generator import DescriptionGenerator, describable
+from core.feature_cache import FeatureCache
+from core.feature_context import FeatureContext
+from core.preview_analyzer import PreviewAnalyzer
+from core.streaming_analyzer import StreamingAnalyzer
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fixtures")
+DEFAULT_REPORT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports", "accuracy_report.md")
+
+DESCRIPTION_LINES = ("genre", "atmosphere", "structure", "vocals", "lyrics", "production")
+
+# Features que decidem os ramos do DescriptionGenerator (destacadas no relatório)
+KEY_FEATURES = ("rhythmic.tempo_bpm", "harmonic.percussive_ratio", "energy.loudness_mean")
+
+# Razões de BPM tratadas como erro de oitava (dobra/metade), com tolerância relativa
+OCTAVE_RATIOS = (0.5, 2.0)
+OCTAVE_TOLERANCE = 0.03
+
+
+class ResampledAnalyzer(AudioAnalyzer):
+    """Análise completa com o sinal reamostrado para target_sr"""
+
+    target_sr = 22050
+
+    def _load_audio(self):
+        super()._load_audio()
+        if self.sr != self.target_sr:
+            self.y = librosa.resample(self.y, orig_sr=self.sr, target_sr=self.target_sr)
+            self.sr = self.target_sr
+            self.context = FeatureContext(self.y, self.sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+
+class WideHopAnalyzer(AudioAnalyzer):
+    """Análise completa com hop maior (menos frames em todos os extratores)"""
+
+    hop_length = 2 * HOP_LENGTH
+
+    def _load_audio(self):
+        super()._load_audio()
+        self.context = FeatureContext(self.y, self.sr, n_fft=N_FFT, hop_length=self.hop_length)
+
+
+@dataclass(frozen=True)
+class Configuration:
+    """Configuração do analisador: como instanciá-lo e se mede uma consulta ao cache"""
+
+    name: str
+    label: str
+    factory: Callable
+    cached: bool = False
+
+
+CONFIGURATIONS = {
+    config.name: config for config in (
+        Configuration("stream", "Streaming em blocos (StreamingAnalyzer)",
+                      lambda path, cache: StreamingAnalyzer(path)),
+        Configuration("preview", "Prévia: trechos a 22,05 kHz com hop maior (PreviewAnalyzer)",
+                      lambda path, cache: PreviewAnalyzer(path)),
+        Configuration("sr22050", "Faixa inteira reamostrada para 22,05 kHz",
+                      lambda path, cache: ResampledAnalyzer(path)),
+        Configuration("hop1024", f"Hop de {2 * HOP_LENGTH} amostras",
+                      lambda path, cache: WideHopAnalyzer(path)),
+        Configuration("cached", "Resultado lido do cache de features",
+                      lambda path, cache: AudioAnalyzer(path, cache=cache), cached=True),
+    )
+}
+
+
+def _timed(analyzer) -> tuple:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = analyzer.analyze()
+    return result, time.perf_counter() - start
+
+
+def _describe(result):
+    return DescriptionGenerator(result).generate().split("\n") if describable(result) else None
+
+
+def _values(result: dict) -> dict:
+    """{"seção.chave": valor} das features numéricas (escalares e vetores) fora dos metadados"""
+    values = {}
+    for section in SECTIONS:
+        if section == "metadata":
+            continue
+        for key, value in result.get(section, {}).items():
+            if isinstance(value, numbers.Real) and not isinstance(value, bool):
+                values[f"{section}.{key}"] = float(value)
+            elif isinstance(value, list) and value and all(isinstance(v, numbers.Real) for v in value):
+                values[f"{section}.{key}"] = np.asarray(value, dtype=np.float64)
+    return values
+
+
+def _errors(value, reference) -> tuple:
+    """(erro relativo com sinal em %, erro absoluto); vetores: norma da diferença e norma relativa"""
+    if isinstance(reference, np.ndarray):
+        if not isinstance(value, np.ndarray) or value.shape != reference.shape:
+            return float("nan"), float("nan")
+        difference = float(np.linalg.norm(value - reference))
+        return difference / max(float(np.linalg.norm(reference)), 1e-9) * 100, difference
+    return (value - reference) / max(abs(reference), 1e-9) * 100, abs(value - reference)
+
+
+def run(paths, configs, cache_dir: str) -> list:
+    """Analisa cada arquivo na referência e em cada configuração; retorna as medições por faixa"""
+    cache = FeatureCache(os.path.join(cache_dir, "features.sqlite"), max_bytes=0, max_age_days=0)
+    rows = []
+    for path in paths:
+        reference, reference_time = _timed(AudioAnalyzer(path))
+        row = {
+            "file": os.path.basename(path),
+            "reference": {"result": reference, "time": reference_time, "description": _describe(reference)},
+            "configs": {}
+        }
+        for config in configs:
+            if config.cached:
+                _timed(config.factory(path, cache))
+            result, seconds = _timed(config.factory(path, cache))
+            row["configs"][config.name] = {"result": result, "time": seconds, "description": _describe(result)}
+
+        timings = ", ".join(f"{name} {m['time']:.2f}s" for name, m in row["configs"].items())
+        print(f"  {row['file']}: referência {reference_time:.1f}s; {timings}", file=sys.stderr)
+        rows.append(row)
+    return rows
+
+
+def _distribution(errors: list) -> dict:
+    errors = np.asarray([e for e in errors if np.isfinite(e[0])], dtype=np.float64).reshape(-1, 2)
+    if not errors.size:
+        return None
+    relative, absolute = errors[:, 0], errors[:, 1]
+    magnitude = np.abs(relative)
+    return {
+        "median_pct": float(np.median(magnitude)),
+        "p90_pct": float(np.percentile(magnitude, 90)),
+        "max_pct": float(np.max(magnitude)),
+        "bias_pct": float(np.median(relative)),
+        "median_abs": float(np.median(absolute))
+    }
+
+
+def summarize(rows, configs) -> dict:
+    """Erros por feature, mudança das descrições e ganho de tempo de cada configuração"""
+    summary = {"tracks": len(rows), "reference_time_median": float(np.median([r["reference"]["time"] for r in rows])),
+               "configs": {}}
+
+    for config in configs:
+        errors, octave_errors = {}, 0
+        line_changes = {line: [] for line in DESCRIPTION_LINES}
+        text_changes, speedups, per_track = [], [], []
+
+        for row in rows:
+            reference, measured = row["reference"], row["configs"][config.name]
+            ref_values, values = _values(reference["result"]), _values(measured["result"])
+            for name, ref_value in ref_values.items():
+                if name in values:
+                    errors.setdefault(name, []).append(_errors(values[name], ref_value))
+
+            ref_tempo = ref_values.get("rhythmic.tempo_bpm")
+            tempo = values.get("rhythmic.tempo_bpm")
+            if ref_tempo and tempo and any(abs(tempo / ref_tempo - ratio) <= OCTAVE_TOLERANCE * ratio
+                                           for ratio in OCTAVE_RATIOS):
+                octave_errors += 1
+
+            changed = None
+            if reference["description"] and measured["description"]:
+                for index, line in enumerate(DESCRIPTION_LINES):
+                    line_changes[line].append(reference["description"][index] != measured["description"][index])
+                changed = reference["description"] != measured["description"]
+                text_changes.append(changed)
+
+            speedups.append(reference["time"] / measured["time"])
+            per_track.append({
+                "file": row["file"],
+                "time": round(measured["time"], 3),
+                "speedup": round(reference["time"] / measured["time"], 2),
+                **{name: [round(float(ref_values[name]), 3) if name in ref_values else None,
+                          round(float(values[name]), 3) if name in values else None]
+                   for name in KEY_FEATURES},
+                "description_changed": changed,
+                "changed_lines": [line for line in DESCRIPTION_LINES if line_changes[line] and line_changes[line][-1]]
+                if changed else []
+            })
+
+        def rate(flags):
+            return sum(flags) / len(flags) if flags else None
+
+        summary["configs"][config.name] = {
+            "label": config.label,
+            "speedup_median": float(np.median(speedups)),
+            "time_median": float(np.median([t["time"] for t in per_track])),
+            "description_change_rate": rate(text_changes),
+            "line_change_rate": {line: rate(flags) for line, flags in line_changes.items()},
+            "tempo_octave_errors": octave_errors,
+            "features": {name: stats for name, stats in
+                         ((name, _distribution(values)) for name, values in errors.items()) if stats},
+            "per_track": per_track
+        }
+    return summary
+
+
+def render_markdown(summary: dict, corpus_label: str) -> str:
+    def pct(value):
+        return "n/d" if value is None else f"{value * 100:.0f}%"
+
+    configs = summary["configs"]
+    lines = [
+        "# Relatório de velocidade e precisão das configurações do analisador",
+        "",
+        f"Corpus: {corpus_label} ({summary['tracks']} faixas). Referência: AudioAnalyzer completo, "
+        f"tempo mediano {summary['reference_time_median']:.1f}s.",
+        "",
+        "## Resumo",
+        "",
+        "| Configuração | Tempo mediano (s) | Ganho mediano | Descrição alterada | Erros de oitava no BPM |",
+        "|---|---|---|---|---|",
+    ]
+    for name, stats in configs.items():
+        lines.append(f"| {name} | {stats['time_median']:.2f} | {stats['speedup_median']:.1f}x "
+                     f"| {pct(stats['description_change_rate'])} | {stats['tempo_octave_errors']} |")
+
+    lines += ["", "## Linhas da descrição alteradas", "",
+              "| Configuração | " + " | ".join(DESCRIPTION_LINES) + " |",
+              "|---|" + "---|" * len(DESCRIPTION_LINES)]
+    for name, stats in configs.items():
+        lines.append(f"| {name} | " + " | ".join(pct(stats["line_change_rate"][line]) for line in DESCRIPTION_LINES)
+                     + " |")
+
+    lines += ["", "## Features que decidem a descrição (erro relativo, %)", "",
+              "| Configuração | Feature | Mediana | P90 | Máximo | Viés | Erro absoluto mediano |",
+              "|---|---|---|---|---|---|---|"]
+    for name, stats in configs.items():
+        for feature in KEY_FEATURES:
+            error = stats["features"].get(feature)
+            if error:
+                lines.append(f"| {name} | {feature} | {error['median_pct']:.1f} | {error['p90_pct']:.1f} "
+                             f"| {error['max_pct']:.1f} | {error['bias_pct']:+.1f} | {error['median_abs']:.3g} |")
+
+    for name, stats in configs.items():
+        lines += [
+            "",
+            f"## {name}: {stats['label']}",
+            "",
+            "| Arquivo | Tempo (s) | Ganho | BPM (ref → conf) | Percussivo | Loudness | Linhas alteradas |",
+            "|---|---|---|---|---|---|---|",
+        ]
+        for track in stats["per_track"]:
+            pairs = [f"{a} → {b}" for a, b in (track[feature] for feature in KEY_FEATURES)]
+            changed = ", ".join(track["changed_lines"]) or ("—" if track["description_changed"] is not None else "n/d")
+            lines.append(f"| {track['file']} | {track['time']} | {track['speedup']}x | "
+                         + " | ".join(pairs) + f" | {changed} |")
+        lines += ["", "| Feature | Mediana | P90 | Máximo | Viés |", "|---|---|---|---|---|"]
+        for feature, error in stats["features"].items():
+            lines.append(f"| {feature} | {error['median_pct']:.1f} | {error['p90_pct']:.1f} "
+                         f"| {error['max_pct']:.1f} | {error['bias_pct']:+.1f} |")
+
+    lines += [
+        "",
+        "## Notas",
+        "",
+        "- Erro relativo com sinal sobre o valor da referência; vetores (MFCC, chroma) usam a norma da",
+        "  diferença sobre a norma da referência. Features com média próxima de zero têm erro inflado.",
+        "- A linha de estrutura inclui a duração e o BPM inteiros: qualquer diferença de tempo a altera.",
+        "- Erros de oitava: BPM na metade ou no dobro da referência (±3%).",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara configurações alternativas do analisador com a referência")
+    parser.add_argument("--corpus", help="Diretório com arquivos reais (padrão: corpus sintético)")
+    parser.add_argument("--configs", default=",".join(CONFIGURATIONS),
+                        help=f"Configurações a comparar, separadas por vírgula ({', '.join(CONFIGURATIONS)})")
+    parser.add_argument("--limit", type=int, help="Usa só as primeiras N faixas do corpus")
+    parser.add_argument("--fixtures-dir", default=DEFAULT_FIXTURES_DIR, help="Onde gerar o corpus sintético")
+    parser.add_argument("-o", "--output", default=DEFAULT_REPORT, help="Relatório em Markdown")
+    parser.add_argument("--json", help="Também grava o resumo em JSON")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.configs.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CONFIGURATIONS]
+    if unknown:
+        parser.error(f"Configurações desconhecidas: {', '.join(unknown)}")
+    configs = [CONFIGURATIONS[name] for name in names]
+
+    if args.corpus:
+        paths = find_audio_files([args.corpus])
+        label = args.corpus
+    else:
+        paths = build_corpus(args.fixtures_dir, ACCURACY_CORPUS)
+        label = "sintético (benchmarks/fixtures.py, ACCURACY_CORPUS)"
+    paths = paths[:args.limit] if args.limit else paths
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Aquecimento: compila os kernels numba de todas as configurações antes de medir
+        warmup = build_corpus(args.fixtures_dir, [TrackSpec("warmup", 120, 5)])
+        run(warmup, configs, cache_dir)
+        summary = summarize(run(paths, configs, cache_dir), configs)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(render_markdown(summary, label))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"✓ Relatório gravado em {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Music-Makro - Benchmark Comparison
+Compara dois arquivos de resultados de run_benchmarks.py
+
+Uso:
+    python benchmarks/compare.py antes.json depois.json [--threshold 10]
+
+Compara o tempo mínimo ponta a ponta, o pico de memória e o tempo de cada
+etapa. Sai com código 1 se alguma métrica piorar além do limiar (em %).
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+
+# Diferenças absolutas abaixo destes valores são ruído de medição
+MIN_SECONDS = 0.05
+MIN_MB = 1.0
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        results = json.load(f)
+    return {(case["case"], case["mode"]): case for case in results["cases"]}, results["environment"]
+
+
+def _metrics(case: dict) -> dict:
+    metrics = {
+        "total.seconds": case["end_to_end"]["min_s"],
+        "total.peak_mb": case["peak_mb"]
+    }
+    for stage, values in case["stages"].items():
+        metrics[f"{stage}.seconds"] = values["seconds"]
+        metrics[f"{stage}.peak_mb"] = values["peak_mb"]
+    return metrics
+
+
+def compare(before: dict, after: dict, threshold: float) -> list:
+    """Linhas (caso, modo, métrica, antes, depois, variação %, regressão) dos casos em comum"""
+    rows = []
+    for key in sorted(set(before) & set(after)):
+        old, new = _metrics(before[key]), _metrics(after[key])
+        for metric in old:
+            if metric not in new:
+                continue
+            a, b = old[metric], new[metric]
+            floor = MIN_MB if metric.endswith("peak_mb") else MIN_SECONDS
+            change = (b - a) / a * 100 if a > 0 else 0.0
+            regression = change > threshold and b - a > floor
+            rows.append((key[0], key[1], metric, a, b, change, regression))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara resultados de benchmarks")
+    parser.add_argument("before", help="Resultados de referência")
+    parser.add_argument("after", help="Resultados novos")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Piora máxima tolerada em %% (padrão: 10)")
+    parser.add_argument("--all", action="store_true", help="Mostra também as métricas por etapa")
+    args = parser.parse_args(argv)
+
+    before, env_before = _load(args.before)
+    after, env_after = _load(args.after)
+    for field in ("platform", "processor", "cpu_count", "numpy", "librosa"):
+        if env_before.get(field) != env_after.get(field):
+            print(f"Aviso: {field} diferente ({env_before.get(field)} → {env_after.get(field)})")
+
+    rows = compare(before, after, args.threshold)
+    print(f"{'Caso':<24} {'Modo':<8} {'Métrica':<20} {'Antes':>10} {'Depois':>10} {'Var.':>8}")
+    for case, mode, metric, a, b, change, regression in rows:
+        if args.all or metric.startswith("total.") or regression:
+            flag = "  ← regressão" if regression else ""
+            print(f"{case:<24} {mode:<8} {metric:<20} {a:>10.3f} {b:>10.3f} {change:>+7.1f}%{flag}")
+
+    missing = sorted(set(before) ^ set(after))
+    if missing:
+        print(f"\nCasos presentes em apenas um dos arquivos: {', '.join(f'{c} [{m}]' for c, m in missing)}")
+
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"\n{regressions} regressões acima de {args.threshold:g}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Music-Makro - Synthetic Fixtures
+Áudio sintético determinístico para benchmarks e relatórios de precisão
+"""
+
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import soundfile as sf
+
+FIXTURE_SR = 44100
+
+
+@dataclass(frozen=True)
+class TrackSpec:
+    """Receita de uma faixa sintética: andamento, duração e nível de cada elemento"""
+
+    name: str
+    bpm: float
+    duration: float
+    kick: float = 0.8
+    snare: float = 0.4
+    hihat: float = 0.2
+    tone: float = 0.2
+    noise: float = 0.02
+    root_hz: float = 110.0
+    seed: int = 0
+    start_gain: float = 0.4  # ganho inicial do build-up (1.0 = nível cheio desde a primeira amostra)
+    extension: str = "mp3"
+
+    @property
+    def filename(self) -> str:
+        return f"{self.name}_{int(self.bpm)}bpm_{int(self.duration)}s.{self.extension}"
+
+
+def _envelope(n: int, decay_seconds: float, sr: int) -> np.ndarray:
+    return np.exp(-np.arange(n) / (decay_seconds * sr))
+
+
+def _place(y: np.ndarray, hit: np.ndarray, positions):
+    for start in positions:
+        skip = max(-start, 0)
+        end = min(start + hit.size, y.size)
+        if end > start + skip:
+            y[start + skip:end] += hit[skip:end - start]
+
+
+def click_track(bpm: float, duration: float, sr: int = FIXTURE_SR, offset: float = 0.0) -> np.ndarray:
+    """Cliques de 1 kHz em cada batida (janela [offset, offset + duration) da faixa)"""
+    y = np.zeros(int(duration * sr), dtype=np.float64)
+    n = int(0.03 * sr)
+    click = _envelope(n, 0.005, sr) * np.sin(2 * np.pi * 1000 * np.arange(n) / sr)
+    beat = 60.0 / bpm
+    # Inclui a batida anterior à janela, cujo clique pode atravessar a borda
+    first = np.floor(offset / beat) * beat if offset else 0.0
+    beats = np.arange(first, offset + duration, beat)
+    _place(y, click, (beats * sr).astype(int) - int(round(offset * sr)))
+    return y
+
+
+def tone_noise_mix(duration: float, root_hz: float = 110.0, noise: float = 0.02,
+                   sr: int = FIXTURE_SR, seed: int = 0, offset: float = 0.0) -> np.ndarray:
+    """Acorde maior sustentado com leve vibrato, somado a ruído branco
+
+    Com offset, gera a janela correspondente da faixa: o acorde é contínuo entre
+    janelas e o ruído de cada janela tem semente própria.
+    """
+    rng = np.random.default_rng([seed, int(offset * sr)] if offset else seed)
+    t = offset + np.arange(int(duration * sr)) / sr
+    y = np.zeros_like(t)
+    for ratio, gain in ((1.0, 1.0), (1.25, 0.6), (1.5, 0.5), (2.0, 0.3)):
+        y += gain * np.sin(2 * np.pi * root_hz * ratio * t + 0.3 * np.sin(2 * np.pi * 0.2 * t))
+    y /= 2.4
+    return y + noise * rng.standard_normal(t.size)
+
+
+def render(spec: TrackSpec, sr: int = FIXTURE_SR) -> np.ndarray:
+    """Renderiza a faixa: bumbo, caixa, chimbal, acorde e ruído, com build-up de volume"""
+    rng = np.random.default_rng(spec.seed)
+    n_samples = int(spec.duration * sr)
+    beat = 60.0 / spec.bpm
+    beats = np.arange(0, spec.duration, beat)
+
+    y = spec.tone * tone_noise_mix(spec.duration, spec.root_hz, 0.0, sr, spec.seed)
+    y += spec.noise * rng.standard_normal(n_samples)
+
+    n = int(0.25 * sr)
+    t = np.arange(n) / sr
+    kick = _envelope(n, 0.08, sr) * np.sin(2 * np.pi * (50 + 100 * np.exp(-t * 30)) * t)
+    _place(y, spec.kick * kick, (beats * sr).astype(int))
+
+    n = int(0.15 * sr)
+    snare = _envelope(n, 0.04, sr) * rng.standard_normal(n)
+    _place(y, spec.snare * snare, (beats[1::2] * sr).astype(int))
+
+    n = int(0.04 * sr)
+    hihat = _envelope(n, 0.01, sr) * np.diff(rng.standard_normal(n + 1))
+    _place(y, spec.hihat * hihat, (np.arange(0, spec.duration, beat / 2) * sr).astype(int))
+
+    y *= np.linspace(spec.start_gain, 1.0, n_samples)
+    peak = np.max(np.abs(y))
+    return (0.9 * y / peak if peak > 0 else y).astype(np.float32)
+
+
+def write_fixture(path: str, y: np.ndarray, sr: int = FIXTURE_SR):
+    """Grava o sinal no formato indicado pela extensão (MP3 requer libsndfile >= 1.1)"""
+    sf.write(path, y, sr)
+
+
+@dataclass(frozen=True)
+class SignalSpec:
+    """Sinal de referência para benchmarks: cliques em BPM conhecido ou acorde com ruído"""
+
+    kind: str  # "click" ou "mix"
+    duration: float
+    bpm: float = 120.0
+    root_hz: float = 110.0
+    noise: float = 0.05
+    seed: int = 0
+
+    @property
+    def name(self) -> str:
+        if self.kind == "click":
+            return f"click_{int(self.bpm)}bpm_{int(self.duration)}s"
+        return f"mix_{int(self.root_hz)}hz_{int(self.duration)}s"
+
+    @property
+    def filename(self) -> str:
+        return f"{self.name}.mp3"
+
+    def block(self, offset: float, length: float, sr: int = FIXTURE_SR) -> np.ndarray:
+        """Janela [offset, offset + length) do sinal"""
+        if self.kind == "click":
+            y = click_track(self.bpm, length, sr, offset)
+        elif self.kind == "mix":
+            y = 0.5 * tone_noise_mix(length, self.root_hz, self.noise, sr, self.seed, offset)
+        else:
+            raise ValueError(f"Tipo de sinal desconhecido: {self.kind}")
+        return (0.9 * y).astype(np.float32)
+
+
+def write_signal(path: str, spec: SignalSpec, sr: int = FIXTURE_SR, block_seconds: float = 60.0):
+    """Grava o sinal em janelas, com memória constante mesmo para faixas de uma hora"""
+    with sf.SoundFile(path, 'w', samplerate=sr, channels=1) as out:
+        offset = 0.0
+        while offset < spec.duration:
+            length = min(block_seconds, spec.duration - offset)
+            out.write(spec.block(offset, length, sr))
+            offset += length
+
+
+def build_corpus(directory: str, specs) -> list:
+    """Gera (uma única vez) os arquivos da lista de especificações e retorna os caminhos"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for spec in specs:
+        path = os.path.join(directory, spec.filename)
+        if not os.path.exists(path):
+            # Arquivo temporário: uma geração interrompida não deixa fixture truncada
+            partial = path + ".partial" + os.path.splitext(path)[1]
+            if isinstance(spec, SignalSpec):
+                write_signal(partial, spec)
+            else:
+                write_fixture(partial, render(spec))
+            os.replace(partial, path)
+        paths.append(path)
+    return paths
+
+
+# Corpus padrão do relatório de prévia: varia andamento, timbre e densidade percussiva
+PREVIEW_CORPUS = (
+    TrackSpec("funk", 130, 150, kick=1.0, snare=0.8, hihat=0.5, tone=0.1, noise=0.3, seed=1),
+    TrackSpec("phonk", 128, 120, kick=1.0, snare=0.6, hihat=0.1, tone=0.05, noise=0.15,
+              root_hz=55.0, seed=2),
+    TrackSpec("rnb", 78, 180, kick=0.3, snare=0.15, hihat=0.05, tone=0.8, noise=0.01,
+              root_hz=220.0, seed=3),
+    TrackSpec("dance", 150, 150, kick=1.0, snare=0.7, hihat=0.6, tone=0.05, noise=0.05, seed=4),
+    TrackSpec("hiphop", 95, 200, kick=0.8, snare=0.5, hihat=0.3, tone=0.3, noise=0.02, seed=5),
+    TrackSpec("ambient", 70, 240, kick=0.1, snare=0.0, hihat=0.0, tone=1.0, noise=0.005,
+              root_hz=165.0, seed=6),
+)
+
+
+# Corpus do relatório de precisão: o de prévia mais uma faixa em WAV sem build-up,
+# cujos primeiros frames (com zeros do enquadramento centrado) definem o RMS mínimo
+ACCURACY_CORPUS = PREVIEW_CORPUS + (
+    TrackSpec("industrial", 125, 150, kick=0.5, snare=0.4, hihat=0.3, tone=0.6, noise=1.0, seed=7,
+              start_gain=1.0, extension="wav"),
+)
+
+
+# Corpus dos benchmarks de desempenho, por perfil (cada perfil inclui os anteriores)
+BENCHMARK_PROFILES = {
+    "quick": (
+        SignalSpec("click", 30, bpm=120),
+        SignalSpec("mix", 30, root_hz=220, seed=1),
+    ),
+    "standard": (
+        SignalSpec("click", 120, bpm=128),
+        SignalSpec("mix", 600, root_hz=110, seed=2),
+    ),
+    "long": (
+        SignalSpec("click", 3600, bpm=140),
+    ),
+}
+
+
+def benchmark_corpus(profile: str) -> list:
+    """Especificações do perfil pedido, acumulando as dos perfis menores"""
+    names = list(BENCHMARK_PROFILES)
+    specs = []
+    for name in names[:names.index(profile) + 1]:
+        specs.extend(BENCHMARK_PROFILES[name])
+    return specs
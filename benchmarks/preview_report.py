@@ -0,0 +1,212 @@
+"""
+Music-Makro - Preview Report
+Compara a análise de prévia com a análise completa em um corpus
+
+Uso:
+    python benchmarks/preview_report.py                  # corpus sintético
+    python benchmarks/preview_report.py --corpus PASTA   # arquivos reais
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import contextlib
+import io
+import json
+import time
+
+import numpy as np
+
+from benchmarks.fixtures import PREVIEW_CORPUS, TrackSpec, build_corpus
+from core.audio_analyzer import AudioAnalyzer
+from core.batch import find_audio_files
+from core.description_generator import DescriptionGenerator
+from core.preview_analyzer import PreviewAnalyzer
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fixtures")
+DEFAULT_REPORT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports", "preview_report.md")
+
+SECTIONS = ("temporal", "spectral", "rhythmic", "harmonic", "energy")
+DESCRIPTION_LINES = ("genre", "atmosphere", "structure", "vocals", "lyrics", "production")
+
+
+def _timed(analyzer_class, path):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = analyzer_class(path).analyze()
+    return result, time.perf_counter() - start
+
+
+def _describe(result):
+    try:
+        return DescriptionGenerator(result).generate().split("\n")
+    except (KeyError, TypeError):
+        return None
+
+
+def compare(paths) -> list:
+    """Analisa cada arquivo nos dois modos e retorna as comparações por faixa"""
+    rows = []
+    for path in paths:
+        full, full_time = _timed(AudioAnalyzer, path)
+        preview, preview_time = _timed(PreviewAnalyzer, path)
+        rows.append({
+            "file": os.path.basename(path),
+            "full": full,
+            "preview": preview,
+            "full_time": full_time,
+            "preview_time": preview_time,
+            "full_description": _describe(full),
+            "preview_description": _describe(preview)
+        })
+        print(f"  {os.path.basename(path)}: completa {full_time:.1f}s, prévia {preview_time:.2f}s", file=sys.stderr)
+    return rows
+
+
+def summarize(rows) -> dict:
+    """Distribuição dos desvios por feature, concordância das descrições e ganho de tempo"""
+    errors = {}
+    for row in rows:
+        for section in SECTIONS:
+            for key, reference in row["full"][section].items():
+                value = row["preview"][section][key]
+                scale = abs(reference) if abs(reference) > 1e-9 else 1.0
+                errors.setdefault(f"{section}.{key}", []).append(abs(value - reference) / scale * 100)
+
+    features = {
+        name: {
+            "median_pct": float(np.median(values)),
+            "p90_pct": float(np.percentile(values, 90)),
+            "max_pct": float(np.max(values))
+        }
+        for name, values in errors.items()
+    }
+
+    described = [r for r in rows if r["full_description"] and r["preview_description"]]
+    agreement = {}
+    for index, line in enumerate(DESCRIPTION_LINES):
+        matches = [r["full_description"][index] == r["preview_description"][index] for r in described]
+        agreement[line] = sum(matches) / len(matches) if matches else None
+    identical = [r["full_description"] == r["preview_description"] for r in described]
+    agreement["full_text"] = sum(identical) / len(identical) if identical else None
+
+    speedups = [r["full_time"] / r["preview_time"] for r in rows]
+    return {
+        "tracks": len(rows),
+        "features": features,
+        "description_agreement": agreement,
+        "speedup_median": float(np.median(speedups)),
+        "full_time_median": float(np.median([r["full_time"] for r in rows])),
+        "preview_time_median": float(np.median([r["preview_time"] for r in rows])),
+        "per_track": [
+            {
+                "file": r["file"],
+                "full_time": round(r["full_time"], 2),
+                "preview_time": round(r["preview_time"], 2),
+                "tempo_full": round(r["full"]["rhythmic"]["tempo_bpm"], 1),
+                "tempo_preview": round(r["preview"]["rhythmic"]["tempo_bpm"], 1),
+                "genre_full": r["full_description"][0].split(":")[0] if r["full_description"] else None,
+                "genre_preview": r["preview_description"][0].split(":")[0] if r["preview_description"] else None,
+                "atmosphere_match": (r["full_description"][1] == r["preview_description"][1])
+                if r["full_description"] and r["preview_description"] else None
+            }
+            for r in rows
+        ]
+    }
+
+
+def render_markdown(summary: dict, corpus_label: str) -> str:
+    def pct(value):
+        return "n/d" if value is None else f"{value * 100:.0f}%"
+
+    lines = [
+        "# Relatório de precisão da análise de prévia",
+        "",
+        f"Corpus: {corpus_label} ({summary['tracks']} faixas).",
+        f"Tempo mediano: completa {summary['full_time_median']:.1f}s, "
+        f"prévia {summary['preview_time_median']:.2f}s "
+        f"(ganho mediano {summary['speedup_median']:.1f}x).",
+        "",
+        "## Concordância das descrições",
+        "",
+        "| Linha | Igual à análise completa |",
+        "|---|---|",
+    ]
+    for line, rate in summary["description_agreement"].items():
+        lines.append(f"| {line} | {pct(rate)} |")
+
+    lines += [
+        "",
+        "## Faixas",
+        "",
+        "| Arquivo | Completa (s) | Prévia (s) | BPM completa | BPM prévia | Gênero completa | Gênero prévia | Atmosfera igual |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for track in summary["per_track"]:
+        lines.append(
+            f"| {track['file']} | {track['full_time']} | {track['preview_time']} | {track['tempo_full']} "
+            f"| {track['tempo_preview']} | {track['genre_full']} | {track['genre_preview']} "
+            f"| {'sim' if track['atmosphere_match'] else 'não'} |"
+        )
+
+    lines += [
+        "",
+        "## Desvio por feature (erro relativo, %)",
+        "",
+        "| Feature | Mediana | P90 | Máximo |",
+        "|---|---|---|---|",
+    ]
+    for name, stats in summary["features"].items():
+        lines.append(f"| {name} | {stats['median_pct']:.1f} | {stats['p90_pct']:.1f} | {stats['max_pct']:.1f} |")
+
+    lines += [
+        "",
+        "## Notas",
+        "",
+        "- Centroide, largura de banda, rolloff e flatness têm viés negativo sistemático: a 22,05 kHz",
+        "  não há conteúdo acima de 11 kHz. Os limiares do DescriptionGenerator (centroide > 2000,",
+        "  rolloff < 3000, largura > 2000) ficam abaixo dessa faixa, mas faixas com muito brilho podem",
+        "  mudar de ramo.",
+        "- A linha de estrutura inclui a duração e o BPM inteiros, então qualquer diferença de tempo",
+        "  a altera; erros de tempo por dobra/metade (x2, x0,5) vêm de trechos curtos.",
+        "- Features com média próxima de zero (tonnetz, mfcc_mean) têm erro relativo inflado.",
+    ]
+
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara a análise de prévia com a completa")
+    parser.add_argument("--corpus", help="Diretório com arquivos reais (padrão: corpus sintético)")
+    parser.add_argument("--fixtures-dir", default=DEFAULT_FIXTURES_DIR,
+                        help="Onde gerar o corpus sintético")
+    parser.add_argument("-o", "--output", default=DEFAULT_REPORT, help="Relatório em Markdown")
+    parser.add_argument("--json", help="Também grava o resumo em JSON")
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        paths = find_audio_files([args.corpus])
+        label = args.corpus
+    else:
+        paths = build_corpus(args.fixtures_dir, PREVIEW_CORPUS)
+        label = "sintético (benchmarks/fixtures.py, PREVIEW_CORPUS)"
+
+    # Aquecimento: compila os kernels numba antes de medir
+    warmup = build_corpus(args.fixtures_dir, [TrackSpec("warmup", 120, 5)])[0]
+    _timed(AudioAnalyzer, warmup)
+    _timed(PreviewAnalyzer, warmup)
+
+    summary = summarize(compare(paths))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(render_markdown(summary, label))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"✓ Relatório gravado em {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Music-Makro - Analyzer Benchmarks
+Tempo e pico de memória da análise, ponta a ponta e por extrator
+
+Para cada fixture sintética do perfil escolhido:
+    - analyze() é executado --repeat vezes sem instrumentação (mínimo e mediana);
+    - uma passada extra com tracemalloc mede o pico de memória e o tempo de cada
+      etapa (_load_audio, _extract_metadata e cada _analyze_*).
+
+As transformações compartilhadas do FeatureContext (STFT, mel, HPSS) são
+calculadas sob demanda e entram na conta da primeira etapa que as usa. O pico
+de memória cobre as alocações rastreadas pelo tracemalloc (incluindo arrays
+numpy), não buffers internos dos decodificadores.
+
+Uso:
+    python benchmarks/run_benchmarks.py                        # perfil standard
+    python benchmarks/run_benchmarks.py --profile quick --modes full,preview
+    python benchmarks/compare.py antes.json depois.json
+
+O perfil long inclui uma faixa de 60 min: no modo full ela exige dezenas de GB
+de memória, então combine-o com --modes stream.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import librosa
+import numpy as np
+
+from benchmarks.fixtures import BENCHMARK_PROFILES, SignalSpec, benchmark_corpus, build_corpus
+from core.audio_analyzer import ANALYZER_VERSION
+from core.batch import create_analyzer
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURES_DIR = os.path.join(BENCHMARKS_DIR, ".fixtures")
+DEFAULT_RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+# Formato do arquivo de resultados (incrementar ao mudar a estrutura)
+RESULTS_FORMAT = 1
+
+# Etapas medidas individualmente, na ordem de AudioAnalyzer._extract_features
+STAGES = (
+    ("load", "_load_audio"),
+    ("metadata", "_extract_metadata"),
+    ("temporal", "_analyze_temporal"),
+    ("spectral", "_analyze_spectral"),
+    ("rhythmic", "_analyze_rhythmic"),
+    ("harmonic", "_analyze_harmonic"),
+    ("energy", "_analyze_energy"),
+)
+
+MB = 1024 * 1024
+
+
+def _quiet(function, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+
+def time_analyze(path: str, mode: str, repeat: int) -> dict:
+    """Tempo de analyze() ponta a ponta, sem instrumentação"""
+    runs = []
+    for _ in range(repeat):
+        analyzer = create_analyzer(path, mode)
+        start = time.perf_counter()
+        _quiet(analyzer.analyze)
+        runs.append(time.perf_counter() - start)
+    return {
+        "runs": [round(run, 4) for run in runs],
+        "min_s": round(min(runs), 4),
+        "median_s": round(statistics.median(runs), 4)
+    }
+
+
+def profile_stages(path: str, mode: str) -> dict:
+    """Pico de memória da análise e tempo/memória de cada etapa (com tracemalloc)"""
+    analyzer = create_analyzer(path, mode)
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        overall_peak = 0
+        stages = {}
+
+        # O modo stream lê e analisa no mesmo laço: só há uma etapa
+        steps = [("analyze", analyzer.analyze)] if mode == "stream" else [
+            (name, getattr(analyzer, method)) for name, method in STAGES
+        ]
+        for name, step in steps:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            _quiet(step)
+            seconds = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            overall_peak = max(overall_peak, peak)
+            stages[name] = {
+                "seconds": round(seconds, 4),
+                "peak_mb": round((peak - before) / MB, 2),
+                "retained_mb": round((current - before) / MB, 2)
+            }
+    finally:
+        tracemalloc.stop()
+
+    return {"peak_mb": round((overall_peak - baseline) / MB, 2), "stages": stages}
+
+
+def environment() -> dict:
+    """Versões e máquina, para saber se dois resultados são comparáveis"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "analyzer_version": ANALYZER_VERSION,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "librosa": librosa.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def run(paths_by_name: dict, specs, modes, repeat: int) -> list:
+    """Executa os casos (fixture x modo) e retorna os resultados"""
+    cases = []
+    for spec in specs:
+        path = paths_by_name[spec.name]
+        for mode in modes:
+            print(f"  {spec.name} [{mode}]...", file=sys.stderr, flush=True)
+            timing = time_analyze(path, mode, repeat)
+            memory = profile_stages(path, mode)
+            cases.append({
+                "case": spec.name,
+                "mode": mode,
+                "kind": spec.kind,
+                "duration_s": spec.duration,
+                "bpm": spec.bpm if spec.kind == "click" else None,
+                "end_to_end": timing,
+                "realtime_factor": round(spec.duration / timing["min_s"], 2),
+                "peak_mb": memory["peak_mb"],
+                "stages": memory["stages"]
+            })
+            print(f"    {timing['min_s']:.2f}s (mín.), pico {memory['peak_mb']:.0f} MB", file=sys.stderr)
+    return cases
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de desempenho do analisador")
+    parser.add_argument("--profile", choices=list(BENCHMARK_PROFILES), default="standard",
+                        help="Conjunto de fixtures (cada perfil inclui os menores)")
+    parser.add_argument("--modes", default="full",
+                        help="Modos de análise separados por vírgula (full, stream, preview)")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções cronometradas por caso")
+    parser.add_argument("--fixtures-dir", default=DEFAULT_FIXTURES_DIR, help="Onde gerar as fixtures")
+    parser.add_argument("-o", "--output", help="Arquivo JSON de resultados (padrão: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    specs = benchmark_corpus(args.profile)
+
+    print("Gerando fixtures...", file=sys.stderr)
+    paths = build_corpus(args.fixtures_dir, specs)
+
+    # Aquecimento: compila os kernels numba antes de medir
+    warmup = build_corpus(args.fixtures_dir, [SignalSpec("click", 5, bpm=100)])[0]
+    for mode in modes:
+        _quiet(create_analyzer(warmup, mode).analyze)
+
+    results = {
+        "format": RESULTS_FORMAT,
+        "profile": args.profile,
+        "repeat": args.repeat,
+        "environment": environment(),
+        "cases": run({spec.name: path for spec, path in zip(specs, paths)}, specs, modes, args.repeat)
+    }
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"✓ Resultados gravados em {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
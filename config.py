@@ -2,6 +2,8 @@
 Configurações do Music-Makro (aplicação desktop)
 """
 
+import os
+
 
 class Settings:
     """Configurações básicas da aplicação."""
@@ -9,5 +11,77 @@ class Settings:
     APP_NAME: str = "Music-Makro"
     APP_VERSION: str = "1.0.0"
 
+    # Análise em lote
+    AUDIO_EXTENSIONS: tuple = (".mp3", ".wav", ".flac", ".ogg", ".m4a")
+    BATCH_WORKERS: int = 0  # 0 = um processo por núcleo
+    BATCH_TIMEOUT: float = 600.0  # segundos por arquivo
+
+    # Pré-carga: arquivos lidos e decodificados à frente da análise, por processo
+    PREFETCH_DEPTH: int = 2  # 0 = desativa
+    PREFETCH_THREADS: int = 1
+    PREFETCH_MAX_BYTES: int = 512 * 1024 * 1024  # áudio decodificado em espera, por processo
+
+    # Processos por faixa para os extratores e a HPSS (1 = em série)
+    ANALYSIS_WORKERS: int = 1
+
+    # Interface gráfica: processos de análise em paralelo
+    GUI_WORKERS: int = 0  # 0 = metade dos núcleos
+    GUI_ANALYSIS_WORKERS: int = 0  # processos por faixa; 0 = núcleos divididos entre os processos da fila
+    GUI_CANCEL_GRACE: float = 5.0  # segundos até encerrar o processo de um job que não atendeu ao cancelamento
+
+    # Cache de features
+    CACHE_ENABLED: bool = True
+    CACHE_DIR: str = os.path.join(os.path.expanduser("~"), ".music_makro", "cache")
+    CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    CACHE_MAX_AGE_DAYS: float = 180.0
+
+    # Impressões digitais: quase duplicatas reaproveitam a análise de uma faixa do cache
+    FINGERPRINT_ENABLED: bool = True
+    FINGERPRINT_MIN_SCORE: float = 0.5  # fração dos hashes do arquivo alinhados com a faixa
+    FINGERPRINT_MIN_PROFILE_CORRELATION: float = 0.9  # perfis de chroma (confirma o tom)
+    FINGERPRINT_MAX_DURATION_DIFF: float = 1.0  # segundos
+
+    # Cache de áudio decodificado (float32 lido por memory-map; ativado com batch --pcm-cache)
+    PCM_CACHE_ENABLED: bool = False
+    PCM_CACHE_DIR: str = ""  # "" = pasta pcm dentro de CACHE_DIR
+    PCM_CACHE_MAX_BYTES: int = 8 * 1024 * 1024 * 1024
+
+    # Ingestão: arquivos até este tamanho são lidos inteiros para a memória
+    INGEST_MAX_BYTES: int = 256 * 1024 * 1024  # 0 = sem limite
+
+    # Cache dos kernels numba compilados ("" = locais padrão do numba, ao lado do librosa)
+    NUMBA_CACHE_DIR: str = ""
+
+    # Armazenamento colunar de resultados (comandos export e batch --store)
+    RESULT_STORE: str = os.path.join(os.path.expanduser("~"), ".music_makro", "results")
+
+    # Índice de similaridade
+    SIMILARITY_INDEX: str = os.path.join(os.path.expanduser("~"), ".music_makro", "similarity.npz")
+
+    # Monitoramento de pastas (comando watch)
+    WATCH_INDEX: str = os.path.join(os.path.expanduser("~"), ".music_makro", "library.sqlite")
+    WATCH_INTERVAL: float = 30.0  # segundos entre varreduras
+    WATCH_SETTLE: float = 10.0  # segundos sem mudança antes de analisar um arquivo
+    WATCH_BATCH: int = 32  # arquivos analisados por ciclo
+    WATCH_WORKERS: int = 1  # processos de análise (poucos, para não ocupar a máquina)
+    WATCH_NICE: int = 10  # redução de prioridade do processo (0 = não altera)
+
+    # Análise ao vivo (comando live)
+    LIVE_WINDOW: float = 30.0  # segundos de áudio considerados em cada atualização
+    LIVE_INTERVAL: float = 5.0  # segundos de áudio entre atualizações
+    LIVE_BLOCK: float = 0.1  # segundos lidos da entrada por vez
+
+    # Serviço HTTP local
+    SERVICE_HOST: str = "127.0.0.1"
+    SERVICE_PORT: int = 8765
+    SERVICE_WORKERS: int = 0  # 0 = um processo por núcleo
+    SERVICE_QUEUE_SIZE: int = 32
+    SERVICE_TIMEOUT: float = 300.0  # segundos por pedido
+    SERVICE_MAX_UPLOAD_BYTES: int = 512 * 1024 * 1024
+
+    # Processos aquecidos (serviço e interface): novas tentativas quando o aquecimento falha
+    WORKER_START_RETRIES: int = 3
+    WORKER_START_BACKOFF: float = 1.0  # segundos antes da segunda tentativa; dobra a cada falha
+
 
 settings = Settings()
@@ -0,0 +1,294 @@
+"""
+Music-Makro - Analysis Queue
+Fila de análises da interface gráfica sobre processos aquecidos
+
+Cada posição do pool tem uma thread que retira jobs da fila e os entrega ao
+seu PoolWorker (o mesmo processo aquecido de core.service). As threads só
+alteram o estado dos jobs; a interface consulta changes() periodicamente na
+thread do Tk, sem receber callbacks de outras threads.
+
+Os núcleos que sobram por processo da fila vão para os extratores de cada
+faixa (core.parallel), o que reduz a espera por uma análise isolada.
+"""
+
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from config import settings
+
+# Estados de um job que não mudam mais
+FINISHED = ("ok", "error", "timeout", "cancelled")
+
+
+def default_workers() -> int:
+    """Processos da interface: settings.GUI_WORKERS, ou metade dos núcleos"""
+    return settings.GUI_WORKERS or max(1, (os.cpu_count() or 2) // 2)
+
+
+def analysis_workers(workers: int) -> int:
+    """Processos por faixa: settings.GUI_ANALYSIS_WORKERS, ou os núcleos divididos entre os da fila"""
+    return settings.GUI_ANALYSIS_WORKERS or max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+class Job:
+    """Uma análise da fila: estado, etapa atual e registro final"""
+
+    def __init__(self, job_id: int, path: str, mode: str, features):
+        self.id = job_id
+        self.path = path
+        self.mode = mode
+        self.features = features
+        self.status = "queued"  # queued, running, ok, error, timeout, cancelled
+        self.stage = None
+        self.stage_times = {}
+        self.progress = 0.0
+        self.record = None
+        self.started = None
+        self.finished = None
+        self.worker = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def elapsed(self) -> float:
+        """Segundos desde o início da análise (até o fim, se terminou)"""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+
+class AnalysisQueue:
+    """Fila de jobs atendida por um número ajustável de processos"""
+
+    def __init__(self, workers: int = None, cache_path: str = None, timeout: float = None):
+        self.workers = workers or default_workers()
+        self.cache_path = cache_path
+        self.timeout = timeout if timeout is not None else settings.BATCH_TIMEOUT
+        self._ctx = multiprocessing.get_context("spawn")
+        self._pending = queue.Queue()
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._changed = set()
+        self._threads = {}
+        self._workers = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        # Processos com análise paralela não são daemon: encerra-os mesmo sem close()
+        atexit.register(self.close)
+        self.resize(self.workers)
+
+    def resize(self, workers: int):
+        """Ajusta o número de processos; os excedentes saem depois do job em andamento
+
+        Os processos por faixa valem para os processos criados a partir daqui.
+        """
+        with self._lock:
+            self.workers = max(1, workers)
+            for index in range(self.workers):
+                thread = self._threads.get(index)
+                if thread is None or not thread.is_alive():
+                    thread = threading.Thread(target=self._serve, args=(index,), daemon=True)
+                    self._threads[index] = thread
+                    thread.start()
+
+    def submit(self, path: str, mode: str = "full", features=None) -> Job:
+        """Enfileira uma análise e retorna o job"""
+        with self._lock:
+            job = Job(next(self._ids), path, mode, features)
+            self._jobs[job.id] = job
+            self._changed.add(job.id)
+        self._pending.put(job)
+        return job
+
+    def job(self, job_id: int) -> Job:
+        return self._jobs[job_id]
+
+    def changes(self) -> list:
+        """Jobs alterados desde a última chamada, mais os em andamento (etapa, tempos e progresso)
+
+        Nos jobs em andamento, stage_times inclui a etapa atual com o tempo decorrido até agora.
+        """
+        with self._lock:
+            ids = self._changed | {job.id for job in self._jobs.values() if job.status == "running"}
+            self._changed = set()
+            jobs = [self._jobs[job_id] for job_id in sorted(ids) if job_id in self._jobs]
+            for job in jobs:
+                if job.status == "running" and job.worker is not None:
+                    self._sync(job)
+        return jobs
+
+    def _sync(self, job: Job):
+        """Copia do PoolWorker a etapa, os tempos e o progresso de um job em andamento"""
+        worker = job.worker
+        job.stage = worker.stage
+        job.progress = worker.progress
+        stage_times = dict(worker.stage_times)
+        started = worker.stage_started
+        if worker.stage is not None and started is not None:
+            stage_times[worker.stage] = time.monotonic() - started
+        job.stage_times = stage_times
+
+    def progress(self) -> float:
+        """Fração concluída da fila: jobs terminados contam 1, os em andamento a fração informada pela análise"""
+        with self._lock:
+            if not self._jobs:
+                return 0.0
+            done = 0.0
+            for job in self._jobs.values():
+                if job.done:
+                    done += 1.0
+                elif job.status == "running" and job.worker is not None:
+                    done += job.worker.progress
+            return done / len(self._jobs)
+
+    def counts(self) -> dict:
+        """Número de jobs por estado"""
+        counts = {}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def cancel(self, job_ids=None, grace: float = None):
+        """Cancela jobs na fila ou em andamento (todos se job_ids for None)
+
+        Um job em andamento recebe um pedido de cancelamento cooperativo e o
+        processo continua aquecido para o próximo job. Se a análise não parar
+        em grace segundos (padrão: GUI_CANCEL_GRACE; ex.: presa dentro de um
+        extrator), o processo é encerrado e a posição do pool abre outro.
+        """
+        with self._lock:
+            jobs = self._jobs.values() if job_ids is None else [self._jobs[i] for i in job_ids if i in self._jobs]
+            workers = []
+            for job in jobs:
+                if job.done:
+                    continue
+                if job.worker is not None:
+                    workers.append((job.worker, job))
+                job.status = "cancelled"
+                job.finished = time.monotonic()
+                self._changed.add(job.id)
+        grace = settings.GUI_CANCEL_GRACE if grace is None else grace
+        for worker, job in workers:
+            worker.cancel()
+            if grace > 0:
+                timer = threading.Timer(grace, self._terminate_stuck, args=(worker, job))
+                timer.daemon = True
+                timer.start()
+            else:
+                worker.process.terminate()
+
+    def _terminate_stuck(self, worker, job: Job):
+        """Encerra o processo se ainda estiver no job cancelado"""
+        with self._lock:
+            stuck = job.worker is worker
+        if stuck:
+            worker.process.terminate()
+
+    def forget(self) -> list:
+        """Descarta os jobs concluídos; retorna seus ids"""
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.done]
+            for job_id in finished:
+                del self._jobs[job_id]
+        return finished
+
+    def close(self):
+        """Cancela tudo e encerra os processos"""
+        self._closed.set()
+        self.cancel(grace=0)
+        for worker in list(self._workers.values()):
+            # Inclui os que ainda estão aquecendo
+            worker.process.terminate()
+        for thread in list(self._threads.values()):
+            thread.join(timeout=2)
+
+    def _fail_pending(self, error: str):
+        """Marca como erro os jobs ainda na fila"""
+        while True:
+            try:
+                job = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            with self._lock:
+                if job.status != "queued":
+                    continue
+                job.status = "error"
+                job.record = {"file": job.path, "status": "error", "error": error}
+                job.finished = time.monotonic()
+                self._changed.add(job.id)
+
+    def _serve(self, index: int):
+        """Thread de uma posição do pool: aquece o processo e atende a fila
+
+        Se o processo não aquece depois das novas tentativas de start_worker
+        (ex.: dependência ausente), os jobs da fila viram erro com a causa e
+        uma nova rodada de tentativas só começa quando chegar outro job.
+        """
+        # Importado aqui (fora da thread do Tk): core.service carrega o asyncio
+        from core.service import WorkerStartError, start_worker
+
+        def started(new_worker):
+            # Registrado antes do aquecimento: close() também encerra quem está aquecendo
+            self._workers[index] = new_worker
+
+        worker = None
+        try:
+            while not self._closed.is_set() and index < self.workers:
+                if worker is None:
+                    try:
+                        worker = start_worker(self._ctx, self.cache_path, analysis_workers(self.workers),
+                                              on_start=started, stopped=self._closed)
+                    except WorkerStartError as e:
+                        if self._closed.is_set():
+                            break
+                        self._fail_pending(f"Worker indisponível: {e}")
+                        while self._pending.empty() and not self._closed.wait(0.5):
+                            pass
+                        continue
+                try:
+                    job = self._pending.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+
+                with self._lock:
+                    if job.status != "queued":
+                        continue
+                    job.status = "running"
+                    job.started = time.monotonic()
+                    job.worker = worker
+                    self._changed.add(job.id)
+
+                try:
+                    record = worker.run((job.path, job.mode, job.features, True), self.timeout)
+                except TimeoutError as e:
+                    stage = e.args[0] if e.args else None
+                    record = {"file": job.path, "status": "timeout", "stage": stage,
+                              "error": f"Tempo limite de {self.timeout}s excedido" +
+                                       (f" (etapa: {stage})" if stage else "")}
+                    worker.kill()
+                    worker = None
+                except (EOFError, OSError):
+                    record = {"file": job.path, "status": "error", "error": "Worker encerrado inesperadamente"}
+                    worker.kill()
+                    worker = None
+
+                with self._lock:
+                    job.worker = None
+                    if job.status == "running":
+                        job.status = record["status"]
+                        job.record = record
+                        job.finished = time.monotonic()
+                        job.progress = 1.0
+                    self._changed.add(job.id)
+        finally:
+            self._workers.pop(index, None)
+            if worker is not None:
+                worker.stop()
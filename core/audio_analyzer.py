@@ -3,156 +3,581 @@ Music-Makro - Audio Analyzer
 Análise técnica de arquivos de áudio
 """
 
+import contextlib
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from core import startup
+
+# Antes do primeiro uso do librosa: librosa.beat com os kernels numba lidos do cache em disco
+startup.enable_jit_cache()
+
 import librosa
 import numpy as np
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3
+from config import settings
+from core.cancellation import CancellationToken
 from core.description_generator import DescriptionGenerator
+from core.feature_cache import FeatureCache
+from core.feature_context import FeatureContext
+from core.fingerprint import find_duplicate, fingerprint
+from core.ingest import AudioSource
+from core.parallel import ParallelHPSS, SharedArray, discard_pool, extract_sections, section_pool
+from core.timeline import TimelineBuilder
+
+# Versão do conjunto de extratores: incrementar sempre que a saída de analyze() mudar
+ANALYZER_VERSION = "1.3"
+
+# Parâmetros dos extratores (também compõem a chave do cache de features)
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MFCC = 13
+
+SECTIONS = ("metadata", "temporal", "spectral", "rhythmic", "harmonic", "energy")
+
+# Seções agrupadas por processo na extração paralela (metadados e harmônica
+# ficam no processo principal; a HPSS da harmônica é dividida à parte)
+PARALLEL_GROUPS = (("rhythmic",), ("spectral",), ("temporal", "energy"))
+
+# Seções calculadas só quando pedidas explicitamente (fora da análise padrão)
+OPTIONAL_SECTIONS = ("timeline",)
+ALL_FEATURES = SECTIONS + OPTIONAL_SECTIONS
+
+# Peso relativo de cada etapa na barra de progresso (proporcional ao tempo
+# medido com benchmarks/run_benchmarks.py; o tonnetz domina a etapa harmônica)
+STAGE_WEIGHTS = {
+    "cache": 1,
+    "load": 3,
+    "fingerprint": 1,
+    "metadata": 1,
+    "temporal": 3,
+    "spectral": 10,
+    "rhythmic": 8,
+    "harmonic": 72,
+    "energy": 1,
+    "timeline": 2,
+    "description": 1
+}
+
+
+def parse_features(features) -> dict:
+    """Converte ["seção.chave", "seção", ...] em {seção: {chaves} ou None}; None = tudo"""
+    if features is None:
+        return None
+    
+    requested = {}
+    for name in features:
+        section, _, key = name.partition(".")
+        if section not in ALL_FEATURES:
+            raise ValueError(f"Seção de features desconhecida: {section}")
+        if not key:
+            requested[section] = None
+        elif requested.get(section, set()) is not None:
+            requested.setdefault(section, set()).add(key)
+    return requested
+
+
+def covers_features(features, required) -> bool:
+    """Indica se o subconjunto features inclui todas as features em required"""
+    requested = parse_features(features)
+    if requested is None:
+        return True
+    for name in required:
+        section, _, key = name.partition(".")
+        if section not in requested:
+            return False
+        if requested[section] is not None and key and key not in requested[section]:
+            return False
+    return True
+
+
+def select_features(result: dict, requested) -> dict:
+    """Restringe um resultado às chaves pedidas (seções extras são preservadas)"""
+    if requested is None:
+        return result
+    
+    selected = {}
+    for section, values in result.items():
+        if section not in SECTIONS:
+            selected[section] = values
+        elif section in requested:
+            keys = requested[section]
+            selected[section] = dict(values) if keys is None or "error" in values else {
+                key: value for key, value in values.items() if key in keys
+            }
+    return selected
+
+
+def _summary_keys(name: str) -> tuple:
+    return (f"{name}_mean", f"{name}_std", f"{name}_means", f"{name}_stds")
+
+
+def _summarize(name: str, matrix) -> dict:
+    """Média e desvio globais mais os vetores por coeficiente (usados pelo índice de similaridade)"""
+    return {
+        f"{name}_mean": float(np.mean(matrix)),
+        f"{name}_std": float(np.std(matrix)),
+        f"{name}_means": [float(v) for v in np.mean(matrix, axis=1)],
+        f"{name}_stds": [float(v) for v in np.std(matrix, axis=1)]
+    }
+
+
+def _wants(keys, *names) -> bool:
+    """Indica se algum dos nomes foi pedido (keys None = todos)"""
+    return keys is None or any(name in keys for name in names)
 
 class AudioAnalyzer:
-    """Analisador de áudio com extração de features"""
+    """Analisador de áudio com extração de features
+    
+    Ganchos opcionais:
+        on_stage(etapa, "start" | "end", segundos) no início e no fim de cada etapa;
+        on_progress(fração, etapa) com o progresso estimado entre 0 e 1;
+        cancel_token: CancellationToken verificado entre etapas.
+    Os ganchos são chamados na thread da análise. A duração de cada etapa
+    fica em stage_timings.
+    
+    workers > 1 distribui os extratores em processos (ver core.parallel);
+    o padrão é settings.ANALYSIS_WORKERS.
+    
+    Com cache, a impressão digital do áudio é comparada com as faixas já
+    analisadas (ver core.fingerprint); numa quase duplicata as features são
+    reaproveitadas e duplicate_of indica a faixa de origem. Com
+    index_fingerprint=False (arquivos temporários) o arquivo é comparado mas
+    não entra no índice, que guarda o caminho para informar a origem.
+    
+    pcm_cache (core.pcm_cache.PCMCache) guarda o áudio decodificado: uma nova
+    análise do mesmo conteúdo, com outros parâmetros, mapeia o sinal do disco
+    em vez de decodificar o arquivo.
+    """
     
-    def __init__(self, file_path: str):
+    stage_weights = STAGE_WEIGHTS
+    supports_timeline = True
+    supports_parallel = True
+    supports_fingerprint = True
+    
+    def __init__(self, file_path: str, cache: FeatureCache = None, on_stage=None, on_progress=None,
+                 cancel_token: CancellationToken = None, workers: int = None, pcm_cache=None,
+                 index_fingerprint: bool = True):
         self.file_path = file_path
+        self.cache = cache
+        self.pcm_cache = pcm_cache
+        self.index_fingerprint = index_fingerprint
+        self.on_stage = on_stage
+        self.on_progress = on_progress
+        self.cancel_token = cancel_token
+        self.workers = settings.ANALYSIS_WORKERS if workers is None else workers
+        self.stage_timings = {}
         self.y = None
         self.sr = None
+        self.context = None
+        self.frames = {}
+        self.fingerprint = None
+        self.duplicate_of = None
+        self._source = None
+        self._planned = 1
+        self._done = 0
+        self._current = None
+        
+    def params(self) -> dict:
+        """Parâmetros que determinam o resultado da análise"""
+        return {
+            "version": ANALYZER_VERSION,
+            "n_fft": N_FFT,
+            "hop_length": HOP_LENGTH,
+            "n_mfcc": N_MFCC
+        }
+    
+    @property
+    def source(self) -> AudioSource:
+        """Conteúdo do arquivo, lido uma única vez para hash, metadados e áudio"""
+        if self._source is None:
+            self._source = self._open_source()
+        return self._source
+    
+    def _open_source(self) -> AudioSource:
+        return AudioSource(self.file_path, pcm_cache=self.pcm_cache)
+    
+    def analyze(self, features=None) -> dict:
+        """Executa a análise do arquivo de áudio
         
-    def analyze(self) -> dict:
-        """Executa análise completa do arquivo de áudio"""
+        features restringe o cálculo a um subconjunto, com nomes no formato
+        "seção.chave" (ex.: "rhythmic.tempo_bpm") ou apenas "seção". Só os
+        extratores necessários para essas chaves são executados; sem o
+        argumento, a análise é completa. A seção "timeline" (evolução das
+        features ao longo da faixa) só é calculada quando pedida, por exemplo
+        com features=ALL_FEATURES.
+        """
         print(f"\n[Music-Makro] Analisando: {self.file_path}")
+        requested = parse_features(features)
+        self._plan((["cache"] if self.cache is not None else []) + self._stages(requested))
         
-        # Carregar áudio
-        print("→ Carregando áudio...")
-        self.y, self.sr = librosa.load(self.file_path, sr=None)
+        keys = []
+        if self.cache is not None:
+            with self._stage("cache"):
+                keys = self._cache_keys(features, requested)
+                cached = None
+                for key, params in keys:
+                    cached = self.cache.get(key)
+                    if cached is not None:
+                        break
+            if cached is not None:
+                print("→ Features recuperadas do cache")
+                self._advance(1.0, complete=True)
+                return select_features(cached, requested)
         
-        # Extrair features
-        metadata = self._extract_metadata()
-        temporal = self._analyze_temporal()
-        spectral = self._analyze_spectral()
-        rhythmic = self._analyze_rhythmic()
-        harmonic = self._analyze_harmonic()
-        energy = self._analyze_energy()
+        result = select_features(self._compute(requested), requested)
         
-        return {
-            "metadata": metadata,
-            "temporal": temporal,
-            "spectral": spectral,
-            "rhythmic": rhythmic,
-            "harmonic": harmonic,
-            "energy": energy
+        if keys:
+            key, params = keys[-1]
+            self.cache.put(key, result, self.source.digest, params)
+            # Só análises completas entram no índice: servem a qualquer subconjunto
+            if (self.fingerprint is not None and self.index_fingerprint and requested is None
+                    and self.duplicate_of is None):
+                self.cache.put_fingerprint(key, self.file_path, len(self.y) / self.sr,
+                                           *(values.tolist() for values in self.fingerprint))
+        
+        self._advance(1.0, complete=True)
+        return result
+    
+    def _cache_keys(self, features, requested) -> list:
+        """[(chave, parâmetros)] consultados em ordem; o resultado é gravado na última"""
+        digest, params = self.source.digest, self.params()
+        keys = []
+        # Uma análise completa em cache atende qualquer subconjunto sem a timeline
+        if not self._wants_timeline(requested):
+            keys.append((FeatureCache.make_key(digest, params), params))
+        if requested is not None:
+            params = dict(params, features=sorted(set(features)))
+            keys.append((FeatureCache.make_key(digest, params), params))
+        return keys
+    
+    def prefetch(self, features=None):
+        """Lê e decodifica o arquivo antes de analyze() (chamado por outra thread)
+        
+        Nada é decodificado se o resultado já está no cache.
+        """
+        if self.cache is not None:
+            keys = self._cache_keys(features, parse_features(features))
+            if any(self.cache.contains(key) for key, params in keys):
+                return
+        self._prefetch_audio()
+    
+    def _prefetch_audio(self):
+        self.source.prefetch()
+    
+    def _stages(self, requested=None) -> list:
+        """Etapas executadas por _compute, na ordem (base do progresso)"""
+        stages = ["load"] + (["fingerprint"] if self._wants_fingerprint(requested) else [])
+        stages += [s for s in SECTIONS if requested is None or s in requested]
+        return stages + (["timeline"] if self._wants_timeline(requested) else [])
+    
+    def _wants_timeline(self, requested) -> bool:
+        return self.supports_timeline and requested is not None and "timeline" in requested
+    
+    def _wants_fingerprint(self, requested) -> bool:
+        # A timeline depende do alinhamento exato do áudio: não é reaproveitada
+        return (self.supports_fingerprint and self.cache is not None and settings.FINGERPRINT_ENABLED
+                and not self._wants_timeline(requested))
+    
+    def _plan(self, stages):
+        self._planned = sum(self.stage_weights.get(stage, 1) for stage in stages) or 1
+        self._done = 0
+        self.stage_timings = {}
+    
+    @contextlib.contextmanager
+    def _stage(self, name: str):
+        """Delimita uma etapa: cancelamento, eventos, duração e progresso"""
+        self._check_cancelled()
+        if self.on_stage:
+            self.on_stage(name, "start", None)
+        self._current = name
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        self.stage_timings[name] = seconds
+        self._done += self.stage_weights.get(name, 1)
+        self._current = None
+        if self.on_stage:
+            self.on_stage(name, "end", seconds)
+        self._advance(0.0)
+    
+    def _advance(self, within: float, complete: bool = False):
+        """Informa o progresso (fração da etapa atual concluída) e verifica o cancelamento"""
+        if self.on_progress:
+            if complete:
+                fraction = 1.0
+            else:
+                current = self.stage_weights.get(self._current, 1) if self._current else 0
+                fraction = min((self._done + current * within) / self._planned, 1.0)
+            self.on_progress(fraction, self._current)
+        if not complete:
+            self._check_cancelled()
+    
+    def _check_cancelled(self):
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+    
+    def _compute(self, requested=None) -> dict:
+        """Carrega o áudio inteiro e executa os extratores pedidos (ou reaproveita os de uma quase duplicata)"""
+        with self._stage("load"):
+            self._load_audio()
+        if self._wants_fingerprint(requested):
+            with self._stage("fingerprint"):
+                result = self._reuse_duplicate()
+            if result is not None:
+                return result
+        return self._extract_features(requested)
+    
+    def _reuse_duplicate(self):
+        """Resultado em cache de uma quase duplicata, com os metadados deste arquivo (ou None)"""
+        self.fingerprint = fingerprint(self.y, self.sr)
+        match = find_duplicate(self.cache, *self.fingerprint, duration=len(self.y) / self.sr,
+                               params=self.params())
+        cached = self.cache.get(match["key"]) if match is not None else None
+        if cached is None:
+            return None
+        print(f"→ Quase duplicata de {match['file']} ({match['score']:.0%} dos hashes): features reaproveitadas")
+        self.duplicate_of = match
+        return dict(cached, metadata=self._extract_metadata())
+    
+    def _load_audio(self):
+        """Decodifica o arquivo na taxa nativa e prepara o contexto espectral"""
+        print("→ Carregando áudio...")
+        self.y, self.sr = self.source.decode()
+        self.context = FeatureContext(self.y, self.sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    
+    def _extract_features(self, requested=None) -> dict:
+        """Executa os extratores sobre o áudio carregado"""
+        pool = section_pool(self.workers) if self.supports_parallel else None
+        if pool is not None:
+            return self._extract_parallel(requested, pool)
+        
+        extractors = {
+            "metadata": self._extract_metadata,
+            "temporal": self._analyze_temporal,
+            "spectral": self._analyze_spectral,
+            "rhythmic": self._analyze_rhythmic,
+            "harmonic": self._analyze_harmonic,
+            "energy": self._analyze_energy
         }
+        
+        result = {}
+        for section, extractor in extractors.items():
+            if requested is not None and section not in requested:
+                continue
+            with self._stage(section):
+                if requested is None or section == "metadata":
+                    result[section] = extractor()
+                else:
+                    result[section] = extractor(requested[section])
+        
+        if self._wants_timeline(requested):
+            with self._stage("timeline"):
+                result["timeline"] = self._analyze_timeline()
+        return result
     
-    def _extract_metadata(self) -> dict:
-        """Extrai metadados do arquivo MP3"""
+    def _extract_parallel(self, requested, pool) -> dict:
+        """_extract_features com os grupos de PARALLEL_GROUPS e a HPSS no pool de processos
+        
+        O sinal vai uma vez para a memória compartilhada. Metadados e a etapa
+        harmônica rodam neste processo enquanto o pool calcula o restante;
+        a duração das demais etapas é a espera pelo resultado.
+        """
+        sections = [s for s in SECTIONS if requested is None or s in requested]
+        keys = {s: None if requested is None else requested[s] for s in sections}
+        hpss = None
+        futures = {}
         try:
-            audio = MP3(self.file_path)
-            duration = audio.info.length
-            bitrate = audio.info.bitrate
-            sample_rate = audio.info.sample_rate
-            
-            try:
-                tags = ID3(self.file_path)
-                title = str(tags.get('TIT2', 'Unknown'))
-                artist = str(tags.get('TPE1', 'Unknown'))
-                genre = str(tags.get('TCON', 'Unknown'))
-            except:
-                title = artist = genre = 'Unknown'
-            
-            return {
-                "duration": round(duration, 2),
-                "bitrate": bitrate,
-                "sample_rate": sample_rate,
-                "title": title,
-                "artist": artist,
-                "genre": genre
-            }
-        except Exception as e:
-            return {"error": str(e)}
+            with SharedArray.copy_of(self.y) as signal:
+                if "harmonic" in keys and _wants(keys["harmonic"], "harmonic_ratio", "percussive_ratio",
+                                                 *_summary_keys("tonnetz")):
+                    # Enviada primeiro: é o caminho crítico
+                    hpss = ParallelHPSS(pool, self.context.stft, self.workers)
+                for group in PARALLEL_GROUPS:
+                    subset = {s: keys[s] for s in group if s in keys}
+                    if subset:
+                        future = pool.submit(extract_sections, type(self), self.file_path, signal.spec,
+                                             self.sr, self.context.n_fft, self.context.hop_length, subset)
+                        futures.update(dict.fromkeys(subset, future))
+                
+                result = {}
+                for section in sorted(sections, key=lambda s: s in futures):
+                    with self._stage(section):
+                        if section == "metadata":
+                            result[section] = self._extract_metadata()
+                        elif section == "harmonic":
+                            if hpss is not None:
+                                self.context.hpss_stft = hpss.result()
+                            result[section] = self._analyze_harmonic(keys[section])
+                        else:
+                            values, frames = futures[section].result()
+                            result[section] = values[section]
+                            self.frames.update(frames)
+        except BrokenProcessPool:
+            # Um processo do pool morreu: o próximo uso cria outro pool
+            discard_pool()
+            raise
+        finally:
+            for future in futures.values():
+                future.cancel()
+            if hpss is not None:
+                hpss.close()
+        
+        result = {section: result[section] for section in sections}
+        if self._wants_timeline(requested):
+            with self._stage("timeline"):
+                result["timeline"] = self._analyze_timeline()
+        return result
     
-    def _analyze_temporal(self) -> dict:
+    def _frames(self, name: str, compute) -> np.ndarray:
+        """Matriz por frame de um extrator, calculada uma vez e reaproveitada pela timeline"""
+        if name not in self.frames:
+            self.frames[name] = compute()
+        return self.frames[name]
+    
+    def _extract_metadata(self) -> dict:
+        """Extrai metadados (MP3, FLAC, WAV, OGG e M4A)"""
+        return self.source.metadata()
+    
+    def _analyze_temporal(self, keys=None) -> dict:
         """Análise de características temporais"""
-        rms = librosa.feature.rms(y=self.y)[0]
-        zcr = librosa.feature.zero_crossing_rate(self.y)[0]
+        result = {}
         
-        return {
-            "rms_mean": float(np.mean(rms)),
-            "rms_std": float(np.std(rms)),
-            "rms_max": float(np.max(rms)),
-            "zcr_mean": float(np.mean(zcr)),
-            "zcr_std": float(np.std(zcr))
-        }
+        if _wants(keys, "rms_mean", "rms_std", "rms_max"):
+            rms = self.context.rms
+            result.update({
+                "rms_mean": float(np.mean(rms)),
+                "rms_std": float(np.std(rms)),
+                "rms_max": float(np.max(rms))
+            })
+        
+        if _wants(keys, "zcr_mean", "zcr_std"):
+            zcr = librosa.feature.zero_crossing_rate(
+                self.y, frame_length=self.context.n_fft, hop_length=self.context.hop_length
+            )[0]
+            result.update({
+                "zcr_mean": float(np.mean(zcr)),
+                "zcr_std": float(np.std(zcr))
+            })
+        
+        return result
     
-    def _analyze_spectral(self) -> dict:
+    def _analyze_spectral(self, keys=None) -> dict:
         """Análise espectral"""
-        spectral_centroids = librosa.feature.spectral_centroid(y=self.y, sr=self.sr)[0]
-        spectral_bandwidth = librosa.feature.spectral_bandwidth(y=self.y, sr=self.sr)[0]
-        spectral_rolloff = librosa.feature.spectral_rolloff(y=self.y, sr=self.sr)[0]
-        spectral_contrast = librosa.feature.spectral_contrast(y=self.y, sr=self.sr)
-        spectral_flatness = librosa.feature.spectral_flatness(y=self.y)[0]
+        S = self.context.magnitude
+        extractors = (
+            ("centroid", lambda: librosa.feature.spectral_centroid(S=S, sr=self.sr)[0]),
+            ("bandwidth", lambda: librosa.feature.spectral_bandwidth(S=S, sr=self.sr)[0]),
+            ("rolloff", lambda: librosa.feature.spectral_rolloff(S=S, sr=self.sr)[0]),
+            ("contrast", lambda: librosa.feature.spectral_contrast(S=S, sr=self.sr)),
+            ("flatness", lambda: librosa.feature.spectral_flatness(S=S)[0])
+        )
         
-        return {
-            "centroid_mean": float(np.mean(spectral_centroids)),
-            "centroid_std": float(np.std(spectral_centroids)),
-            "bandwidth_mean": float(np.mean(spectral_bandwidth)),
-            "bandwidth_std": float(np.std(spectral_bandwidth)),
-            "rolloff_mean": float(np.mean(spectral_rolloff)),
-            "rolloff_std": float(np.std(spectral_rolloff)),
-            "contrast_mean": float(np.mean(spectral_contrast)),
-            "contrast_std": float(np.std(spectral_contrast)),
-            "flatness_mean": float(np.mean(spectral_flatness)),
-            "flatness_std": float(np.std(spectral_flatness))
-        }
+        result = {}
+        for name, extract in extractors:
+            if _wants(keys, f"{name}_mean", f"{name}_std"):
+                values = self._frames(name, extract)
+                result[f"{name}_mean"] = float(np.mean(values))
+                result[f"{name}_std"] = float(np.std(values))
+        return result
     
-    def _analyze_rhythmic(self) -> dict:
+    def _analyze_rhythmic(self, keys=None) -> dict:
         """Análise rítmica"""
-        tempo, beats = librosa.beat.beat_track(y=self.y, sr=self.sr)
-        onset_env = librosa.onset.onset_strength(y=self.y, sr=self.sr)
-        tempogram = librosa.feature.tempogram(onset_envelope=onset_env, sr=self.sr)
+        result = {}
         
-        return {
-            "tempo_bpm": float(tempo),
-            "beats_count": len(beats),
-            "onset_strength_mean": float(np.mean(onset_env)),
-            "onset_strength_max": float(np.max(onset_env)),
-            "tempogram_mean": float(np.mean(tempogram)),
-            "tempogram_std": float(np.std(tempogram))
-        }
+        if _wants(keys, "tempo_bpm", "beats_count"):
+            tempo, beats = librosa.beat.beat_track(
+                onset_envelope=self.context.beat_onset_env,
+                sr=self.sr,
+                hop_length=self.context.hop_length
+            )
+            result.update({
+                "tempo_bpm": float(np.atleast_1d(tempo)[0]),
+                "beats_count": len(beats)
+            })
+        
+        if _wants(keys, "onset_strength_mean", "onset_strength_max"):
+            onset_env = self.context.onset_env
+            result.update({
+                "onset_strength_mean": float(np.mean(onset_env)),
+                "onset_strength_max": float(np.max(onset_env))
+            })
+        
+        if _wants(keys, "tempogram_mean", "tempogram_std"):
+            tempogram = librosa.feature.tempogram(
+                onset_envelope=self.context.onset_env,
+                sr=self.sr,
+                hop_length=self.context.hop_length
+            )
+            result.update({
+                "tempogram_mean": float(np.mean(tempogram)),
+                "tempogram_std": float(np.std(tempogram))
+            })
+        
+        return result
     
-    def _analyze_harmonic(self) -> dict:
+    def _analyze_harmonic(self, keys=None) -> dict:
         """Análise harmônica"""
-        y_harmonic, y_percussive = librosa.effects.hpss(self.y)
-        chroma = librosa.feature.chroma_stft(y=self.y, sr=self.sr)
-        mfccs = librosa.feature.mfcc(y=self.y, sr=self.sr, n_mfcc=13)
-        tonnetz = librosa.feature.tonnetz(y=y_harmonic, sr=self.sr)
+        result = {}
         
-        return {
-            "harmonic_ratio": float(np.sum(np.abs(y_harmonic)) / np.sum(np.abs(self.y))),
-            "percussive_ratio": float(np.sum(np.abs(y_percussive)) / np.sum(np.abs(self.y))),
-            "chroma_mean": float(np.mean(chroma)),
-            "chroma_std": float(np.std(chroma)),
-            "mfcc_mean": float(np.mean(mfccs)),
-            "mfcc_std": float(np.std(mfccs)),
-            "tonnetz_mean": float(np.mean(tonnetz)),
-            "tonnetz_std": float(np.std(tonnetz))
-        }
+        if _wants(keys, "harmonic_ratio", "percussive_ratio"):
+            y_harmonic, y_percussive = self.context.hpss
+            total_amplitude = np.sum(np.abs(self.y))
+            result.update({
+                "harmonic_ratio": float(np.sum(np.abs(y_harmonic)) / total_amplitude),
+                "percussive_ratio": float(np.sum(np.abs(y_percussive)) / total_amplitude)
+            })
+        
+        if _wants(keys, *_summary_keys("chroma")):
+            chroma = librosa.feature.chroma_stft(S=self.context.power, sr=self.sr)
+            result.update(_summarize("chroma", chroma))
+        
+        if _wants(keys, *_summary_keys("mfcc")):
+            mfccs = self._frames("mfcc", lambda: librosa.feature.mfcc(S=self.context.log_mel, n_mfcc=N_MFCC))
+            result.update(_summarize("mfcc", mfccs))
+        
+        if _wants(keys, *_summary_keys("tonnetz")):
+            # CQT extra sobre o sinal harmônico: o extrator mais caro
+            y_harmonic, _ = self.context.hpss
+            tonnetz = librosa.feature.tonnetz(y=y_harmonic, sr=self.sr, hop_length=self.context.hop_length)
+            result.update(_summarize("tonnetz", tonnetz))
+        
+        return result
     
-    def _analyze_energy(self) -> dict:
+    def _analyze_energy(self, keys=None) -> dict:
         """Análise de energia e dinâmica"""
-        total_energy = np.sum(self.y ** 2)
-        S = librosa.stft(self.y)
-        loudness = librosa.amplitude_to_db(np.abs(S), ref=np.max)
-        rms = librosa.feature.rms(y=self.y)[0]
-        dynamic_range = np.max(rms) - np.min(rms)
+        result = {}
         
-        return {
-            "total_energy": float(total_energy),
-            "loudness_mean": float(np.mean(loudness)),
-            "loudness_max": float(np.max(loudness)),
-            "loudness_min": float(np.min(loudness)),
-            "dynamic_range": float(dynamic_range)
-        }
+        if _wants(keys, "total_energy"):
+            result["total_energy"] = float(np.sum(self.y ** 2))
+        
+        if _wants(keys, "loudness_mean", "loudness_max", "loudness_min"):
+            loudness = librosa.amplitude_to_db(self.context.magnitude, ref=np.max)
+            result.update({
+                "loudness_mean": float(np.mean(loudness)),
+                "loudness_max": float(np.max(loudness)),
+                "loudness_min": float(np.min(loudness))
+            })
+        
+        if _wants(keys, "dynamic_range"):
+            rms = self.context.rms
+            result["dynamic_range"] = float(np.max(rms) - np.min(rms))
+        
+        return result
+    
+    def _analyze_timeline(self) -> dict:
+        """Evolução de RMS, centróide e densidade de onsets, com as seções da faixa"""
+        S = self.context.magnitude
+        timeline = TimelineBuilder(self.sr, self.context.hop_length)
+        timeline.add("rms", self.context.rms)
+        timeline.add("centroid", self._frames(
+            "centroid", lambda: librosa.feature.spectral_centroid(S=S, sr=self.sr)[0]))
+        timeline.add("timbre", self._frames(
+            "mfcc", lambda: librosa.feature.mfcc(S=self.context.log_mel, n_mfcc=N_MFCC)))
+        timeline.add_onsets(self.context.onset_env)
+        return timeline.result()
     
     def generate_description(self, technical_data: dict) -> str:
         """Gera descrição textual para Ace Step 1.5"""
-        generator = DescriptionGenerator(technical_data)
-        return generator.generate()
\ No newline at end of file
+        with self._stage("description"):
+            generator = DescriptionGenerator(technical_data)
+            return generator.generate()
\ No newline at end of file
@@ -0,0 +1,368 @@
+"""
+Music-Makro - Batch Runner
+Análise em lote de bibliotecas musicais em um pool de processos
+"""
+
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+from config import settings
+from core.cancellation import AnalysisCancelled
+from core.prefetch import PrefetchPipeline, bottleneck
+
+
+def find_audio_files(paths, extensions=None, file_list=None) -> list:
+    """Lista arquivos de áudio a partir de diretórios, arquivos avulsos e/ou uma lista em texto"""
+    extensions = tuple(ext.lower() for ext in (extensions or settings.AUDIO_EXTENSIONS))
+    found = []
+
+    candidates = list(paths or [])
+    if file_list:
+        with open(file_list, 'r', encoding='utf-8') as f:
+            candidates.extend(line.strip() for line in f if line.strip())
+
+    for path in candidates:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(extensions):
+                        found.append(os.path.join(root, name))
+        else:
+            found.append(path)
+
+    return found
+
+
+def load_checkpoint(output_path: str) -> set:
+    """Retorna os arquivos já registrados no JSONL de resultados"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["file"])
+            except (ValueError, KeyError):
+                # Linha truncada por uma interrupção anterior
+                continue
+    return done
+
+
+def create_analyzer(file_path: str, mode: str = "full", cache=None, pcm_cache=None,
+                    index_fingerprint: bool = True, **hooks):
+    """Instancia o analisador correspondente ao modo ("full", "stream" ou "preview")
+
+    hooks são repassados ao construtor (on_stage, on_progress, cancel_token).
+    pcm_cache e index_fingerprint só valem para o modo "full": os demais não
+    decodificam a faixa inteira nem usam impressões digitais.
+    """
+    if mode == "stream":
+        from core.streaming_analyzer import StreamingAnalyzer
+        return StreamingAnalyzer(file_path, cache=cache, **hooks)
+    if mode == "preview":
+        from core.preview_analyzer import PreviewAnalyzer
+        return PreviewAnalyzer(file_path, cache=cache, **hooks)
+    if mode != "full":
+        raise ValueError(f"Modo de análise desconhecido: {mode}")
+
+    from core.audio_analyzer import AudioAnalyzer
+    return AudioAnalyzer(file_path, cache=cache, pcm_cache=pcm_cache, index_fingerprint=index_fingerprint,
+                         **hooks)
+
+
+def analyze_track(file_path: str, cache=None, mode: str = "full", features=None, on_stage=None,
+                  analyzer=None, pcm_cache=None, on_progress=None, index_fingerprint: bool = True,
+                  cancel_token=None) -> dict:
+    """Analisa um arquivo e monta o registro JSON correspondente
+
+    features restringe a análise a um subconjunto (ver AudioAnalyzer.analyze).
+    analyzer é um analisador já criado para o arquivo (ex.: com o áudio pré-carregado).
+    on_stage e on_progress são os ganchos de AudioAnalyzer.
+    index_fingerprint=False não registra o caminho no índice de impressões
+    digitais (arquivos temporários, que deixarão de existir).
+    cancel_token (core.cancellation.CancellationToken) interrompe a análise
+    entre etapas; o registro sai com status "cancelled".
+    """
+    record = {"file": file_path, "status": "ok"}
+    timings = {}
+    start = time.perf_counter()
+    try:
+        if analyzer is None:
+            analyzer = create_analyzer(file_path, mode, cache, pcm_cache, index_fingerprint,
+                                       on_stage=on_stage, on_progress=on_progress, cancel_token=cancel_token)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = analyzer.analyze(features)
+        timings["analyze"] = round(time.perf_counter() - start, 3)
+        record["features"] = result
+        if analyzer.duplicate_of is not None:
+            record["duplicate_of"] = analyzer.duplicate_of["file"]
+
+        # Subconjuntos que não cobrem a descrição retornam só as features
+        from core.audio_analyzer import covers_features
+        from core.description_generator import DescriptionGenerator
+        if covers_features(features, DescriptionGenerator.REQUIRED_FEATURES):
+            step = time.perf_counter()
+            record["description"] = analyzer.generate_description(result)
+            timings["description"] = round(time.perf_counter() - step, 3)
+        else:
+            record["description"] = None
+    except AnalysisCancelled:
+        record["status"] = "cancelled"
+        record["error"] = "Análise cancelada"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+
+    timings["total"] = round(time.perf_counter() - start, 3)
+    if analyzer is not None:
+        timings["stages"] = {stage: round(seconds, 3) for stage, seconds in analyzer.stage_timings.items()}
+    record["timings"] = timings
+    return record
+
+
+def _worker_loop(conn, cache_path, mode, features, prefetch, pcm_cache_dir=None):
+    """Processo de trabalho: recebe caminhos pelo pipe e devolve ("start", arquivo),
+    ("stage", etapa) e ("record", registro)
+
+    Com prefetch > 0 o processo recebe os próximos arquivos adiantados e uma
+    PrefetchPipeline lê e decodifica até prefetch deles enquanto o atual é analisado.
+    Com pcm_cache_dir, o áudio decodificado é lido e gravado nesse cache de PCM.
+    """
+    from core import startup
+    from core.feature_cache import FeatureCache
+    from core.pcm_cache import PCMCache
+
+    # Imports do librosa e kernels numba antes da primeira faixa: senão o custo
+    # único entra na pré-carga (ou na análise) dela e distorce os tempos por etapa
+    startup.preload(startup.PRELOAD_MODULES + ("core.streaming_analyzer",))
+
+    def on_stage(stage, event, seconds):
+        if event == "start":
+            conn.send(("stage", stage))
+
+    def prepare(file_path):
+        analyzer = create_analyzer(file_path, mode, cache, pcm_cache, on_stage=on_stage)
+        analyzer.prefetch(features)
+        return analyzer
+
+    cache = FeatureCache(cache_path) if cache_path else None
+    pcm_cache = PCMCache(pcm_cache_dir) if pcm_cache_dir else None
+    pipeline = None
+    if prefetch:
+        pipeline = PrefetchPipeline(prepare, depth=prefetch, size=lambda analyzer: analyzer.source.nbytes)
+    assigned = deque()
+    try:
+        while True:
+            # Bloqueia só sem trabalho; senão recolhe os arquivos já enviados
+            while not assigned or conn.poll():
+                try:
+                    file_path = conn.recv()
+                except EOFError:
+                    return
+                if file_path is None:
+                    return
+                assigned.append(file_path)
+                if pipeline is not None:
+                    pipeline.submit(file_path)
+
+            file_path = assigned.popleft()
+            conn.send(("start", file_path))
+            analyzer, timings = None, {}
+            if pipeline is not None:
+                # Falha na pré-carga: analyze_track refaz a leitura e registra o erro
+                _, analyzer, _, waits = pipeline.take()
+                timings = {"prefetch": waits["load"], "prefetch_wait": waits["wait"],
+                           "prefetch_idle": waits["idle"]}
+            record = analyze_track(file_path, cache, mode, features, on_stage, analyzer=analyzer,
+                                   pcm_cache=pcm_cache)
+            record["timings"].update(timings)
+            conn.send(("record", record))
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+
+
+class _Worker:
+    """Processo de análise com os arquivos atribuídos e o atualmente em análise"""
+
+    def __init__(self, ctx, cache_path, mode, features=None, prefetch=0, pcm_cache_dir=None):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_loop,
+                                   args=(child_conn, cache_path, mode, features, prefetch, pcm_cache_dir),
+                                   daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.assigned = deque()
+        self.task = None
+        self.stage = None
+        self.started = 0.0
+
+    def submit(self, file_path: str):
+        self.assigned.append(file_path)
+        self.conn.send(file_path)
+
+    def start(self, file_path: str):
+        """O processo começou a analisar file_path (o timeout conta a partir daqui)"""
+        self.task = file_path
+        self.stage = None
+        self.started = time.monotonic()
+
+    def finish(self):
+        self.assigned.popleft()
+        self.task = None
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5)
+        self.conn.close()
+
+
+class BatchRunner:
+    """Distribui a análise em processos com timeout por arquivo e checkpoint em JSONL
+
+    Cada worker recebe os arquivos através de um pipe próprio: o atual e até
+    prefetch seguintes, que ele lê e decodifica durante a análise do atual. Um
+    worker que estoura o timeout ou morre (decoder travado, MP3 corrompido) é
+    encerrado e substituído sem afetar os demais; os arquivos adiantados a ele
+    voltam para a fila.
+    """
+
+    def __init__(self, workers: int = None, timeout: float = None, cache_path: str = None,
+                 mode: str = "full", features=None, prefetch: int = None, pcm_cache_dir: str = None):
+        self.workers = workers or settings.BATCH_WORKERS or os.cpu_count() or 1
+        self.timeout = timeout if timeout is not None else settings.BATCH_TIMEOUT
+        self.cache_path = cache_path
+        self.pcm_cache_dir = pcm_cache_dir
+        self.mode = mode
+        self.features = features
+        self.prefetch = settings.PREFETCH_DEPTH if prefetch is None else max(0, prefetch)
+        self._ctx = multiprocessing.get_context("spawn")
+
+    def run(self, files, output_path: str = None, resume: bool = True, on_record=None) -> dict:
+        """Processa os arquivos gravando um registro JSON por linha em output_path
+
+        Sem output_path os registros só são entregues a on_record. Com a
+        pré-carga ativa, summary["pipeline"] soma os tempos de decodificação
+        (decode), de espera da análise pela pré-carga (wait), de ociosidade das
+        threads de pré-carga (idle) e de análise, com o gargalo estimado.
+        """
+        done = load_checkpoint(output_path) if resume and output_path else set()
+        pending = deque(f for f in files if f not in done)
+        summary = {"total": len(pending), "ok": 0, "error": 0, "timeout": 0, "skipped": len(done)}
+        pipeline = {"files": 0, "decode": 0.0, "wait": 0.0, "idle": 0.0, "analysis": 0.0}
+
+        mode = 'a' if resume else 'w'
+        output = open(output_path, mode, encoding='utf-8') if output_path else contextlib.nullcontext()
+        with output as out:
+            def emit(record):
+                if out is not None:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                summary[record["status"]] += 1
+                if on_record:
+                    on_record(record, summary)
+
+            pool = [self._spawn() for _ in range(min(self.workers, len(pending)))]
+            try:
+                while True:
+                    # Um arquivo para cada worker antes dos adiantados (pré-carga)
+                    for level in range(1 + self.prefetch):
+                        for worker in pool:
+                            if len(worker.assigned) <= level and pending:
+                                worker.submit(pending.popleft())
+
+                    busy = [w for w in pool if w.assigned]
+                    if not busy:
+                        break
+
+                    ready = wait([w.conn for w in busy], timeout=self._wait_timeout(busy))
+                    for worker in busy:
+                        if worker.conn in ready:
+                            try:
+                                kind, payload = worker.conn.recv()
+                            except (EOFError, OSError):
+                                record = self._failed(worker, "error", "Worker encerrado inesperadamente")
+                                self._replace(pool, worker, pending)
+                            else:
+                                if kind == "start":
+                                    worker.start(payload)
+                                    continue
+                                if kind == "stage":
+                                    worker.stage = payload
+                                    continue
+                                record = payload
+                                worker.finish()
+                                self._account(pipeline, record)
+                            emit(record)
+                        elif (self.timeout and worker.task is not None
+                              and time.monotonic() - worker.started > self.timeout):
+                            record = self._failed(worker, "timeout", f"Tempo limite de {self.timeout}s excedido")
+                            self._replace(pool, worker, pending)
+                            emit(record)
+            finally:
+                for worker in pool:
+                    worker.stop()
+
+        if pipeline["files"]:
+            summary["pipeline"] = dict(
+                {name: round(value, 3) for name, value in pipeline.items()},
+                depth=self.prefetch, bottleneck=bottleneck(pipeline["wait"], pipeline["idle"])
+            )
+        return summary
+
+    def _wait_timeout(self, busy):
+        started = [w.started for w in busy if w.task is not None]
+        if not self.timeout or not started:
+            return None
+        return max(0.0, min(started) + self.timeout - time.monotonic())
+
+    def _account(self, pipeline: dict, record: dict):
+        """Soma os tempos de pré-carga e de análise de um registro"""
+        timings = record.get("timings", {})
+        if "prefetch" not in timings:
+            return
+        pipeline["files"] += 1
+        pipeline["decode"] += timings["prefetch"]
+        pipeline["wait"] += timings["prefetch_wait"]
+        pipeline["idle"] += timings["prefetch_idle"]
+        pipeline["analysis"] += timings.get("total", 0.0)
+
+    def _failed(self, worker, status, message) -> dict:
+        if worker.stage:
+            message = f"{message} (etapa: {worker.stage})"
+        started = worker.started if worker.task is not None else time.monotonic()
+        return {
+            # Morte antes de começar um arquivo: a falha fica com o primeiro atribuído
+            "file": worker.task if worker.task is not None else worker.assigned[0],
+            "status": status,
+            "error": message,
+            "stage": worker.stage,
+            "timings": {"total": round(time.monotonic() - started, 3)}
+        }
+
+    def _replace(self, pool, worker, pending):
+        """Substitui o worker; os arquivos adiantados a ele voltam para o início da fila"""
+        worker.kill()
+        worker.assigned.popleft()
+        pending.extendleft(reversed(worker.assigned))
+        pool[pool.index(worker)] = self._spawn()
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self.cache_path, self.mode, self.features, self.prefetch, self.pcm_cache_dir)
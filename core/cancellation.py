@@ -0,0 +1,29 @@
+"""
+Music-Makro - Cancellation
+Cancelamento cooperativo da análise (sem dependências pesadas, para as interfaces)
+"""
+
+import threading
+
+
+class AnalysisCancelled(Exception):
+    """Análise interrompida por um CancellationToken"""
+
+
+class CancellationToken:
+    """Pedido de cancelamento cooperativo, verificado entre as etapas da análise"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        """Levanta AnalysisCancelled se o cancelamento foi pedido"""
+        if self._event.is_set():
+            raise AnalysisCancelled()
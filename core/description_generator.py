@@ -1,112 +1,250 @@
 """
 Music-Makro - Description Generator
 Gerador de descrições textuais para Ace Step 1.5
+
+As regras são avaliadas sobre colunas NumPy (uma linha por faixa): uma faixa
+isolada vira uma tabela de uma linha, e um catálogo inteiro é descrito de uma
+vez com máscaras vetorizadas (ex.: regenerar os prompts de um JSONL do modo
+batch depois de mudar as regras, sem tocar no áudio).
 """
 
+import numpy as np
+
+
+def _clock(seconds: float) -> str:
+    """Tempo no formato m:ss"""
+    return f"{int(seconds // 60)}:{int(seconds % 60):02d}"
+
+
+def _choose(conditions, choices, default) -> list:
+    """Como np.select sobre strings: a regra vira um código por linha e o texto sai de uma tabela"""
+    codes = np.select(conditions, np.arange(len(choices)), default=len(choices))
+    return np.array(list(choices) + [default], dtype=object)[codes].tolist()
+
+
+# Valores usados quando a chave falta nos metadados (tags ausentes)
+_DEFAULTS = {"metadata.bitrate": 0, "metadata.genre": 'Unknown'}
+
+
+def describable(features: dict) -> bool:
+    """Indica se um resultado de analyze() tem todas as features que a descrição exige"""
+    for name in DescriptionGenerator.REQUIRED_FEATURES:
+        section, key = name.split(".")
+        if name not in _DEFAULTS and key not in features.get(section, {}):
+            return False
+    return True
+
+
+def feature_table(records) -> dict:
+    """Tabela colunar {"seção.chave": array} com as features da descrição, a partir de resultados de analyze()"""
+    records = list(records)
+    table = {}
+    for name in DescriptionGenerator.REQUIRED_FEATURES:
+        section, key = name.split(".")
+        if name in _DEFAULTS:
+            values = [record[section].get(key, _DEFAULTS[name]) for record in records]
+        else:
+            values = [record[section][key] for record in records]
+        table[name] = np.array(values, dtype=str if name == "metadata.genre" else np.float64)
+
+    # Listas de tamanhos variados: preenchidas uma a uma para não virar matriz
+    segments = np.empty(len(records), dtype=object)
+    for i, record in enumerate(records):
+        segments[i] = record.get('timeline', {}).get('segments')
+    table["timeline.segments"] = segments
+    return table
+
+
 class DescriptionGenerator:
     """Converte análise técnica em descrição textual"""
     
-    def __init__(self, technical_data: dict):
-        self.data = technical_data
+    # Features lidas por generate(): AudioAnalyzer.analyze(features=...) calcula só estas
+    REQUIRED_FEATURES = (
+        "metadata.duration",
+        "metadata.bitrate",
+        "metadata.genre",
+        "spectral.centroid_mean",
+        "spectral.bandwidth_mean",
+        "spectral.rolloff_mean",
+        "rhythmic.tempo_bpm",
+        "rhythmic.onset_strength_max",
+        "harmonic.harmonic_ratio",
+        "harmonic.percussive_ratio",
+        "energy.loudness_mean",
+        "energy.dynamic_range"
+    )
+    
+    # Usadas quando presentes: a timeline descreve a estrutura real da faixa
+    OPTIONAL_FEATURES = ("timeline",)
+    
+    def __init__(self, technical_data: dict = None, table=None):
+        """technical_data: resultado de analyze() de uma faixa; table: colunas de várias faixas
         
+        table aceita o dicionário de feature_table() ou um record array com campos
+        "seção.chave" (REQUIRED_FEATURES e, opcionalmente, "timeline.segments").
+        """
+        self.data = technical_data
+        self.table = feature_table([technical_data]) if table is None else table
+    
     def generate(self) -> str:
         """Gera descrição completa no estilo Ace Step 1.5"""
-        
-        genre_style = self._identify_genre_style()
-        atmosphere = self._describe_atmosphere()
-        structure = self._describe_structure()
-        vocals = self._describe_vocals()
-        lyrics_theme = self._describe_lyrics_theme()
-        production = self._describe_production()
-        
-        description = f"""{genre_style}
-{atmosphere}
-{structure}
-{vocals}
-{lyrics_theme}
-{production}"""
-        
-        return description.strip()
+        return self.generate_all()[0]
+    
+    def generate_all(self) -> list:
+        """Descrições de todas as linhas da tabela, na ordem"""
+        parts = zip(
+            self._identify_genre_style(),
+            self._describe_atmosphere(),
+            self._describe_structure(),
+            self._describe_vocals(),
+            self._describe_lyrics_theme(),
+            self._describe_production()
+        )
+        return ["\n".join(lines) for lines in parts]
     
-    def _identify_genre_style(self) -> str:
+    def _column(self, name: str) -> np.ndarray:
+        return np.asarray(self.table[name], dtype=np.float64)
+    
+    def _identify_genre_style(self) -> list:
         """Identifica gênero e estilo musical"""
-        tempo = self.data['rhythmic']['tempo_bpm']
-        percussive_ratio = self.data['harmonic']['percussive_ratio']
-        spectral_centroid = self.data['spectral']['centroid_mean']
-        energy = self.data['energy']['loudness_mean']
+        tempo = self._column('rhythmic.tempo_bpm')
+        percussive_ratio = self._column('harmonic.percussive_ratio')
+        spectral_centroid = self._column('spectral.centroid_mean')
+        energy = self._column('energy.loudness_mean')
         
-        if tempo > 120 and percussive_ratio > 0.5 and energy > -20:
-            if spectral_centroid > 2000:
-                return "Funk / Trap: A heavy, bass-driven Brazilian track inspired by the raw street intensity of MC Poze do Rodo blended with the melodic trap swagger of Matuê."
-            else:
-                return "Funk Carioca / Phonk: A raw street funk with deep bass and minimal melodic elements, channeling underground Brazilian sound."
-        elif tempo < 90 and self.data['harmonic']['harmonic_ratio'] > 0.6:
-            return "R&B / Soul: A smooth, melodic track with rich harmonic textures and emotional depth."
-        elif tempo > 140 and percussive_ratio > 0.6:
-            return "Electronic / Dance: A high-energy electronic track with pulsating rhythms and club-ready production."
-        else:
-            return "Urban / Hip-Hop: A contemporary urban track blending various street music influences with modern production techniques."
+        street = (tempo > 120) & (percussive_ratio > 0.5) & (energy > -20)
+        return _choose(
+            [
+                street & (spectral_centroid > 2000),
+                street,
+                (tempo < 90) & (self._column('harmonic.harmonic_ratio') > 0.6),
+                (tempo > 140) & (percussive_ratio > 0.6)
+            ],
+            [
+                "Funk / Trap: A heavy, bass-driven Brazilian track inspired by the raw street intensity of MC Poze do Rodo blended with the melodic trap swagger of Matuê.",
+                "Funk Carioca / Phonk: A raw street funk with deep bass and minimal melodic elements, channeling underground Brazilian sound.",
+                "R&B / Soul: A smooth, melodic track with rich harmonic textures and emotional depth.",
+                "Electronic / Dance: A high-energy electronic track with pulsating rhythms and club-ready production."
+            ],
+            default="Urban / Hip-Hop: A contemporary urban track blending various street music influences with modern production techniques."
+        )
     
-    def _describe_atmosphere(self) -> str:
+    def _describe_atmosphere(self) -> list:
         """Descreve atmosfera e elementos sonoros"""
-        loudness = self.data['energy']['loudness_mean']
-        dynamic_range = self.data['energy']['dynamic_range']
+        loudness = self._column('energy.loudness_mean')
+        dynamic_range = self._column('energy.dynamic_range')
         
-        if loudness > -15 and dynamic_range > 0.05:
-            atmosphere = "Dark, dominant atmosphere"
-        elif loudness > -20:
-            atmosphere = "Energetic, vibrant atmosphere"
-        else:
-            atmosphere = "Smooth, laid-back atmosphere"
+        atmospheres = ("Dark, dominant atmosphere", "Energetic, vibrant atmosphere", "Smooth, laid-back atmosphere")
+        atmosphere = np.select([(loudness > -15) & (dynamic_range > 0.05), loudness > -20], [0, 1], default=2)
         
-        elements = []
+        optional = (
+            ("distorted sub-heavy 808s", self._column('spectral.rolloff_mean') < 3000),
+            ("hard punchy kicks", self._column('rhythmic.onset_strength_max') > 0.5),
+            ("explosive snares", dynamic_range > 0.06)
+        )
+        # Cada combinação de elementos presentes é um código de 3 bits; com a
+        # atmosfera, são 24 frases possíveis, montadas uma vez
+        elements = sum(mask.astype(np.int64) << bit for bit, (_, mask) in enumerate(optional))
+        sentences = np.array([
+            f"{text} with " + ", ".join(
+                [name for bit, (name, _) in enumerate(optional) if code >> bit & 1]
+                + ["classic tamborzão percussion", "spacious trap-style hi-hats"]
+            ) + "."
+            for text in atmospheres
+            for code in range(1 << len(optional))
+        ], dtype=object)
         
-        if self.data['spectral']['rolloff_mean'] < 3000:
-            elements.append("distorted sub-heavy 808s")
-        if self.data['rhythmic']['onset_strength_max'] > 0.5:
-            elements.append("hard punchy kicks")
-        if dynamic_range > 0.06:
-            elements.append("explosive snares")
+        return sentences[atmosphere * (1 << len(optional)) + elements].tolist()
+    
+    def _describe_structure(self) -> list:
+        """Descreve estrutura e progressão"""
+        tempo = np.trunc(self._column('rhythmic.tempo_bpm')).astype(np.int64)
+        minutes = np.trunc(self._column('metadata.duration') / 60).astype(np.int64)
         
-        elements.extend(["classic tamborzão percussion", "spacious trap-style hi-hats"])
+        # Poucos pares (minutos, BPM) distintos: cada frase é formatada uma vez
+        keys, inverse = np.unique((minutes << 32) | (tempo & 0xFFFFFFFF), return_inverse=True)
+        spans = [f"over {key >> 32} minutes at {key & 0xFFFFFFFF} BPM" for key in keys.tolist()]
+        structures = np.array([
+            f"The instrumental builds from a tense, minimal intro into a massive low-end drop, layering hypnotic rhythms with cinematic synth textures {span}."
+            for span in spans
+        ], dtype=object)[inverse].tolist()
         
-        return f"{atmosphere} with {', '.join(elements)}."
+        if "timeline.segments" in _fields(self.table):
+            for i, segments in enumerate(self.table["timeline.segments"]):
+                if segments:
+                    structures[i] = self._describe_segments(segments, spans[inverse[i]])
+        return structures
     
-    def _describe_structure(self) -> str:
-        """Descreve estrutura e progressão"""
-        tempo = self.data['rhythmic']['tempo_bpm']
-        duration = self.data['metadata']['duration']
+    def _describe_segments(self, segments: list, span: str) -> str:
+        """Estrutura a partir das seções detectadas na timeline (energia e densidade relativas)"""
+        peak_rms = max(segment['rms'] for segment in segments) or 1.0
+        mean_density = sum(segment['onset_density'] for segment in segments) / len(segments)
+        
+        def character(segment):
+            level = segment['rms'] / peak_rms
+            energy = "full-energy" if level > 0.8 else "mid-energy" if level > 0.5 else "quiet"
+            if segment['onset_density'] > 1.2 * mean_density:
+                return f"{energy}, busy"
+            if segment['onset_density'] < 0.8 * mean_density:
+                return f"{energy}, sparse"
+            return energy
         
-        return f"The instrumental builds from a tense, minimal intro into a massive low-end drop, layering hypnotic rhythms with cinematic synth textures over {int(duration/60)} minutes at {int(tempo)} BPM."
+        # Seções vizinhas com o mesmo caráter são descritas como uma só
+        merged = []
+        for segment in segments:
+            if merged and character(segment) == merged[-1][0]:
+                merged[-1][2] = segment['end']
+            else:
+                merged.append([character(segment), segment['start'], segment['end'], segment['rms']])
+        
+        if len(merged) == 1:
+            return f"The instrumental holds a steady, {merged[0][0]} groove throughout, {span}."
+        
+        peak = max(range(len(merged)), key=lambda i: merged[i][3])
+        parts = []
+        for i, (description, start, end, _) in enumerate(merged):
+            role = "intro" if i == 0 else "outro" if i == len(merged) - 1 else "peak" if i == peak else "section"
+            parts.append(f"a {description} {role} ({_clock(start)}–{_clock(end)})")
+        
+        return f"The instrumental moves through {len(merged)} sections — {', '.join(parts[:-1])} and {parts[-1]} — {span}."
     
-    def _describe_vocals(self) -> str:
+    def _describe_vocals(self) -> list:
         """Descreve características vocais"""
-        tempo = self.data['rhythmic']['tempo_bpm']
-        
-        if tempo > 120:
-            return "Vocals delivered with commanding, gritty flow — alternating between aggressive chant-style funk cadence and melodic trap hooks with autotuned textures."
-        else:
-            return "Vocals delivered with smooth, melodic flow — balancing emotional delivery with rhythmic precision and subtle vocal layering."
+        return _choose(
+            [self._column('rhythmic.tempo_bpm') > 120],
+            ["Vocals delivered with commanding, gritty flow — alternating between aggressive chant-style funk cadence and melodic trap hooks with autotuned textures."],
+            default="Vocals delivered with smooth, melodic flow — balancing emotional delivery with rhythmic precision and subtle vocal layering."
+        )
     
-    def _describe_lyrics_theme(self) -> str:
+    def _describe_lyrics_theme(self) -> list:
         """Descreve temática lírica"""
-        genre_meta = self.data['metadata'].get('genre', 'Unknown').lower()
+        # Poucos gêneros distintos num catálogo: a regra roda uma vez por gênero
+        genres, inverse = np.unique(np.asarray(self.table['metadata.genre'], dtype=str), return_inverse=True)
+        street = np.array([
+            'funk' in genre_meta.lower() or 'trap' in genre_meta.lower() for genre_meta in genres
+        ], dtype=bool)
         
-        if 'funk' in genre_meta or 'trap' in genre_meta:
-            return "Lyrics centered on luxury cars, fast lifestyles, power, and seductive energy, maintaining a street-authentic tone without losing mainstream appeal."
-        else:
-            return "Lyrics exploring personal experiences, emotional depth, and contemporary themes with authentic storytelling and relatable narratives."
+        return _choose(
+            [street[inverse]],
+            ["Lyrics centered on luxury cars, fast lifestyles, power, and seductive energy, maintaining a street-authentic tone without losing mainstream appeal."],
+            default="Lyrics exploring personal experiences, emotional depth, and contemporary themes with authentic storytelling and relatable narratives."
+        )
     
-    def _describe_production(self) -> str:
+    def _describe_production(self) -> list:
         """Descreve qualidade de produção"""
-        bitrate = self.data['metadata'].get('bitrate', 0)
-        spectral_bandwidth = self.data['spectral']['bandwidth_mean']
+        bitrate = self._column('metadata.bitrate')
+        spectral_bandwidth = self._column('spectral.bandwidth_mean')
         
-        if bitrate > 256000 and spectral_bandwidth > 2000:
-            quality = "gritty yet polished"
-        elif bitrate > 128000:
-            quality = "raw with professional clarity"
-        else:
-            quality = "authentic and street-ready"
+        sentence = "Production must feel {} — heavy club pressure in the low-end, modern trap clarity in the highs, and the immersive energy of a packed Rio night scene."
         
-        return f"Production must feel {quality} — heavy club pressure in the low-end, modern trap clarity in the highs, and the immersive energy of a packed Rio night scene."
\ No newline at end of file
+        return _choose(
+            [(bitrate > 256000) & (spectral_bandwidth > 2000), bitrate > 128000],
+            [sentence.format("gritty yet polished"), sentence.format("raw with professional clarity")],
+            default=sentence.format("authentic and street-ready")
+        )
+
+
+def _fields(table) -> tuple:
+    """Nomes das colunas de um dicionário ou de um record array"""
+    names = getattr(getattr(table, "dtype", None), "names", None)
+    return names if names is not None else tuple(table)
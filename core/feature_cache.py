@@ -0,0 +1,264 @@
+"""
+Music-Makro - Feature Cache
+Cache persistente de features endereçado pelo conteúdo do arquivo
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    file_digest TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    track INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    file TEXT NOT NULL,
+    duration REAL NOT NULL,
+    profile TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fingerprint_hashes (
+    hash INTEGER NOT NULL,
+    track INTEGER NOT NULL,
+    frame INTEGER NOT NULL,
+    PRIMARY KEY (hash, track, frame)
+) WITHOUT ROWID;
+"""
+
+# Hashes por consulta ao índice de impressões digitais (limite de parâmetros do SQLite)
+_QUERY_CHUNK = 900
+
+# Parâmetros fixados pelo código de cada analisador: valores diferentes tornam a
+# entrada obsoleta. Os demais (features, block_frames, excerpt_seconds) são
+# escolhas de cada análise e não a invalidam.
+STALE_PARAMS = ("version", "n_fft", "hop_length", "n_mfcc", "sr")
+
+
+def default_cache_path() -> str:
+    """Local padrão do banco SQLite do cache"""
+    return os.path.join(settings.CACHE_DIR, "features.sqlite")
+
+
+def file_digest(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 do conteúdo do arquivo"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """Cache SQLite dos resultados de AudioAnalyzer.analyze()
+
+    A chave combina o hash do conteúdo do arquivo com a versão e os parâmetros
+    dos extratores: qualquer mudança de parâmetro gera uma chave nova, e as
+    entradas antigas deixam de ser lidas até saírem por idade ou tamanho.
+    Cada operação abre sua própria conexão, o que permite compartilhar o mesmo
+    arquivo entre threads da GUI e processos do modo em lote.
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = None, max_age_days: float = None):
+        self.path = path or default_cache_path()
+        self.max_bytes = settings.CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_age_days = settings.CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Índice de impressões digitais anterior ao perfil de chroma: é refeito
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(fingerprints)")]
+            if columns and "profile" not in columns:
+                conn.execute("DROP TABLE fingerprint_hashes")
+                conn.execute("DROP TABLE fingerprints")
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(digest: str, params: dict) -> str:
+        """Chave do cache para um conteúdo de arquivo e um conjunto de parâmetros"""
+        payload = json.dumps({"digest": digest, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """Retorna o resultado armazenado ou None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                self._increment(conn, "misses")
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            self._increment(conn, "hits")
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def contains(self, key: str) -> bool:
+        """Indica se a chave está armazenada, sem contar acerto ou falha"""
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, key: str, result: dict, digest: str = "", params: dict = None):
+        """Armazena um resultado e aplica a política de descarte"""
+        data = zlib.compress(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, digest, json.dumps(params or {}, sort_keys=True), now, now, len(data), data)
+            )
+            self._evict(conn, now)
+
+    def put_fingerprint(self, key: str, file_path: str, duration: float, hashes, frames, profile):
+        """Indexa a impressão digital (listas de hashes, frames e perfil de core.fingerprint) do resultado em key"""
+        with self._connect() as conn:
+            self._drop_fingerprint(conn, key)
+            track = conn.execute(
+                "INSERT INTO fingerprints (key, file, duration, profile) VALUES (?, ?, ?, ?)",
+                (key, file_path, duration, json.dumps(profile))
+            ).lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO fingerprint_hashes VALUES (?, ?, ?)",
+                zip(hashes, [track] * len(hashes), frames)
+            )
+
+    def fingerprint_postings(self, hashes) -> list:
+        """Linhas (hash, faixa, frame) do índice com algum dos hashes"""
+        unique = sorted(set(hashes))
+        rows = []
+        with self._connect() as conn:
+            for start in range(0, len(unique), _QUERY_CHUNK):
+                chunk = unique[start:start + _QUERY_CHUNK]
+                rows.extend(conn.execute(
+                    f"SELECT hash, track, frame FROM fingerprint_hashes WHERE hash IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+        return rows
+
+    def fingerprint_entry(self, track: int):
+        """Chave, arquivo, duração, perfil e parâmetros de uma faixa indexada (None se o resultado saiu do cache)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT f.key, f.file, f.duration, f.profile, e.params FROM fingerprints f "
+                "JOIN entries e ON e.key = f.key WHERE f.track = ?", (track,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"key": row[0], "file": row[1], "duration": row[2], "profile": json.loads(row[3]),
+                "params": json.loads(row[4])}
+
+    def _drop_fingerprint(self, conn, key: str):
+        row = conn.execute("SELECT track FROM fingerprints WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM fingerprint_hashes WHERE track = ?", row)
+            conn.execute("DELETE FROM fingerprints WHERE track = ?", row)
+
+    def _drop_orphan_fingerprints(self, conn):
+        """Remove as impressões digitais de resultados que saíram do cache"""
+        for (key,) in conn.execute(
+                "SELECT key FROM fingerprints WHERE key NOT IN (SELECT key FROM entries)").fetchall():
+            self._drop_fingerprint(conn, key)
+
+    def evict(self) -> int:
+        """Remove entradas vencidas ou excedentes; retorna quantas foram removidas"""
+        with self._connect() as conn:
+            return self._evict(conn, time.time())
+
+    def _evict(self, conn, now: float) -> int:
+        removed = 0
+        if self.max_age_days:
+            cutoff = now - self.max_age_days * 86400
+            removed += conn.execute("DELETE FROM entries WHERE created_at < ?", (cutoff,)).rowcount
+
+        if self.max_bytes:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                # Menos usadas recentemente primeiro
+                for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    total -= size
+                    removed += 1
+        if removed:
+            self._drop_orphan_fingerprints(conn)
+        return removed
+
+    def purge(self, current_params: dict) -> int:
+        """Remove entradas geradas com parâmetros diferentes dos atuais
+
+        current_params mapeia cada modo ("full", "stream", "preview") aos
+        parâmetros atuais do seu analisador. Cada entrada é comparada com os do
+        próprio modo, só nos campos de STALE_PARAMS; entradas de modos
+        desconhecidos também saem.
+        """
+        with self._connect() as conn:
+            stale = []
+            for key, params in conn.execute("SELECT key, params FROM entries").fetchall():
+                params = json.loads(params)
+                current = current_params.get(params.get("mode", "full"))
+                if current is None or any(params.get(name) != current.get(name) for name in STALE_PARAMS):
+                    stale.append((key,))
+            conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+            if stale:
+                self._drop_orphan_fingerprints(conn)
+            return len(stale)
+
+    def _increment(self, conn, name: str):
+        conn.execute(
+            "INSERT INTO counters VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def stats(self) -> dict:
+        """Contadores persistentes e da sessão, número de entradas e tamanho total"""
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            fingerprints = conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": size,
+            "fingerprints": fingerprints,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "session_hits": self.hits,
+            "session_misses": self.misses
+        }
+
+    def clear(self):
+        """Remove todas as entradas e zera os contadores"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM counters")
+            conn.execute("DELETE FROM fingerprint_hashes")
+            conn.execute("DELETE FROM fingerprints")
@@ -0,0 +1,79 @@
+"""
+Music-Makro - Feature Context
+Representações espectrais compartilhadas entre os extratores
+"""
+
+from functools import cached_property
+
+import librosa
+import numpy as np
+
+
+class FeatureContext:
+    """Calcula STFT, espectrogramas e envelope de onset uma única vez por análise.
+
+    Cada representação é avaliada sob demanda e reaproveitada por todos os
+    extratores, reproduzindo exatamente os parâmetros padrão do librosa
+    (n_fft=2048, hop_length=512, janela hann, center=True).
+    """
+
+    def __init__(self, y: np.ndarray, sr: int, n_fft: int = 2048, hop_length: int = 512):
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+
+    @cached_property
+    def stft(self) -> np.ndarray:
+        """STFT complexa do sinal"""
+        return librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length)
+
+    @cached_property
+    def magnitude(self) -> np.ndarray:
+        """Espectrograma de magnitude |STFT|"""
+        return np.abs(self.stft)
+
+    @cached_property
+    def power(self) -> np.ndarray:
+        """Espectrograma de potência |STFT|²"""
+        return self.magnitude ** 2
+
+    @cached_property
+    def mel(self) -> np.ndarray:
+        """Espectrograma mel de potência"""
+        return librosa.feature.melspectrogram(S=self.power, sr=self.sr)
+
+    @cached_property
+    def log_mel(self) -> np.ndarray:
+        """Espectrograma mel em dB (entrada de MFCC e onset)"""
+        return librosa.power_to_db(self.mel)
+
+    @cached_property
+    def onset_env(self) -> np.ndarray:
+        """Envelope de onset (agregação por média)"""
+        return librosa.onset.onset_strength(S=self.log_mel, sr=self.sr)
+
+    @cached_property
+    def beat_onset_env(self) -> np.ndarray:
+        """Envelope de onset por mediana, o mesmo que beat_track calcula internamente"""
+        return librosa.onset.onset_strength(S=self.log_mel, sr=self.sr, aggregate=np.median)
+
+    @cached_property
+    def rms(self) -> np.ndarray:
+        """RMS por frame no domínio do tempo"""
+        return librosa.feature.rms(y=self.y, frame_length=self.n_fft, hop_length=self.hop_length)[0]
+
+    @cached_property
+    def hpss_stft(self) -> tuple:
+        """STFTs harmônica e percussiva (pode ser atribuída com uma HPSS calculada em paralelo)"""
+        return librosa.decompose.hpss(self.stft)
+
+    @cached_property
+    def hpss(self) -> tuple:
+        """Separação harmônica/percussiva (y_harmonic, y_percussive) a partir da STFT compartilhada"""
+        stft_harm, stft_perc = self.hpss_stft
+        y_harmonic = librosa.istft(stft_harm, dtype=self.y.dtype, hop_length=self.hop_length,
+                                   length=self.y.shape[-1])
+        y_percussive = librosa.istft(stft_perc, dtype=self.y.dtype, hop_length=self.hop_length,
+                                     length=self.y.shape[-1])
+        return y_harmonic, y_percussive
@@ -0,0 +1,179 @@
+"""
+Music-Makro - Fingerprint
+Impressões digitais de áudio para reconhecer quase duplicatas antes da análise
+
+Cada faixa vira um conjunto de hashes de pares de picos espectrais: o sinal é
+reamostrado para 11025 Hz, os máximos locais do espectrograma em dB (relativo
+ao pico da faixa, o que ignora o ganho) são limitados aos PEAKS_PER_SECOND
+mais fortes de cada segundo, e cada pico é combinado com os FAN_OUT seguintes.
+Um hash empacota as duas frequências e a distância em frames; o frame do
+primeiro pico vai junto. Como a seleção é local, um trecho da faixa gera os
+mesmos picos que ela.
+
+Os hashes ficam num índice invertido (tabelas do FeatureCache), apontando para
+a chave do resultado completo da faixa. Uma consulta busca os hashes do novo
+arquivo e vota em (faixa, deslocamento): re-exportações, variações de bitrate e
+cópias com outras tags têm muitos hashes alinhados no mesmo deslocamento, e o
+arquivo pode reaproveitar as features e a descrição daquela faixa. Um atraso
+de encoder que não é múltiplo do hop muda a distância entre picos em até um
+frame; por isso a consulta também procura as distâncias vizinhas.
+
+Os picos mais fortes de músicas diferentes com a mesma bateria também se
+alinham (o mesmo loop em outro tom chega a alinhar boa parte dos hashes).
+Por isso cada faixa guarda também o perfil médio de chroma do mesmo
+espectrograma, e um candidato só é aceito se a correlação entre os perfis
+passa de FINGERPRINT_MIN_PROFILE_CORRELATION: a percussão contribui quase
+igualmente para as 12 classes e some ao centralizar o perfil, enquanto uma
+mudança de tom desloca as classes e derruba a correlação.
+"""
+
+import librosa
+import numpy as np
+from scipy.ndimage import maximum_filter
+
+from config import settings
+
+FINGERPRINT_SR = 11025
+FINGERPRINT_N_FFT = 2048
+FINGERPRINT_HOP = 256
+
+# Vizinhança (bins x frames) em que um pico precisa ser o máximo
+PEAK_NEIGHBORHOOD = (31, 11)
+# Picos abaixo deste nível (dB em relação ao máximo da faixa) são ignorados
+PEAK_FLOOR_DB = -60.0
+PEAKS_PER_SECOND = 10
+FAN_OUT = 5
+
+# Bits de cada frequência (bins 0..1023) e da distância entre os picos (1..63 frames)
+_FREQ_BITS = 10
+_DT_BITS = 6
+_DT_MASK = (1 << _DT_BITS) - 1
+
+
+def fingerprint(y: np.ndarray, sr: int) -> tuple:
+    """(hashes, frames, perfil) de um sinal mono
+
+    hashes e frames (uint32) são os pares de picos; perfil é o chroma médio
+    (12 classes, soma 1) usado para confirmar um candidato.
+    """
+    if sr != FINGERPRINT_SR:
+        y = librosa.resample(y, orig_sr=sr, target_sr=FINGERPRINT_SR)
+    empty = (np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32), np.zeros(12))
+    if y.size < FINGERPRINT_N_FFT:
+        return empty
+
+    S = np.abs(librosa.stft(y, n_fft=FINGERPRINT_N_FFT, hop_length=FINGERPRINT_HOP, center=False))
+    profile = librosa.feature.chroma_stft(S=S ** 2, sr=FINGERPRINT_SR, n_fft=FINGERPRINT_N_FFT,
+                                          tuning=0.0).mean(axis=1)
+    profile = profile / max(float(profile.sum()), 1e-12)
+    # O último bin (Nyquist) fica de fora: as frequências cabem em _FREQ_BITS
+    log = librosa.amplitude_to_db(S[:-1], ref=np.max)
+    peaks = (log == maximum_filter(log, size=PEAK_NEIGHBORHOOD, mode="constant", cval=-np.inf))
+    freqs, frames = np.nonzero(peaks & (log > PEAK_FLOOR_DB))
+
+    # Os PEAKS_PER_SECOND mais fortes de cada segundo
+    seconds = frames // max(1, FINGERPRINT_SR // FINGERPRINT_HOP)
+    order = np.lexsort((-log[freqs, frames], seconds))
+    starts = np.searchsorted(seconds[order], seconds[order], side="left")
+    strongest = order[np.arange(order.size) - starts < PEAKS_PER_SECOND]
+    freqs, frames = freqs[strongest], frames[strongest]
+    order = np.lexsort((freqs, frames))
+    freqs, frames = freqs[order].astype(np.uint32), frames[order].astype(np.uint32)
+
+    hashes, anchors = [], []
+    for step in range(1, FAN_OUT + 1):
+        dt = frames[step:].astype(np.int64) - frames[:-step]
+        valid = (dt > 0) & (dt <= _DT_MASK)
+        hashes.append((freqs[:-step][valid] << (_FREQ_BITS + _DT_BITS)) |
+                      (freqs[step:][valid] << _DT_BITS) | dt[valid].astype(np.uint32))
+        anchors.append(frames[:-step][valid])
+    if not hashes:
+        return empty[:2] + (profile,)
+    return np.concatenate(hashes).astype(np.uint32), np.concatenate(anchors).astype(np.uint32), profile
+
+
+def profile_correlation(a, b) -> float:
+    """Correlação de Pearson entre dois perfis de chroma (0 se algum for plano)"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    a, b = a - a.mean(), b - b.mean()
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / norm if norm > 0 else 0.0
+
+
+def rank_matches(hashes: np.ndarray, frames: np.ndarray, postings: np.ndarray) -> list:
+    """[(faixa, hashes alinhados)] em ordem decrescente
+
+    postings traz linhas (hash, faixa, frame) do índice. Cada par de hashes
+    iguais vota no deslocamento frame_índice - frame_consulta; a contagem de
+    uma faixa é a do seu melhor deslocamento somada às dos vizinhos (±1 frame,
+    o atraso de um encoder pode cair entre dois frames).
+    """
+    if not len(postings) or not hashes.size:
+        return []
+    order = np.argsort(hashes, kind="stable")
+    sorted_hashes, sorted_frames = hashes[order], frames[order].astype(np.int64)
+    first = np.searchsorted(sorted_hashes, postings[:, 0], side="left")
+    last = np.searchsorted(sorted_hashes, postings[:, 0], side="right")
+
+    # Um posting vota uma vez por ocorrência do hash na consulta
+    repeats = last - first
+    rows = np.repeat(np.arange(len(postings)), repeats)
+    positions = np.repeat(first - np.cumsum(np.concatenate([[0], repeats[:-1]])), repeats) + np.arange(rows.size)
+    tracks = postings[rows, 1]
+    deltas = postings[rows, 2] - sorted_frames[positions]
+
+    keys, counts = np.unique(tracks * (1 << 32) + (deltas + (1 << 31)), return_counts=True)
+    votes = counts.copy()
+    for shift in (-1, 1):
+        neighbor = np.searchsorted(keys, keys + shift)
+        found = neighbor < keys.size
+        found[found] = keys[neighbor[found]] == keys[found] + shift
+        votes[found] += counts[neighbor[found]]
+
+    best = {}
+    for track, count in zip((keys >> 32).tolist(), votes.tolist()):
+        if count > best.get(track, 0):
+            best[track] = count
+    return sorted(best.items(), key=lambda item: -item[1])
+
+
+def _with_neighbors(hashes: np.ndarray, frames: np.ndarray) -> tuple:
+    """Hashes da consulta mais as variantes com distância entre picos ±1 frame"""
+    dt = (hashes & _DT_MASK).astype(np.int64)
+    variants, variant_frames = [hashes], [frames]
+    for shift in (-1, 1):
+        valid = (dt + shift > 0) & (dt + shift <= _DT_MASK)
+        variants.append((hashes[valid] & ~np.uint32(_DT_MASK)) | (dt[valid] + shift).astype(np.uint32))
+        variant_frames.append(frames[valid])
+    return np.concatenate(variants).astype(np.uint32), np.concatenate(variant_frames)
+
+
+def find_duplicate(cache, hashes: np.ndarray, frames: np.ndarray, profile: np.ndarray, duration: float,
+                   params: dict, candidates: int = 5):
+    """Faixa do índice de cache que é quase duplicata do sinal, ou None
+
+    Retorna {"key", "file", "score", "matches"} da melhor faixa com fração de
+    hashes alinhados >= FINGERPRINT_MIN_SCORE, perfil de chroma correlacionado
+    (>= FINGERPRINT_MIN_PROFILE_CORRELATION), duração compatível e resultado
+    gerado com os mesmos parâmetros (params) ainda presente no cache.
+    """
+    if not hashes.size:
+        return None
+    query, query_frames = _with_neighbors(hashes, frames)
+    postings = np.array(cache.fingerprint_postings(query.tolist()), dtype=np.int64).reshape(-1, 3)
+    ranking = rank_matches(query, query_frames, postings)
+    for track, matches in ranking[:candidates]:
+        score = matches / hashes.size
+        if score < settings.FINGERPRINT_MIN_SCORE:
+            break
+        entry = cache.fingerprint_entry(track)
+        if entry is None or entry["params"] != params:
+            continue
+        if abs(entry["duration"] - duration) > settings.FINGERPRINT_MAX_DURATION_DIFF:
+            continue
+        # Mesma bateria em outro tom ou outra música: a análise completa é refeita
+        if profile_correlation(profile, entry["profile"]) < settings.FINGERPRINT_MIN_PROFILE_CORRELATION:
+            continue
+        return {"key": entry["key"], "file": entry["file"], "score": round(score, 3), "matches": matches}
+    return None
@@ -0,0 +1,185 @@
+"""
+Music-Makro - Ingest
+Leitura única do arquivo: hash, metadados e decodificação a partir do mesmo buffer
+
+O arquivo é lido para a memória uma vez (uma abertura, uma leitura sequencial)
+e o mesmo buffer alimenta o hash do cache, o mutagen (tags e informações de
+stream de MP3, FLAC, WAV, OGG e M4A) e o decodificador. Arquivos maiores que
+settings.INGEST_MAX_BYTES continuam sendo lidos do disco sob demanda.
+
+Decodificadores, do mais rápido ao mais genérico:
+    1. soundfile (libsndfile) sobre o buffer: WAV, FLAC, OGG e MP3 (libsndfile >= 1.1);
+    2. PyAV (opcional, pip install av) sobre o buffer: M4A/AAC e demais formatos do FFmpeg;
+    3. librosa.load pelo caminho (audioread/FFmpeg), que relê o arquivo.
+"""
+
+import hashlib
+import io
+import os
+from functools import cached_property
+
+import librosa
+import mutagen
+import numpy as np
+import soundfile as sf
+
+from config import settings
+from core.feature_cache import file_digest
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# Chaves das tags por formato: ID3 (MP3/WAV), MP4 (M4A) e Vorbis comments (FLAC/OGG)
+TAG_KEYS = {
+    "title": ("TIT2", "\xa9nam", "title"),
+    "artist": ("TPE1", "\xa9ART", "artist"),
+    "genre": ("TCON", "\xa9gen", "genre")
+}
+
+
+def _tag_value(tags, keys) -> str:
+    for key in keys:
+        try:
+            value = tags.get(key)
+        except (KeyError, ValueError):
+            continue
+        if value is None:
+            continue
+        # Frames ID3 têm representação textual própria; MP4 e Vorbis devolvem listas
+        if isinstance(value, list):
+            value = value[0] if value else None
+        if value is not None and str(value):
+            return str(value)
+    return 'Unknown'
+
+
+class AudioSource:
+    """Conteúdo de um arquivo de áudio, lido do disco uma única vez"""
+
+    def __init__(self, file_path: str, max_bytes: int = None, load: bool = True, pcm_cache=None):
+        self.file_path = file_path
+        limit = settings.INGEST_MAX_BYTES if max_bytes is None else max_bytes
+        self.data = None
+        self.pcm_cache = pcm_cache
+        self._decoded = None
+        if load and (not limit or os.path.getsize(file_path) <= limit):
+            with open(file_path, 'rb') as f:
+                self.data = f.read()
+
+    @property
+    def in_memory(self) -> bool:
+        return self.data is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Memória ocupada pelo conteúdo lido e pelo áudio pré-decodificado"""
+        size = len(self.data) if self.data is not None else 0
+        if self._decoded is not None:
+            size += self._decoded[0].nbytes
+        return size
+
+    def open(self):
+        """Objeto de arquivo posicionado no início (buffer em memória ou arquivo em disco)"""
+        if self.data is None:
+            return open(self.file_path, 'rb')
+        buffer = io.BytesIO(self.data)
+        # Alguns detectores de formato (mutagen) também consideram a extensão
+        buffer.name = self.file_path
+        return buffer
+
+    @cached_property
+    def digest(self) -> str:
+        """SHA-256 do conteúdo (mesmo valor de feature_cache.file_digest)"""
+        if self.data is None:
+            return file_digest(self.file_path)
+        return hashlib.sha256(self.data).hexdigest()
+
+    def metadata(self) -> dict:
+        """Duração, bitrate, taxa de amostragem e tags principais"""
+        try:
+            with self.open() as f:
+                audio = mutagen.File(f)
+            if audio is None:
+                return self._stream_info()
+
+            tags = audio.tags if audio.tags is not None else {}
+            result = {
+                "duration": round(audio.info.length, 2),
+                "bitrate": getattr(audio.info, "bitrate", 0) or 0,
+                "sample_rate": getattr(audio.info, "sample_rate", None)
+            }
+            for field, keys in TAG_KEYS.items():
+                result[field] = _tag_value(tags, keys)
+            return result
+        except Exception as e:
+            try:
+                return self._stream_info()
+            except Exception:
+                return {"error": str(e)}
+
+    def _stream_info(self) -> dict:
+        """Metadados mínimos pelo libsndfile quando o mutagen não reconhece o arquivo"""
+        with self.open() as f:
+            info = sf.info(f)
+        return {
+            "duration": round(info.duration, 2),
+            "bitrate": 0,
+            "sample_rate": info.samplerate,
+            "title": 'Unknown',
+            "artist": 'Unknown',
+            "genre": 'Unknown'
+        }
+
+    def prefetch(self):
+        """Decodifica agora e guarda o áudio para o próximo decode() (pré-carga em outra thread)"""
+        if self._decoded is None:
+            self._decoded = self.decode()
+
+    def decode(self) -> tuple:
+        """Decodifica em mono float32 na taxa nativa (equivalente a librosa.load(sr=None))
+
+        Com pcm_cache (core.pcm_cache.PCMCache), um conteúdo já decodificado é
+        mapeado do disco sem cópia (somente leitura) e um novo é gravado lá.
+        """
+        if self._decoded is not None:
+            # O áudio pré-decodificado é entregue uma vez, sem manter a cópia
+            decoded, self._decoded = self._decoded, None
+            return decoded
+        if self.pcm_cache is None:
+            return self._decode()
+
+        cached = self.pcm_cache.get(self.digest)
+        if cached is not None:
+            return cached
+        y, sr = self._decode()
+        self.pcm_cache.put(self.digest, y, sr)
+        return y, sr
+
+    def _decode(self) -> tuple:
+        try:
+            with self.open() as f:
+                return librosa.load(f, sr=None)
+        except sf.SoundFileRuntimeError:
+            pass
+
+        if av is not None:
+            try:
+                return self._decode_av()
+            except av.FFmpegError:
+                pass
+
+        return librosa.load(self.file_path, sr=None)
+
+    def _decode_av(self) -> tuple:
+        with self.open() as f, av.open(f) as container:
+            stream = container.streams.audio[0]
+            resampler = av.AudioResampler(format="fltp")
+            chunks = []
+            for frame in container.decode(stream):
+                chunks.extend(out.to_ndarray() for out in resampler.resample(frame))
+            chunks.extend(out.to_ndarray() for out in resampler.resample(None))
+            sr = stream.rate
+        y = np.concatenate(chunks, axis=1) if chunks else np.zeros((1, 0), dtype=np.float32)
+        return librosa.to_mono(y.astype(np.float32, copy=False)), sr
@@ -0,0 +1,347 @@
+"""
+Music-Makro - Live Analyzer
+Análise incremental de áudio ao vivo (stdin, pipe WAV ou dispositivo de som)
+
+O áudio chega em blocos e é enquadrado à medida que chega (n_fft=2048,
+hop=512, center=False). Cada frame novo atualiza anéis de tamanho fixo com
+as últimas LIVE_WINDOW segundos: RMS, centróide, largura de banda, rolloff,
+envelopes de onset e o espectrograma de magnitude. A cada LIVE_INTERVAL
+segundos de áudio as estatísticas da janela são recalculadas e viram um
+resultado no formato de analyze(), com a descrição do DescriptionGenerator.
+Como tudo é limitado à janela, o custo de cada atualização não cresce com a
+duração do set.
+
+Aproximações em relação a AudioAnalyzer.analyze (além de valer só para a janela):
+    - frames sem padding (center=False), como na análise em streaming;
+    - onset: o corte de 80 dB do espectrograma mel é relativo ao próprio frame;
+    - tempo_bpm: librosa.feature.tempo sobre o envelope de onset por mediana
+      da janela, a mesma estimativa que beat_track usa antes de buscar as batidas;
+    - harmonic_ratio/percussive_ratio: a HPSS é feita frame a frame com a
+      mediana de 31 frames centrada (atraso de 15 frames) e os sinais
+      harmônico e percussivo são reconstruídos por overlap-add.
+
+Entradas: WAV PCM (8, 16, 24 ou 32 bits) lido sequencialmente de um pipe,
+PCM cru s16le ou um dispositivo de captura (opcional, pip install sounddevice).
+"""
+
+import struct
+import sys
+import time
+import wave
+
+import librosa
+import numpy as np
+from scipy.ndimage import median_filter
+
+from config import settings
+from core.audio_analyzer import HOP_LENGTH, N_FFT
+from core.description_generator import DescriptionGenerator
+
+try:
+    import sounddevice
+except ImportError:
+    sounddevice = None
+
+# Mediana da HPSS (kernel padrão de librosa.decompose.hpss) e o atraso que ela impõe
+HPSS_KERNEL = 31
+HPSS_DELAY = HPSS_KERNEL // 2
+
+# Soma de hann² com hop = n_fft / 4: normalização do overlap-add
+_OLA_GAIN = 1.5
+
+# Séries por frame mantidas no anel de features
+FRAME_SERIES = ("rms", "centroid", "bandwidth", "rolloff", "onset", "beat_onset")
+
+
+class FrameRing:
+    """Anel de colunas (linhas x frames) com os últimos capacity frames"""
+
+    def __init__(self, rows: int, capacity: int):
+        self.data = np.zeros((rows, capacity), dtype=np.float32)
+        self.capacity = capacity
+        self.position = 0
+        self.size = 0
+
+    def append(self, columns: np.ndarray):
+        columns = columns[:, -self.capacity:]
+        n = columns.shape[1]
+        end = self.position + n
+        if end <= self.capacity:
+            self.data[:, self.position:end] = columns
+        else:
+            first = self.capacity - self.position
+            self.data[:, self.position:] = columns[:, :first]
+            self.data[:, :n - first] = columns[:, first:]
+        self.position = end % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def view(self) -> np.ndarray:
+        """Frames em ordem cronológica (cópia)"""
+        if self.size < self.capacity:
+            return self.data[:, :self.size].copy()
+        return np.concatenate([self.data[:, self.position:], self.data[:, :self.position]], axis=1)
+
+
+class LiveAnalyzer:
+    """Features incrementais e descrições periódicas de um fluxo de áudio mono"""
+
+    def __init__(self, sr: int, window: float = None, interval: float = None, bitrate: int = 0,
+                 genre: str = 'Unknown'):
+        self.sr = sr
+        self.window = settings.LIVE_WINDOW if window is None else window
+        self.interval = settings.LIVE_INTERVAL if interval is None else interval
+        self.bitrate = bitrate
+        self.genre = genre
+        capacity = max(HPSS_KERNEL, int(round(self.window * sr / HOP_LENGTH)))
+        self.series = FrameRing(len(FRAME_SERIES), capacity)
+        self.magnitude = FrameRing(1 + N_FFT // 2, capacity)
+        # Amplitudes absolutas somadas por hop: harmônica e percussiva
+        self.balance = FrameRing(2, capacity)
+        self.samples = 0
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._window = librosa.filters.get_window("hann", N_FFT, fftbins=True).astype(np.float32)
+        self._mel_basis = librosa.filters.mel(sr=sr, n_fft=N_FFT)
+        self._previous_log_mel = None
+        # Colunas anteriores da STFT para a mediana centrada da HPSS
+        self._context = np.zeros((1 + N_FFT // 2, 0), dtype=np.complex64)
+        self._ola = np.zeros((2, N_FFT), dtype=np.float32)
+        self._next_update = int(self.interval * sr)
+
+    @property
+    def elapsed(self) -> float:
+        """Segundos de áudio recebidos"""
+        return self.samples / self.sr
+
+    def feed(self, y: np.ndarray):
+        """Processa um bloco de amostras; retorna uma atualização quando vence o intervalo, senão None"""
+        self.samples += y.size
+        buffer = np.concatenate([self._tail, np.asarray(y, dtype=np.float32)])
+        n = 1 + (buffer.size - N_FFT) // HOP_LENGTH if buffer.size >= N_FFT else 0
+        if n > 0:
+            self._process(librosa.util.frame(buffer[:N_FFT + (n - 1) * HOP_LENGTH],
+                                             frame_length=N_FFT, hop_length=HOP_LENGTH))
+        self._tail = buffer[n * HOP_LENGTH:]
+
+        if self.samples < self._next_update:
+            return None
+        # Um bloco longo pode cobrir vários intervalos: uma atualização só
+        step = max(1, int(self.interval * self.sr))
+        self._next_update += step * ((self.samples - self._next_update) // step + 1)
+        return self.update()
+
+    def _process(self, frames: np.ndarray):
+        """Atualiza os anéis com frames novos (n_fft x n)"""
+        D = np.fft.rfft(frames * self._window[:, np.newaxis], axis=0).astype(np.complex64)
+        S = np.abs(D)
+        power = S ** 2
+
+        log_mel = librosa.power_to_db(self._mel_basis @ power, top_db=None)
+        log_mel = np.maximum(log_mel, log_mel.max(axis=0) - 80.0)
+        reference = log_mel if self._previous_log_mel is None else np.hstack([self._previous_log_mel, log_mel])
+        flux = np.maximum(0.0, np.diff(reference, axis=1))
+        if self._previous_log_mel is None:
+            flux = np.hstack([np.zeros((flux.shape[0], 1), dtype=flux.dtype), flux])
+        self._previous_log_mel = log_mel[:, -1:]
+
+        self.series.append(np.vstack([
+            np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=0)),
+            librosa.feature.spectral_centroid(S=S, sr=self.sr)[0],
+            librosa.feature.spectral_bandwidth(S=S, sr=self.sr)[0],
+            librosa.feature.spectral_rolloff(S=S, sr=self.sr)[0],
+            np.mean(flux, axis=0),
+            np.median(flux, axis=0)
+        ]))
+        self.magnitude.append(S)
+        self._separate(D)
+
+    def _separate(self, D: np.ndarray):
+        """HPSS frame a frame: mediana centrada de 31 frames e overlap-add dos dois sinais"""
+        columns = np.hstack([self._context, D])
+        self._context = columns[:, -(HPSS_KERNEL - 1):]
+        if columns.shape[1] < HPSS_KERNEL:
+            return
+        magnitude = np.abs(columns)
+        # Frames com a janela da mediana completa (15 antes e 15 depois)
+        centered = slice(HPSS_DELAY, columns.shape[1] - HPSS_DELAY)
+        # Só as colunas centradas: mais barato que median_filter sobre o contexto inteiro
+        harm = np.median(np.lib.stride_tricks.sliding_window_view(magnitude, HPSS_KERNEL, axis=1), axis=2)
+        perc = median_filter(magnitude[:, centered], size=(HPSS_KERNEL, 1), mode="reflect")
+        mask_harm = librosa.util.softmask(harm, perc, power=2, split_zeros=True)
+        mask_perc = librosa.util.softmask(perc, harm, power=2, split_zeros=True)
+
+        signals = [
+            np.fft.irfft(columns[:, centered] * mask, n=N_FFT, axis=0) * self._window[:, np.newaxis] / _OLA_GAIN
+            for mask in (mask_harm, mask_perc)
+        ]
+        amplitudes = np.zeros((2, signals[0].shape[1]), dtype=np.float32)
+        for i in range(signals[0].shape[1]):
+            self._ola[0] += signals[0][:, i]
+            self._ola[1] += signals[1][:, i]
+            # O primeiro hop do buffer não recebe mais frames: está completo
+            amplitudes[:, i] = np.sum(np.abs(self._ola[:, :HOP_LENGTH]), axis=1)
+            self._ola = np.roll(self._ola, -HOP_LENGTH, axis=1)
+            self._ola[:, -HOP_LENGTH:] = 0.0
+        self.balance.append(amplitudes)
+
+    def features(self) -> dict:
+        """Features da janela atual no formato de AudioAnalyzer.analyze (seções usadas pela descrição)"""
+        series = dict(zip(FRAME_SERIES, self.series.view()))
+        if not series["rms"].size:
+            raise ValueError("Áudio insuficiente: menos de um frame recebido")
+
+        def stats(name):
+            return float(np.mean(series[name])), float(np.std(series[name]))
+
+        tempo = librosa.feature.tempo(onset_envelope=series["beat_onset"], sr=self.sr, hop_length=HOP_LENGTH)
+        loudness = librosa.amplitude_to_db(self.magnitude.view(), ref=np.max)
+        harmonic, percussive = np.sum(self.balance.view().astype(np.float64), axis=1)
+        total = harmonic + percussive
+
+        rms_mean, rms_std = stats("rms")
+        result = {
+            "metadata": {
+                "duration": round(self.elapsed, 2),
+                "bitrate": self.bitrate,
+                "sample_rate": self.sr,
+                "title": 'Live',
+                "artist": 'Unknown',
+                "genre": self.genre
+            },
+            "temporal": {"rms_mean": rms_mean, "rms_std": rms_std, "rms_max": float(np.max(series["rms"]))},
+            "spectral": {},
+            "rhythmic": {
+                "tempo_bpm": float(tempo[0]),
+                "onset_strength_mean": float(np.mean(series["onset"])),
+                "onset_strength_max": float(np.max(series["onset"]))
+            },
+            "harmonic": {
+                "harmonic_ratio": float(harmonic / total) if total else 0.0,
+                "percussive_ratio": float(percussive / total) if total else 0.0
+            },
+            "energy": {
+                "loudness_mean": float(np.mean(loudness)),
+                "loudness_max": float(np.max(loudness)),
+                "loudness_min": float(np.min(loudness)),
+                "dynamic_range": float(np.max(series["rms"]) - np.min(series["rms"]))
+            }
+        }
+        for name in ("centroid", "bandwidth", "rolloff"):
+            mean, std = stats(name)
+            result["spectral"].update({f"{name}_mean": mean, f"{name}_std": std})
+        return result
+
+    def update(self) -> dict:
+        """Features e descrição da janela atual, com o tempo de cálculo (latency)"""
+        start = time.perf_counter()
+        features = self.features()
+        description = DescriptionGenerator(features).generate()
+        return {
+            "time": round(self.elapsed, 2),
+            "window": round(min(self.elapsed, self.window), 2),
+            "latency": round(time.perf_counter() - start, 4),
+            "features": features,
+            "description": description
+        }
+
+
+def _to_float(data: bytes, width: int) -> np.ndarray:
+    """Amostras PCM inteiras little-endian para float32 em [-1, 1)"""
+    if width == 1:
+        return (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    if width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values >= 1 << 23, values - (1 << 24), values)
+        return values.astype(np.float32) / float(1 << 23)
+    dtype = {2: "<i2", 4: "<i4"}[width]
+    return np.frombuffer(data, dtype=dtype).astype(np.float32) / float(1 << (8 * width - 1))
+
+
+class WavInput:
+    """WAV PCM lido sequencialmente (funciona em pipes, sem seek)"""
+
+    def __init__(self, stream):
+        self.reader = wave.open(stream, 'rb')
+        self.sr = self.reader.getframerate()
+        self.channels = self.reader.getnchannels()
+        self.width = self.reader.getsampwidth()
+        self.bitrate = self.sr * self.channels * self.width * 8
+
+    def blocks(self, frames: int):
+        while True:
+            data = self.reader.readframes(frames)
+            if not data:
+                return
+            # Um pipe pode entregar um frame pela metade no fim
+            data = data[:len(data) - len(data) % (self.width * self.channels)]
+            yield _to_float(data, self.width).reshape(-1, self.channels).mean(axis=1)
+
+
+class RawInput:
+    """PCM cru s16le intercalado"""
+
+    def __init__(self, stream, sr: int, channels: int = 1):
+        self.stream = stream
+        self.sr = sr
+        self.channels = channels
+        self.bitrate = sr * channels * 16
+
+    def blocks(self, frames: int):
+        size = frames * self.channels * 2
+        pending = b""
+        while True:
+            data = self.stream.read(size)
+            if not data:
+                return
+            data = pending + data
+            usable = len(data) - len(data) % (self.channels * 2)
+            pending = data[usable:]
+            yield _to_float(data[:usable], 2).reshape(-1, self.channels).mean(axis=1)
+
+
+class DeviceInput:
+    """Captura de um dispositivo de som via sounddevice (opcional)"""
+
+    def __init__(self, device=None, sr: int = None, channels: int = 1):
+        if sounddevice is None:
+            raise RuntimeError("Captura de dispositivo requer o pacote sounddevice (pip install sounddevice)")
+        info = sounddevice.query_devices(device, 'input')
+        self.device = device
+        self.sr = int(sr or info["default_samplerate"])
+        self.channels = channels
+        self.bitrate = self.sr * channels * 32
+
+    def blocks(self, frames: int):
+        with sounddevice.InputStream(device=self.device, samplerate=self.sr, channels=self.channels,
+                                     dtype="float32", blocksize=frames) as stream:
+            while True:
+                data, _ = stream.read(frames)
+                yield data.mean(axis=1)
+
+
+def feed_wav(file_path: str, out=None, speed: float = 1.0, block_seconds: float = 0.1):
+    """Escreve um arquivo de áudio como WAV 16 bits mono em out, no ritmo de reprodução
+
+    speed 1.0 = tempo real, 2.0 = o dobro; 0 = sem pausas. Serve para testar o
+    modo ao vivo com um arquivo: feed faixa.mp3 | live.
+    """
+    from core.ingest import AudioSource
+
+    y, sr = AudioSource(file_path).decode()
+    pcm = (np.clip(y, -1.0, 1.0 - 1.0 / 32768) * 32768).astype("<i2")
+    out = out or sys.stdout.buffer
+    # Cabeçalho escrito à mão com o tamanho final: o módulo wave faz seek para
+    # corrigi-lo durante a escrita, o que falha num pipe
+    data_size = pcm.size * 2
+    out.write(b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE")
+    out.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sr, sr * 2, 2, 16))
+    out.write(b"data" + struct.pack("<I", data_size))
+    block = max(1, int(block_seconds * sr))
+    start = time.monotonic()
+    for offset in range(0, pcm.size, block):
+        out.write(pcm[offset:offset + block].tobytes())
+        out.flush()
+        if speed:
+            delay = start + (offset + block) / sr / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
@@ -0,0 +1,199 @@
+"""
+Music-Makro - Parallel Extraction
+Extratores de uma mesma faixa em vários processos, com o sinal em memória compartilhada
+
+O sinal decodificado é copiado uma única vez para um bloco de
+multiprocessing.shared_memory; os processos recebem só o nome, o formato e o
+tipo do bloco e leem o sinal sem cópia (nada de pickle da forma de onda).
+Cada grupo de seções roda num processo com seu próprio FeatureContext.
+
+A HPSS, a etapa mais cara, é dividida pelos seus dois filtros de mediana: o
+harmônico (ao longo do tempo) por faixas de frequência e o percussivo (ao
+longo da frequência) por blocos de frames. As fatias são independentes, de
+modo que o resultado é idêntico ao de librosa.decompose.hpss.
+
+O pool é mantido aquecido por processo e reaproveitado entre análises.
+Processos daemon (workers do modo em lote e do serviço) não podem criar
+filhos; neles a análise continua em série.
+"""
+
+import atexit
+import contextlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import librosa
+import numpy as np
+from scipy.ndimage import median_filter
+
+from core import startup
+
+# Parâmetros padrão de librosa.decompose.hpss (kernel_size=31, power=2, margin=1)
+HPSS_KERNEL = 31
+HPSS_POWER = 2.0
+
+# Intervalo com que os processos do pool verificam se o processo pai ainda existe
+PARENT_POLL_SECONDS = 1.0
+
+_pool = None
+_pool_workers = 0
+
+
+class SharedArray:
+    """ndarray num bloco de memória compartilhada, anexável por outros processos"""
+
+    def __init__(self, shape, dtype):
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape, dtype=np.int64)) * dtype.itemsize)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.spec = (self.shm.name, tuple(shape), dtype.str)
+
+    @classmethod
+    def copy_of(cls, array: np.ndarray) -> "SharedArray":
+        shared = cls(array.shape, array.dtype)
+        view = shared.view()
+        view[...] = array
+        del view
+        return shared
+
+    def view(self) -> np.ndarray:
+        name, shape, dtype = self.spec
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+
+    def close(self):
+        """Libera o bloco (as views devolvidas por view() precisam ter sido descartadas)"""
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextlib.contextmanager
+def attach(spec):
+    """View de um SharedArray criado em outro processo, válida dentro do bloco with"""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        yield np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # Views presas no traceback de uma exceção: o mapeamento sai com o coletor de lixo
+            pass
+
+
+def _init_worker(parent: int):
+    """Inicialização dos processos do pool: vigia o pai e importa o analisador"""
+    def watch():
+        # Um pai encerrado à força (cancelamento na interface) não fecha o pool
+        while os.getppid() == parent:
+            time.sleep(PARENT_POLL_SECONDS)
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+    startup.preload(("core.audio_analyzer",))
+
+
+def section_pool(workers: int):
+    """Pool de processos do processo atual (None se workers <= 1 ou em processo daemon)"""
+    global _pool, _pool_workers
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        return None
+    if _pool is None or _pool_workers != workers:
+        discard_pool()
+        _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=_init_worker, initargs=(os.getpid(),))
+        _pool_workers = workers
+    return _pool
+
+
+def discard_pool(wait: bool = False):
+    """Encerra o pool (ex.: depois de um processo morto, que o deixa inutilizável)"""
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=wait, cancel_futures=True)
+    _pool, _pool_workers = None, 0
+
+
+# Na saída, espera os processos do pool: o multiprocessing faz join dos filhos
+atexit.register(discard_pool, wait=True)
+
+
+def warm_pool(workers: int):
+    """Inicia os processos do pool antes da primeira análise"""
+    pool = section_pool(workers)
+    if pool is not None:
+        for future in [pool.submit(int) for _ in range(workers)]:
+            future.result()
+
+
+def extract_sections(cls, file_path: str, signal_spec, sr: int, n_fft: int, hop_length: int,
+                     requested: dict) -> tuple:
+    """Executa as seções pedidas sobre o sinal compartilhado; retorna (resultado, matrizes por frame)"""
+    from core.feature_context import FeatureContext
+
+    with attach(signal_spec) as y:
+        analyzer = cls(file_path, workers=1)
+        analyzer.y, analyzer.sr = y, sr
+        analyzer.context = FeatureContext(y, sr, n_fft=n_fft, hop_length=hop_length)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = analyzer._extract_features(requested)
+        frames = analyzer.frames
+        # Nenhuma referência ao bloco pode sobreviver ao close() de attach
+        del analyzer, y
+    return result, frames
+
+
+def _median_slice(source_spec, target_spec, axis: int, start: int, stop: int):
+    """Filtro de mediana da HPSS sobre as linhas (axis=0) ou colunas (axis=1) [start, stop)"""
+    size = (1, HPSS_KERNEL) if axis == 0 else (HPSS_KERNEL, 1)
+    with attach(source_spec) as source, attach(target_spec) as target:
+        index = (slice(start, stop), slice(None)) if axis == 0 else (slice(None), slice(start, stop))
+        target[index] = median_filter(source[index], size=size, mode="reflect")
+        del source, target
+
+
+class ParallelHPSS:
+    """librosa.decompose.hpss com os filtros de mediana divididos entre os processos do pool"""
+
+    def __init__(self, pool, stft: np.ndarray, chunks: int):
+        magnitude, self.phase = librosa.magphase(stft)
+        self.magnitude = SharedArray.copy_of(magnitude)
+        self.harmonic = SharedArray(magnitude.shape, magnitude.dtype)
+        self.percussive = SharedArray(magnitude.shape, magnitude.dtype)
+        self.futures = []
+        # Harmônico: mediana ao longo do tempo, independente por linha (frequência);
+        # percussivo: ao longo da frequência, independente por coluna (frame)
+        for target, axis in ((self.harmonic, 0), (self.percussive, 1)):
+            bounds = np.linspace(0, magnitude.shape[axis], chunks + 1).astype(int)
+            self.futures.extend(
+                pool.submit(_median_slice, self.magnitude.spec, target.spec, axis, int(start), int(stop))
+                for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+            )
+
+    def result(self) -> tuple:
+        """(stft_harmônica, stft_percussiva), como librosa.decompose.hpss(stft)"""
+        for future in self.futures:
+            future.result()
+        S, harm, perc = self.magnitude.view(), self.harmonic.view(), self.percussive.view()
+        mask_harm = librosa.util.softmask(harm, perc, power=HPSS_POWER, split_zeros=True)
+        mask_perc = librosa.util.softmask(perc, harm, power=HPSS_POWER, split_zeros=True)
+        result = ((S * mask_harm) * self.phase, (S * mask_perc) * self.phase)
+        del S, harm, perc
+        return result
+
+    def close(self):
+        for future in self.futures:
+            future.cancel()
+        for shared in (self.magnitude, self.harmonic, self.percussive):
+            shared.close()
@@ -0,0 +1,116 @@
+"""
+Music-Makro - PCM Cache
+Cache em disco do áudio decodificado, lido por memory-map
+
+Cada arquivo de áudio vira um <hash do conteúdo>.<taxa>.npy com o sinal mono
+em float32, exatamente o que AudioSource.decode() devolve. Uma nova análise do
+mesmo conteúdo (ex.: ao variar hop_length ou n_mfcc) mapeia o .npy em modo
+somente leitura em vez de decodificar o MP3: as páginas são lidas sob demanda
+pelo sistema operacional e o custo passa a ser só o dos extratores.
+
+O mtime de cada arquivo marca o último uso; acima de max_bytes os menos usados
+recentemente são removidos. Gravações vão para um arquivo temporário renomeado
+no fim, o que permite vários processos (modo em lote) no mesmo diretório.
+"""
+
+import glob
+import os
+
+import numpy as np
+
+from config import settings
+
+
+def default_pcm_cache_dir() -> str:
+    """Diretório padrão do cache de PCM"""
+    return settings.PCM_CACHE_DIR or os.path.join(settings.CACHE_DIR, "pcm")
+
+
+class PCMCache:
+    """Áudio decodificado por hash do conteúdo, com limite de tamanho LRU"""
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or default_pcm_cache_dir()
+        self.max_bytes = settings.PCM_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _files(self) -> list:
+        return glob.glob(os.path.join(self.directory, "*.npy"))
+
+    def get(self, digest: str):
+        """(sinal somente leitura mapeado do disco, taxa) ou None"""
+        for path in glob.glob(os.path.join(self.directory, f"{digest}.*.npy")):
+            sr = path[:-len(".npy")].rsplit(".", 1)[-1]
+            if not sr.isdigit():
+                continue
+            try:
+                y = np.load(path, mmap_mode='r')
+                os.utime(path)
+            except (OSError, ValueError):
+                # Removido por outro processo ou gravação incompleta
+                continue
+            self.hits += 1
+            # ndarray comum (sem a subclasse memmap) sobre o mesmo mapeamento
+            return np.asarray(y), int(sr)
+        self.misses += 1
+        return None
+
+    def put(self, digest: str, y: np.ndarray, sr: int):
+        """Grava o sinal decodificado e aplica o limite de tamanho"""
+        path = os.path.join(self.directory, f"{digest}.{int(sr)}.npy")
+        temporary = os.path.join(self.directory, f".{digest}.{os.getpid()}.tmp")
+        try:
+            with open(temporary, 'wb') as f:
+                np.save(f, np.asarray(y, dtype=np.float32))
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove os arquivos menos usados recentemente até caber em max_bytes; retorna quantos"""
+        if not self.max_bytes:
+            return 0
+        entries = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                # Um mapeamento aberto continua válido depois da remoção (POSIX);
+                # no Windows o arquivo em uso fica para a próxima vez
+                os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+            total -= size
+        return removed
+
+    def stats(self) -> dict:
+        """Número de arquivos, tamanho total e acertos/falhas da sessão"""
+        sizes = []
+        for path in self._files():
+            try:
+                sizes.append(os.path.getsize(path))
+            except FileNotFoundError:
+                continue
+        return {"entries": len(sizes), "bytes": sum(sizes), "session_hits": self.hits,
+                "session_misses": self.misses}
+
+    def clear(self):
+        """Remove todo o áudio armazenado"""
+        for path in self._files():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
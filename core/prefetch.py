@@ -0,0 +1,147 @@
+"""
+Music-Makro - Prefetch
+Pipeline produtor/consumidor que lê e decodifica os próximos arquivos durante a análise
+
+Threads de pré-carga executam load() sobre os itens enviados por submit(), na
+ordem de envio, e guardam os resultados num buffer limitado por profundidade
+(itens em carga ou prontos) e por memória (bytes dos itens prontos, medidos por
+size()). take() entrega os itens na mesma ordem. O libsndfile, o hash e a
+leitura do disco liberam o GIL, de modo que a decodificação do próximo arquivo
+avança enquanto a thread principal extrai as features do atual.
+
+As esperas dos dois lados indicam o gargalo: o consumidor esperando por itens
+significa decodificação lenta; as threads ociosas (buffer cheio ou nada
+enviado) significam análise lenta.
+"""
+
+import threading
+import time
+from collections import deque
+
+from config import settings
+
+
+def bottleneck(consumer_wait: float, producer_idle: float) -> str:
+    """Gargalo estimado: "decode" se a análise esperou mais pela pré-carga do que o contrário"""
+    return "decode" if consumer_wait > producer_idle else "analysis"
+
+
+class _Item:
+    """Um item enviado: estado, resultado e tempos"""
+
+    def __init__(self, key):
+        self.key = key
+        self.state = "queued"  # queued, loading, ready
+        self.value = None
+        self.error = None
+        self.nbytes = 0
+        self.load_seconds = 0.0
+        self.idle_seconds = 0.0
+
+
+class PrefetchPipeline:
+    """Buffer limitado de itens carregados à frente do consumo"""
+
+    def __init__(self, load, depth: int = None, threads: int = None, max_bytes: int = None, size=None):
+        self.load = load
+        self.size = size
+        self.depth = max(1, settings.PREFETCH_DEPTH if depth is None else depth)
+        self.max_bytes = settings.PREFETCH_MAX_BYTES if max_bytes is None else max_bytes
+        self._items = deque()
+        self._bytes = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._totals = {"items": 0, "load": 0.0, "consumer_wait": 0.0, "producer_idle": 0.0}
+        self._threads = [
+            threading.Thread(target=self._produce, daemon=True)
+            for _ in range(max(1, settings.PREFETCH_THREADS if threads is None else threads))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key):
+        """Enfileira um item para pré-carga"""
+        with self._cond:
+            self._items.append(_Item(key))
+            self._cond.notify_all()
+
+    def take(self) -> tuple:
+        """Próximo item na ordem de envio: (chave, valor, erro, tempos)
+
+        Bloqueia até o item ficar pronto. erro é a exceção de load(), se houve;
+        tempos traz load (segundos de carga), wait (espera do consumidor) e
+        idle (tempo ocioso da thread antes de começar a carregar o item).
+        """
+        start = time.monotonic()
+        with self._cond:
+            if not self._items:
+                raise LookupError("Nenhum item enviado para pré-carga")
+            item = self._items[0]
+            while item.state != "ready":
+                self._cond.wait()
+            self._items.popleft()
+            self._bytes -= item.nbytes
+            wait = time.monotonic() - start
+            self._totals["items"] += 1
+            self._totals["load"] += item.load_seconds
+            self._totals["consumer_wait"] += wait
+            self._totals["producer_idle"] += item.idle_seconds
+            self._cond.notify_all()
+        timings = {
+            "load": round(item.load_seconds, 3),
+            "wait": round(wait, 3),
+            "idle": round(item.idle_seconds, 3)
+        }
+        return item.key, item.value, item.error, timings
+
+    def stats(self) -> dict:
+        """Totais acumulados e o gargalo estimado"""
+        with self._cond:
+            stats = dict(self._totals, buffered_bytes=self._bytes, depth=self.depth)
+        stats["bottleneck"] = bottleneck(stats["consumer_wait"], stats["producer_idle"])
+        return stats
+
+    def close(self):
+        """Encerra as threads (itens em carga terminam e são descartados)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1)
+
+    def _next(self):
+        """Próximo item a carregar, respeitando profundidade e memória (None ao encerrar)"""
+        idle_since = time.monotonic()
+        with self._cond:
+            while not self._closed:
+                window = list(self._items)[:self.depth]
+                queued = next((item for item in window if item.state == "queued"), None)
+                if queued is not None:
+                    # O primeiro item da fila sempre entra, mesmo acima do limite de memória
+                    room = not self.max_bytes or self._bytes < self.max_bytes or queued is self._items[0]
+                    if room:
+                        queued.state = "loading"
+                        queued.idle_seconds = time.monotonic() - idle_since
+                        return queued
+                self._cond.wait()
+        return None
+
+    def _produce(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            start = time.monotonic()
+            try:
+                value, error = self.load(item.key), None
+            except Exception as e:
+                value, error = None, e
+            seconds = time.monotonic() - start
+            nbytes = self.size(value) if self.size and value is not None else 0
+            with self._cond:
+                item.value, item.error = value, error
+                item.load_seconds = seconds
+                item.nbytes = nbytes
+                self._bytes += nbytes
+                item.state = "ready"
+                self._cond.notify_all()
@@ -0,0 +1,149 @@
+"""
+Music-Makro - Preview Analyzer
+Análise rápida de triagem a partir de trechos representativos
+
+Em vez de decodificar a faixa inteira, lê apenas três trechos (início, meio e
+a região mais alta encontrada por sondagens curtas), converte para mono em
+PREVIEW_SR e roda os mesmos extratores com resolução temporal menor. As grandezas extensivas
+(total_energy, beats_count) são reescaladas para a duração e a taxa de
+amostragem originais; as demais são estatísticas dos trechos.
+
+O relatório benchmarks/reports/preview_report.md compara esta análise com a
+completa (gerado por benchmarks/preview_report.py).
+"""
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from core.audio_analyzer import AudioAnalyzer
+from core.feature_context import FeatureContext
+
+PREVIEW_SR = 22050
+# Janela com a mesma duração da análise completa (2048 amostras a 44,1 kHz),
+# para que RMS e faixa dinâmica sejam comparáveis. O hop de 512 amostras a
+# 22,05 kHz é 2x mais grosso no tempo; hop igual a n_fft tornaria o HPSS
+# instável (sem sobreposição entre janelas na ISTFT).
+PREVIEW_N_FFT = 1024
+PREVIEW_HOP_LENGTH = 512
+EXCERPT_SECONDS = 10.0
+
+# Sondagens usadas para localizar a região mais alta da faixa
+PROBE_COUNT = 12
+PROBE_SECONDS = 1.0
+
+# Rampa aplicada nas junções entre trechos
+FADE_SECONDS = 0.05
+
+
+class PreviewAnalyzer(AudioAnalyzer):
+    """Analisador de prévia: poucos trechos, mono, taxa reduzida e hop maior"""
+
+    # Os trechos concatenados não têm a linha do tempo da faixa
+    supports_timeline = False
+    # Trechos curtos: o custo de distribuir entre processos supera o ganho
+    supports_parallel = False
+    # A impressão digital precisa da faixa inteira, não dos trechos
+    supports_fingerprint = False
+
+    def __init__(self, file_path: str, cache=None, excerpt_seconds: float = EXCERPT_SECONDS, **hooks):
+        super().__init__(file_path, cache=cache, **hooks)
+        self.excerpt_seconds = excerpt_seconds
+        self.excerpts = []
+        self.duration = None
+        self.native_sr = None
+
+    def params(self) -> dict:
+        params = super().params()
+        params.update({
+            "mode": "preview",
+            "sr": PREVIEW_SR,
+            "n_fft": PREVIEW_N_FFT,
+            "hop_length": PREVIEW_HOP_LENGTH,
+            "excerpt_seconds": self.excerpt_seconds
+        })
+        return params
+
+    def _compute(self, requested=None) -> dict:
+        with self._stage("load"):
+            self._load_audio()
+        result = self._extract_features(requested)
+
+        # Grandezas extensivas: extrapolar dos trechos para a faixa inteira
+        analyzed = sum(length for _, length in self.excerpts)
+        scale = self.duration / analyzed if analyzed else 1.0
+        rhythmic, energy = result.get("rhythmic", {}), result.get("energy", {})
+        if "beats_count" in rhythmic:
+            rhythmic["beats_count"] = int(round(rhythmic["beats_count"] * scale))
+        if "total_energy" in energy:
+            energy["total_energy"] *= scale * self.native_sr / PREVIEW_SR
+
+        result["preview"] = {
+            "sample_rate": PREVIEW_SR,
+            "n_fft": PREVIEW_N_FFT,
+            "hop_length": PREVIEW_HOP_LENGTH,
+            "excerpts": [[round(start, 2), round(length, 2)] for start, length in self.excerpts]
+        }
+        return result
+
+    def _prefetch_audio(self):
+        # Só o conteúdo do arquivo: os trechos dependem da duração e são decodificados na análise
+        self.source
+
+    def _load_audio(self):
+        print("→ Carregando trechos representativos...")
+        try:
+            with self.source.open() as f, sf.SoundFile(f) as sfo:
+                self.native_sr = sfo.samplerate
+                self.duration = sfo.frames / sfo.samplerate
+                self.excerpts = self._select_excerpts(lambda start, length: self._read(sfo, start, length))
+                chunks = [self._read(sfo, start, length) for start, length in self.excerpts]
+        except sf.LibsndfileError:
+            # Formatos fora do libsndfile (ex.: M4A): um decode por trecho
+            self.native_sr = librosa.get_samplerate(self.file_path)
+            self.duration = librosa.get_duration(path=self.file_path)
+            self.excerpts = self._select_excerpts(self._load)
+            chunks = [self._load(start, length) for start, length in self.excerpts]
+
+        chunks = [librosa.resample(chunk, orig_sr=self.native_sr, target_sr=PREVIEW_SR) for chunk in chunks]
+        self.y = np.concatenate([self._fade(chunk) for chunk in chunks]).astype(np.float32)
+        self.sr = PREVIEW_SR
+        self.context = FeatureContext(self.y, self.sr, n_fft=PREVIEW_N_FFT, hop_length=PREVIEW_HOP_LENGTH)
+
+    def _select_excerpts(self, read) -> list:
+        """Escolhe (início, duração) do início, do meio e da região mais alta"""
+        length = self.excerpt_seconds
+        if self.duration <= 3 * length:
+            return [(0.0, self.duration)]
+
+        excerpts = [(0.0, length), (self.duration / 2 - length / 2, length)]
+
+        offsets = np.linspace(0, self.duration - PROBE_SECONDS, PROBE_COUNT)
+        energies = [float(np.mean(read(offset, PROBE_SECONDS) ** 2)) for offset in offsets]
+        for index in np.argsort(energies)[::-1]:
+            center = offsets[index] + PROBE_SECONDS / 2
+            start = float(np.clip(center - length / 2, 0, self.duration - length))
+            if all(abs(start - other) >= length for other, _ in excerpts):
+                excerpts.append((start, length))
+                break
+
+        return sorted(excerpts)
+
+    def _read(self, sfo, start: float, length: float) -> np.ndarray:
+        sfo.seek(int(start * sfo.samplerate))
+        data = sfo.read(int(length * sfo.samplerate), dtype='float32', always_2d=True)
+        return librosa.to_mono(data.T)
+
+    def _load(self, start: float, length: float) -> np.ndarray:
+        y, _ = librosa.load(self.file_path, sr=None, mono=True, offset=start, duration=length)
+        return y
+
+    def _fade(self, y: np.ndarray) -> np.ndarray:
+        """Rampa curta nas pontas para não criar onsets artificiais nas junções"""
+        n = min(int(FADE_SECONDS * PREVIEW_SR), y.size // 2)
+        if n > 0:
+            ramp = np.linspace(0.0, 1.0, n, dtype=y.dtype)
+            y = y.copy()
+            y[:n] *= ramp
+            y[-n:] *= ramp[::-1]
+        return y
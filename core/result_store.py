@@ -0,0 +1,227 @@
+"""
+Music-Makro - Result Store
+Armazenamento colunar dos resultados de análise, lido por memory-map
+
+Um diretório com uma coluna por arquivo binário e um schema.json:
+    <coluna>.f8 / <coluna>.f4   números (float64) e vetores (float32, uma linha por faixa);
+    <coluna>.offsets + .utf8    textos: fim de cada valor (int64) e os bytes UTF-8 concatenados;
+    schema.json                 tipos, formatos e o número de linhas confirmadas.
+
+As colunas seguem os nomes "seção.chave" das features (mais file, status,
+error, description e timings.total), de modo que o resultado de load() serve
+direto para DescriptionGenerator(table=...). Valores ausentes são NaN (ou texto
+vazio). Seções aninhadas (timeline, preview) não são armazenadas.
+
+Novos registros são anexados ao fim de cada arquivo e só passam a valer quando
+o schema.json é regravado; um append interrompido é descartado no próximo.
+Um único processo deve escrever por vez.
+"""
+
+import json
+import numbers
+import os
+
+import numpy as np
+
+from core.audio_analyzer import SECTIONS
+
+# Formato do diretório (incrementar ao mudar a estrutura)
+STORE_FORMAT = 1
+
+SCHEMA_FILE = "schema.json"
+
+# Campos do registro do modo batch guardados além das features
+RECORD_FIELDS = ("file", "status", "error", "description")
+
+
+def _flatten(record: dict) -> dict:
+    """{"coluna": valor} de um registro do modo batch (só valores escalares, vetores e textos)"""
+    row = {name: record[name] for name in RECORD_FIELDS if isinstance(record.get(name), str)}
+    total = (record.get("timings") or {}).get("total")
+    if isinstance(total, numbers.Real):
+        row["timings.total"] = total
+    for section, values in (record.get("features") or {}).items():
+        if section not in SECTIONS or not isinstance(values, dict):
+            continue
+        for key, value in values.items():
+            row[f"{section}.{key}"] = value
+    return row
+
+
+def _column_spec(value) -> dict:
+    """Tipo de coluna para o primeiro valor visto; None se o valor não é armazenável"""
+    if isinstance(value, str):
+        return {"kind": "string"}
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return {"kind": "float", "dtype": "<f8", "shape": []}
+    if isinstance(value, list) and value and all(
+            isinstance(v, numbers.Real) and not isinstance(v, bool) for v in value):
+        return {"kind": "float", "dtype": "<f4", "shape": [len(value)]}
+    return None
+
+
+class ResultStore:
+    """Diretório colunar de resultados, com append e leitura por coluna"""
+
+    def __init__(self, path: str):
+        self.path = path
+        schema_path = os.path.join(path, SCHEMA_FILE)
+        if os.path.exists(schema_path):
+            with open(schema_path, 'r', encoding='utf-8') as f:
+                self.schema = json.load(f)
+            if self.schema.get("format") != STORE_FORMAT:
+                raise ValueError(f"Formato de armazenamento não suportado: {self.schema.get('format')}")
+        else:
+            self.schema = {"format": STORE_FORMAT, "rows": 0, "columns": {}}
+
+    def __len__(self) -> int:
+        return self.schema["rows"]
+
+    @property
+    def columns(self) -> list:
+        return list(self.schema["columns"])
+
+    def _file(self, name: str, suffix: str) -> str:
+        return os.path.join(self.path, f"{name}.{suffix}")
+
+    def _files(self, name: str) -> list:
+        spec = self.schema["columns"][name]
+        if spec["kind"] == "string":
+            return [self._file(name, "offsets"), self._file(name, "utf8")]
+        return [self._file(name, spec["dtype"][1:])]
+
+    def _row_bytes(self, spec: dict) -> int:
+        return np.dtype(spec["dtype"]).itemsize * int(np.prod(spec["shape"], dtype=np.int64))
+
+    # Escrita
+
+    def append(self, records, skip_existing: bool = True) -> int:
+        """Anexa registros do modo batch; retorna quantos foram gravados
+
+        skip_existing ignora arquivos que já estão no armazenamento (ou repetidos
+        entre os registros recebidos, mantendo o primeiro).
+        """
+        if skip_existing:
+            seen = set(self.column("file").tolist()) if "file" in self.schema["columns"] else set()
+            unique = []
+            for record in records:
+                if record.get("file") not in seen:
+                    seen.add(record.get("file"))
+                    unique.append(record)
+            records = unique
+        rows = [_flatten(record) for record in records]
+        if not rows:
+            return 0
+
+        os.makedirs(self.path, exist_ok=True)
+        self._discard_uncommitted()
+        for row in rows:
+            for name, value in row.items():
+                if name not in self.schema["columns"]:
+                    spec = _column_spec(value)
+                    if spec is not None:
+                        self._add_column(name, spec)
+
+        for name, spec in self.schema["columns"].items():
+            values = [row.get(name) for row in rows]
+            if spec["kind"] == "string":
+                self._append_strings(name, values)
+            else:
+                self._append_floats(name, spec, values)
+
+        self.schema["rows"] += len(rows)
+        self._save_schema()
+        return len(rows)
+
+    def _add_column(self, name: str, spec: dict):
+        """Cria a coluna preenchendo as linhas já gravadas com ausentes"""
+        self.schema["columns"][name] = spec
+        for path in self._files(name):
+            open(path, 'wb').close()
+        if spec["kind"] == "string":
+            self._append_strings(name, [None] * len(self))
+        else:
+            self._append_floats(name, spec, [None] * len(self))
+
+    def _append_floats(self, name: str, spec: dict, values: list):
+        if not spec["shape"]:
+            block = np.array([
+                value if isinstance(value, numbers.Real) and not isinstance(value, bool) else np.nan
+                for value in values
+            ], dtype=spec["dtype"])
+        else:
+            block = np.full((len(values),) + tuple(spec["shape"]), np.nan, dtype=spec["dtype"])
+            # Vetores de outro tamanho (ex.: outro n_mfcc) ficam como ausentes
+            rows = [i for i, value in enumerate(values)
+                    if isinstance(value, list) and len(value) == spec["shape"][0]]
+            if rows:
+                block[rows] = np.array([values[i] for i in rows], dtype=spec["dtype"])
+        with open(self._files(name)[0], 'ab') as f:
+            f.write(block.tobytes())
+
+    def _append_strings(self, name: str, values: list):
+        offsets_path, data_path = self._files(name)
+        encoded = [value.encode('utf-8') if isinstance(value, str) else b"" for value in values]
+        start = os.path.getsize(data_path)
+        ends = start + np.cumsum([len(data) for data in encoded], dtype=np.int64)
+        with open(data_path, 'ab') as f:
+            f.write(b"".join(encoded))
+        with open(offsets_path, 'ab') as f:
+            f.write(ends.astype("<i8").tobytes())
+
+    def _discard_uncommitted(self):
+        """Corta bytes de um append interrompido (além das linhas do schema)"""
+        rows = len(self)
+        for name, spec in self.schema["columns"].items():
+            if spec["kind"] == "string":
+                offsets_path, data_path = self._files(name)
+                os.truncate(offsets_path, rows * 8)
+                os.truncate(data_path, int(self._ends(name)[-1]) if rows else 0)
+            else:
+                os.truncate(self._files(name)[0], rows * self._row_bytes(spec))
+
+    def _save_schema(self):
+        path = os.path.join(self.path, SCHEMA_FILE)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.schema, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def import_jsonl(self, paths, skip_existing: bool = True) -> int:
+        """Anexa os registros de arquivos JSONL do modo batch"""
+        records = []
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        return self.append(records, skip_existing=skip_existing)
+
+    # Leitura
+
+    def _ends(self, name: str) -> np.ndarray:
+        return np.memmap(self._files(name)[0], dtype="<i8", mode='r', shape=(len(self),))
+
+    def column(self, name: str) -> np.ndarray:
+        """Uma coluna: memmap somente leitura (números e vetores) ou array de objetos str (textos)"""
+        spec = self.schema["columns"][name]
+        if spec["kind"] == "string":
+            if not len(self):
+                return np.array([], dtype=object)
+            ends = self._ends(name).tolist()
+            with open(self._files(name)[1], 'rb') as f:
+                data = f.read(ends[-1])
+            starts = [0] + ends[:-1]
+            strings = np.empty(len(ends), dtype=object)
+            strings[:] = [data[a:b].decode('utf-8') for a, b in zip(starts, ends)]
+            return strings
+
+        shape = (len(self),) + tuple(spec["shape"])
+        if not len(self):
+            return np.empty(shape, dtype=spec["dtype"])
+        return np.memmap(self._files(name)[0], dtype=spec["dtype"], mode='r', shape=shape)
+
+    def load(self, names=None) -> dict:
+        """{"coluna": array} para as colunas pedidas (todas se names for None)"""
+        return {name: self.column(name) for name in (self.columns if names is None else names)}
@@ -0,0 +1,582 @@
+"""
+Music-Makro - Analysis Service
+Servidor HTTP local (asyncio) com pool de processos aquecidos e fila limitada
+
+Endpoints:
+    POST /analyze   corpo JSON {"path": ..., "mode": ..., "features": [...]} ou o
+                    próprio arquivo de áudio (?filename=faixa.mp3&mode=preview)
+    GET  /status    fila, throughput e percentis de latência por etapa
+    GET  /health    pronto quando ao menos um worker terminou o aquecimento
+
+Cada worker importa o librosa e analisa um sinal sintético curto antes de
+aceitar pedidos, de modo que o custo de importação e de compilação dos kernels
+numba não recai sobre a primeira requisição. A fila tem capacidade fixa:
+quando cheia, o servidor responde 503 com Retry-After em vez de acumular
+pedidos sem limite.
+
+O servidor escuta apenas em localhost por padrão e aceita caminhos locais
+arbitrários; não deve ser exposto a redes não confiáveis.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from config import settings
+from core.batch import analyze_track
+from core.cancellation import CancellationToken
+
+MODES = ("full", "stream", "preview")
+
+# Amostras de latência mantidas por etapa para os percentis
+LATENCY_WINDOW = 1000
+
+# Janela do throughput recente (segundos)
+THROUGHPUT_WINDOW = 60.0
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 422: "Unprocessable Entity",
+    500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class WorkerStartError(RuntimeError):
+    """O processo de trabalho não terminou o aquecimento (a mensagem traz a causa)"""
+
+
+def warm_up(modes=("full", "preview")):
+    """Analisa um sinal sintético para importar o librosa e compilar os kernels numba"""
+    import numpy as np
+    import soundfile as sf
+
+    sr = 22050
+    t = np.arange(3 * sr) / sr
+    y = 0.3 * np.sin(2 * np.pi * 220 * t)
+    y[::sr // 2] += 0.9  # cliques a 120 BPM para o beat tracking
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        sf.write(path, y.astype(np.float32), sr)
+        for mode in modes:
+            analyze_track(path, mode=mode)
+    finally:
+        os.remove(path)
+
+
+def _worker_main(conn, cache_path, analysis_workers=1):
+    """Processo de trabalho: aquece, avisa ("ready") e atende (caminho, modo, features, indexar)
+
+    Durante a análise envia ("stage", etapa) no início de cada etapa,
+    ("stage_end", (etapa, segundos)) no fim e ("progress", fração). Uma falha
+    no aquecimento é enviada como ("failed", causa).
+
+    O pipe é lido por uma thread à parte: a mensagem "cancel" aciona o
+    CancellationToken da tarefa em andamento, que termina com status
+    "cancelled" na próxima verificação e deixa o processo pronto para outra.
+
+    analysis_workers > 1 distribui os extratores de cada faixa em processos próprios.
+    """
+    try:
+        from core.feature_cache import FeatureCache
+        from core.parallel import warm_pool
+
+        settings.ANALYSIS_WORKERS = analysis_workers
+        cache = FeatureCache(cache_path) if cache_path else None
+        warm_up()
+        warm_pool(analysis_workers)
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", None))
+
+    def on_stage(stage, event, seconds):
+        if event == "start":
+            conn.send(("stage", stage))
+        else:
+            conn.send(("stage_end", (stage, seconds)))
+
+    def on_progress(fraction, stage):
+        conn.send(("progress", fraction))
+
+    tasks = queue.Queue()
+    lock = threading.Lock()
+    current = None
+
+    def receive():
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                message = None
+            if message == "cancel":
+                # Sem tarefa em andamento (já respondida), o pedido é ignorado
+                with lock:
+                    if current is not None:
+                        current.cancel()
+                continue
+            tasks.put(message)
+            if message is None:
+                return
+
+    threading.Thread(target=receive, daemon=True).start()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        path, mode, features, index_fingerprint = task
+        with lock:
+            current = CancellationToken()
+        record = analyze_track(path, cache, mode, features, on_stage, on_progress=on_progress,
+                               index_fingerprint=index_fingerprint, cancel_token=current)
+        with lock:
+            current = None
+        conn.send(("record", record))
+
+
+class PoolWorker:
+    """Processo aquecido; as chamadas bloqueantes rodam em uma thread do executor
+
+    Com analysis_workers > 1 o processo cria filhos e por isso não pode ser
+    daemon: quem o cria deve encerrá-lo com stop() ou kill().
+    """
+
+    def __init__(self, ctx, cache_path, analysis_workers: int = 1):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, cache_path, analysis_workers),
+                                   daemon=analysis_workers <= 1)
+        self.process.start()
+        child_conn.close()
+        self._send_lock = threading.Lock()
+        self.ready = False
+        self.busy = False
+        self.stage = None
+        self.stage_started = None
+        self.stage_times = {}
+        self.progress = 0.0
+
+    def wait_ready(self):
+        """Espera o aquecimento; levanta WorkerStartError ou EOFError se o processo falhar"""
+        kind, payload = self.conn.recv()
+        if kind != "ready":
+            raise WorkerStartError(payload)
+        self.ready = True
+
+    def run(self, task, timeout: float) -> dict:
+        """Envia a tarefa e espera o registro; levanta TimeoutError ou EOFError
+
+        Enquanto isso mantém a etapa atual (stage, iniciada em stage_started), a
+        duração das etapas concluídas (stage_times) e a fração concluída (progress).
+        """
+        self.stage = self.stage_started = None
+        self.stage_times = {}
+        self.progress = 0.0
+        with self._send_lock:
+            self.conn.send(task)
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and (remaining <= 0 or not self.conn.poll(remaining)):
+                raise TimeoutError(self.stage)
+            kind, payload = self.conn.recv()
+            if kind == "stage":
+                self.stage = payload
+                self.stage_started = time.monotonic()
+            elif kind == "stage_end":
+                stage, seconds = payload
+                self.stage_times[stage] = seconds
+                self.stage_started = None
+            elif kind == "progress":
+                self.progress = payload
+            else:
+                return payload
+
+    def cancel(self):
+        """Pede o cancelamento cooperativo da tarefa em andamento (run() devolve status "cancelled")"""
+        try:
+            with self._send_lock:
+                self.conn.send("cancel")
+        except (BrokenPipeError, OSError):
+            pass
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5)
+        self.conn.close()
+
+
+def start_worker(ctx, cache_path, analysis_workers: int = 1, on_start=None, stopped=None) -> PoolWorker:
+    """PoolWorker aquecido, com novas tentativas se o aquecimento falhar
+
+    Depois da primeira falha espera WORKER_START_BACKOFF segundos, dobrando a
+    cada nova falha; após WORKER_START_RETRIES tentativas levanta
+    WorkerStartError com a última causa. on_start recebe cada processo criado
+    (para que possa ser encerrado durante o aquecimento) e stopped
+    (threading.Event) interrompe as tentativas.
+    """
+    delay = settings.WORKER_START_BACKOFF
+    cause = "nenhuma tentativa"
+    for attempt in range(max(1, settings.WORKER_START_RETRIES)):
+        if attempt:
+            if stopped is not None and stopped.wait(delay):
+                break
+            if stopped is None:
+                time.sleep(delay)
+            delay *= 2
+        worker = PoolWorker(ctx, cache_path, analysis_workers)
+        if on_start is not None:
+            on_start(worker)
+        try:
+            worker.wait_ready()
+            return worker
+        except WorkerStartError as e:
+            cause = str(e)
+        except (EOFError, OSError):
+            cause = f"processo encerrado durante o aquecimento (código {worker.process.exitcode})"
+        worker.kill()
+    raise WorkerStartError(cause)
+
+
+def _percentile(values: list, q: float) -> float:
+    """Percentil com interpolação linear sobre valores ordenados"""
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class ServiceStats:
+    """Contadores, throughput e latências por etapa do serviço"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counts = {"ok": 0, "error": 0, "timeout": 0, "rejected": 0}
+        self.completions = deque()
+        self.latencies = {}
+
+    def record(self, status: str, stages: dict):
+        self.counts[status] = self.counts.get(status, 0) + 1
+        now = time.monotonic()
+        self.completions.append(now)
+        while self.completions and now - self.completions[0] > THROUGHPUT_WINDOW:
+            self.completions.popleft()
+        for stage, seconds in stages.items():
+            self.latencies.setdefault(stage, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        recent = sum(1 for t in self.completions if now - t <= THROUGHPUT_WINDOW)
+        uptime = now - self.started
+        finished = self.counts["ok"] + self.counts["error"] + self.counts["timeout"]
+        latency = {}
+        for stage, samples in self.latencies.items():
+            values = sorted(samples)
+            latency[stage] = {
+                "count": len(values),
+                "p50": round(_percentile(values, 50), 4),
+                "p90": round(_percentile(values, 90), 4),
+                "p99": round(_percentile(values, 99), 4),
+                "max": round(values[-1], 4)
+            }
+        return {
+            "uptime_s": round(uptime, 1),
+            **self.counts,
+            "throughput": {
+                "last_minute": recent,
+                "per_minute_avg": round(finished / uptime * 60, 2) if uptime > 0 else 0.0
+            },
+            "latency_s": latency
+        }
+
+
+class AnalysisService:
+    """Servidor HTTP de análise sobre um pool de workers aquecidos
+
+    analysis_workers é o número de processos de cada worker para os
+    extratores de uma faixa (padrão: settings.ANALYSIS_WORKERS).
+    """
+
+    def __init__(self, host: str = None, port: int = None, workers: int = None, queue_size: int = None,
+                 timeout: float = None, cache_path: str = None, analysis_workers: int = None):
+        self.host = host or settings.SERVICE_HOST
+        self.port = port if port is not None else settings.SERVICE_PORT
+        self.workers = workers or settings.SERVICE_WORKERS or os.cpu_count() or 1
+        self.queue_size = queue_size or settings.SERVICE_QUEUE_SIZE
+        self.timeout = timeout if timeout is not None else settings.SERVICE_TIMEOUT
+        self.cache_path = cache_path
+        self.analysis_workers = analysis_workers or settings.ANALYSIS_WORKERS
+        self.stats = ServiceStats()
+        self._ctx = multiprocessing.get_context("spawn")
+        self._pool = []
+        self._queue = None
+        self._executor = None
+        self._server = None
+        self._start_errors = {}
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._pool = [PoolWorker(self._ctx, self.cache_path, self.analysis_workers) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._consume(index)) for index in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"✓ Serviço em http://{self.host}:{self.port} ({self.workers} workers, fila {self.queue_size})")
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+        for task in getattr(self, "_tasks", []):
+            task.cancel()
+        for worker in self._pool:
+            worker.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _consume(self, index: int):
+        """Laço de um worker: aquece, depois atende a fila até o encerramento
+
+        Todo pedido retirado da fila recebe um registro, mesmo que o worker
+        não consiga ser reiniciado.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._pool[index].wait_ready)
+        except (WorkerStartError, EOFError, OSError):
+            await self._replace(index)
+        while True:
+            task, future, enqueued = await self._queue.get()
+            started = time.monotonic()
+            try:
+                record = await self._process(index, task)
+            except Exception as e:
+                record = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            finally:
+                self._queue.task_done()
+
+            stages = dict((record.get("timings") or {}).get("stages", {}))
+            stages["queue_wait"] = started - enqueued
+            stages["total"] = time.monotonic() - enqueued
+            self.stats.record(record["status"], stages)
+            if not future.done():
+                future.set_result(record)
+
+    async def _process(self, index: int, task) -> dict:
+        """Executa a tarefa no worker da posição, reiniciando-o se estiver fora do ar"""
+        if not self._pool[index].ready and not await self._replace(index):
+            return {"status": "error", "error": f"Worker indisponível: {self._start_errors[index]}"}
+        loop = asyncio.get_running_loop()
+        worker = self._pool[index]
+        worker.busy = True
+        try:
+            return await loop.run_in_executor(self._executor, worker.run, task, self.timeout)
+        except TimeoutError as e:
+            stage = e.args[0] if e.args else None
+            record = {"status": "timeout", "stage": stage,
+                      "error": f"Tempo limite de {self.timeout}s excedido" +
+                               (f" (etapa: {stage})" if stage else "")}
+        except (EOFError, OSError):
+            record = {"status": "error", "error": "Worker encerrado inesperadamente"}
+        finally:
+            worker.busy = False
+        await self._replace(index)
+        return record
+
+    async def _replace(self, index: int) -> bool:
+        """Encerra o worker da posição e aquece outro; False se todas as tentativas falharem"""
+        loop = asyncio.get_running_loop()
+        # kill() e o aquecimento bloqueiam: fora do laço de eventos
+        await loop.run_in_executor(self._executor, self._pool[index].kill)
+
+        def started(worker):
+            self._pool[index] = worker
+
+        try:
+            await loop.run_in_executor(self._executor, start_worker, self._ctx, self.cache_path,
+                                       self.analysis_workers, started)
+        except WorkerStartError as e:
+            self._start_errors[index] = str(e)
+            print(f"✗ Worker {index} não iniciou: {e}")
+            return False
+        self._start_errors.pop(index, None)
+        return True
+
+    def status(self) -> dict:
+        return {
+            "workers": self.workers,
+            "analysis_workers": self.analysis_workers,
+            "workers_ready": sum(1 for w in self._pool if w.ready),
+            "busy": sum(1 for w in self._pool if w.busy),
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self.queue_size,
+            **self.stats.snapshot()
+        }
+
+    async def submit(self, path: str, mode: str = "full", features=None, temporary: bool = False) -> dict:
+        """Enfileira uma análise e aguarda o registro; HTTPError(503) com a fila cheia
+
+        temporary indica um arquivo removido depois da análise: seu caminho não
+        entra no índice de impressões digitais.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(((path, mode, features, not temporary), future, time.monotonic()))
+        except asyncio.QueueFull:
+            self.stats.counts["rejected"] += 1
+            raise HTTPError(503, "Fila cheia, tente novamente")
+        return await future
+
+    async def _handle(self, reader, writer):
+        try:
+            status, payload = await self._dispatch(reader)
+        except HTTPError as e:
+            status, payload = e.status, {"error": str(e)}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            "Connection: close"
+        ]
+        if status == 503:
+            headers.append("Retry-After: 5")
+        try:
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, reader) -> tuple:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Requisição inválida")
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/health":
+            ready = any(w.ready for w in self._pool)
+            return (200 if ready else 503), {"ready": ready}
+        if url.path == "/status":
+            return 200, self.status()
+        if url.path != "/analyze":
+            raise HTTPError(404, "Endpoint desconhecido")
+        if method != "POST":
+            raise HTTPError(405, "Use POST")
+
+        if "content-length" not in headers:
+            raise HTTPError(411, "Content-Length obrigatório")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HTTPError(400, "Content-Length inválido")
+        if length < 0:
+            raise HTTPError(400, "Content-Length inválido")
+        if length > settings.SERVICE_MAX_UPLOAD_BYTES:
+            raise HTTPError(413, "Arquivo maior que o limite do serviço")
+        body = await reader.readexactly(length)
+
+        if headers.get("content-type", "").startswith("application/json"):
+            try:
+                request = json.loads(body or b"{}")
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                raise HTTPError(400, "Corpo JSON inválido")
+            if not isinstance(request, dict):
+                raise HTTPError(400, "O corpo JSON deve ser um objeto")
+            return await self._analyze_path(request)
+        return await self._analyze_upload(body, query)
+
+    async def _analyze_path(self, request: dict) -> tuple:
+        path = request.get("path")
+        if not path or not os.path.isfile(path):
+            raise HTTPError(400, "Campo path ausente ou arquivo inexistente")
+        record = await self.submit(path, *self._options(request))
+        return self._response(record)
+
+    async def _analyze_upload(self, body: bytes, query: dict) -> tuple:
+        if not body:
+            raise HTTPError(400, "Corpo vazio")
+        filename = os.path.basename(query.get("filename", "upload.mp3"))
+        features = query["features"].split(",") if query.get("features") else None
+        mode, features = self._options({"mode": query.get("mode"), "features": features})
+
+        # O worker lê do disco; o sufixo ajuda a detecção de formato
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1] or ".mp3")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            record = await self.submit(path, mode, features, temporary=True)
+        finally:
+            os.remove(path)
+        record["file"] = filename
+        return self._response(record)
+
+    def _options(self, request: dict) -> tuple:
+        mode = request.get("mode") or "full"
+        if mode not in MODES:
+            raise HTTPError(400, f"Modo desconhecido: {mode}")
+        features = request.get("features")
+        if features is not None and not isinstance(features, list):
+            raise HTTPError(400, "features deve ser uma lista")
+        return mode, features
+
+    def _response(self, record: dict) -> tuple:
+        status = {"ok": 200, "timeout": 504}.get(record["status"], 422)
+        return status, record
+
+
+def serve(**options):
+    """Executa o serviço até Ctrl+C"""
+    service = AnalysisService(**options)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
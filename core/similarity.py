@@ -0,0 +1,250 @@
+"""
+Music-Makro - Similarity Index
+Busca das faixas mais parecidas sobre uma matriz NumPy contígua
+
+Cada faixa vira um vetor de VECTOR_LAYOUT (timbre: MFCC por coeficiente;
+harmonia: chroma e tonnetz; e alguns descritores escalares de ritmo, brilho e
+energia). As colunas são padronizadas (z-score sobre a biblioteca) e as linhas
+normalizadas, de modo que a similaridade de cosseno vira um produto de matrizes,
+calculado em blocos para várias consultas ao mesmo tempo.
+
+Modo aproximado (bibliotecas de 100 mil faixas ou mais): as linhas são
+agrupadas por k-means em ~sqrt(n) listas e cada consulta compara apenas as
+faixas das n_probe listas com centróide mais próximo (índice IVF).
+"""
+
+import json
+
+import numpy as np
+
+# Formato do arquivo salvo (incrementar ao mudar a estrutura)
+INDEX_FORMAT = 1
+
+# (seção, chave, dimensões) na ordem das colunas da matriz
+VECTOR_LAYOUT = (
+    ("harmonic", "mfcc_means", 13),
+    ("harmonic", "mfcc_stds", 13),
+    ("harmonic", "chroma_means", 12),
+    ("harmonic", "chroma_stds", 12),
+    ("harmonic", "tonnetz_means", 6),
+    ("harmonic", "tonnetz_stds", 6),
+    ("harmonic", "percussive_ratio", 1),
+    ("rhythmic", "tempo_bpm", 1),
+    ("rhythmic", "onset_strength_mean", 1),
+    ("spectral", "centroid_mean", 1),
+    ("spectral", "rolloff_mean", 1),
+    ("spectral", "flatness_mean", 1),
+    ("energy", "loudness_mean", 1),
+    ("energy", "dynamic_range", 1)
+)
+
+VECTOR_FEATURES = tuple(f"{section}.{key}" for section, key, _ in VECTOR_LAYOUT)
+VECTOR_SIZE = sum(dims for _, _, dims in VECTOR_LAYOUT)
+
+# Linhas da biblioteca comparadas por vez (limita a matriz de similaridades em memória)
+BLOCK_ROWS = 65536
+
+# Tamanho mínimo da biblioteca para o modo aproximado compensar
+APPROXIMATE_MIN_TRACKS = 2048
+
+
+def track_vector(features: dict) -> np.ndarray:
+    """Vetor de uma faixa a partir do resultado de analyze(); None se faltarem features"""
+    parts = []
+    for section, key, dims in VECTOR_LAYOUT:
+        value = features.get(section, {}).get(key)
+        if value is None:
+            return None
+        value = np.atleast_1d(np.asarray(value, dtype=np.float32))
+        if value.size != dims:
+            return None
+        parts.append(value)
+    return np.concatenate(parts)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Centróides (normalizados) por k-means esférico sobre linhas já normalizadas"""
+    rng = np.random.default_rng(seed)
+    sample = data[rng.choice(data.shape[0], size=min(data.shape[0], k * 64), replace=False)]
+    centroids = sample[rng.choice(sample.shape[0], size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.bincount(labels, minlength=k) == 0
+        # Listas vazias recebem pontos aleatórios para não desperdiçar centróides
+        sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()))]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+class SimilarityIndex:
+    """Índice de vizinhos mais próximos sobre os vetores de VECTOR_LAYOUT"""
+
+    def __init__(self):
+        self.ids = []
+        self.matrix = np.zeros((0, VECTOR_SIZE), dtype=np.float32)
+        self.mean = np.zeros(VECTOR_SIZE, dtype=np.float32)
+        self.scale = np.ones(VECTOR_SIZE, dtype=np.float32)
+        self.centroids = None
+        self.list_offsets = None
+        self._raw = np.zeros((0, VECTOR_SIZE), dtype=np.float32)
+        self._pending = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, track_id: str, features: dict) -> bool:
+        """Adiciona uma faixa (aplicado no próximo build); False se faltarem features"""
+        vector = track_vector(features)
+        if vector is None:
+            return False
+        self._pending.append((track_id, vector))
+        return True
+
+    def build(self, approximate: bool = None, n_lists: int = None):
+        """Monta a matriz padronizada e, no modo aproximado, as listas do IVF
+
+        Sem approximate explícito, o IVF é usado a partir de APPROXIMATE_MIN_TRACKS faixas.
+        """
+        if self._pending:
+            added = np.stack([vector for _, vector in self._pending])
+            self._raw = np.concatenate([self._raw, added])
+            self.ids.extend(track_id for track_id, _ in self._pending)
+            self._pending = []
+        raw = self._raw
+
+        if raw.shape[0]:
+            std = raw.std(axis=0)
+            self.mean = raw.mean(axis=0)
+            self.scale = np.where(std > 1e-9, std, 1.0).astype(np.float32)
+        self.matrix = np.ascontiguousarray(_normalize_rows((raw - self.mean) / self.scale), dtype=np.float32)
+
+        if approximate is None:
+            approximate = len(self.ids) >= APPROXIMATE_MIN_TRACKS
+        self.centroids = self.list_offsets = None
+        if approximate and len(self.ids) > 1:
+            self._build_lists(n_lists or max(1, int(np.sqrt(len(self.ids)))))
+
+    def _build_lists(self, n_lists: int):
+        """Reordena as linhas por lista do IVF (cada lista fica contígua na matriz)"""
+        n_lists = min(n_lists, len(self.ids))
+        self.centroids = _kmeans(self.matrix, n_lists)
+        labels = np.concatenate([
+            np.argmax(self.matrix[start:start + BLOCK_ROWS] @ self.centroids.T, axis=1)
+            for start in range(0, len(self.ids), BLOCK_ROWS)
+        ])
+        order = np.argsort(labels, kind="stable")
+        self.matrix = np.ascontiguousarray(self.matrix[order])
+        self._raw = self._raw[order]
+        self.ids = [self.ids[i] for i in order]
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))])
+
+    def _embed(self, vectors: np.ndarray) -> np.ndarray:
+        return _normalize_rows((np.atleast_2d(vectors).astype(np.float32) - self.mean) / self.scale)
+
+    def search(self, vectors, n: int = 10, n_probe: int = 8, exclude=None) -> list:
+        """N faixas mais parecidas para cada vetor de consulta: [[(id, similaridade), ...], ...]
+
+        exclude (opcional) lista, por consulta, um id a ignorar (a própria faixa).
+        """
+        queries = self._embed(vectors)
+        exclude = exclude or [None] * len(queries)
+        if self.centroids is not None:
+            return [self._search_lists(query, n, n_probe, skip) for query, skip in zip(queries, exclude)]
+
+        k = min(n + 1, len(self.ids))
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.ids), BLOCK_ROWS):
+            scores = queries @ self.matrix[start:start + BLOCK_ROWS].T
+            rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            best_scores = np.hstack([best_scores, scores])
+            best_rows = np.hstack([best_rows, rows])
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+        return [self._ranked(rows, scores, n, skip) for rows, scores, skip in zip(best_rows, best_scores, exclude)]
+
+    def _search_lists(self, query: np.ndarray, n: int, n_probe: int, skip) -> list:
+        probes = np.argsort(-(self.centroids @ query))[:n_probe]
+        rows = np.concatenate([
+            np.arange(self.list_offsets[p], self.list_offsets[p + 1]) for p in probes
+        ])
+        scores = self.matrix[rows] @ query
+        return self._ranked(rows, scores, n, skip)
+
+    def _ranked(self, rows, scores, n: int, skip) -> list:
+        order = np.argsort(-scores)
+        results = []
+        for i in order:
+            track_id = self.ids[rows[i]]
+            if track_id == skip:
+                continue
+            results.append((track_id, float(scores[i])))
+            if len(results) == n:
+                break
+        return results
+
+    def vector_of(self, track_id: str) -> np.ndarray:
+        """Vetor original (não padronizado) de uma faixa do índice"""
+        return self._raw[self.ids.index(track_id)]
+
+    def save(self, path: str):
+        """Grava o índice em um .npz (matriz, ids, padronização e listas do IVF)"""
+        arrays = {
+            "raw": self._raw,
+            "mean": self.mean,
+            "scale": self.scale,
+            "meta": np.array(json.dumps({"format": INDEX_FORMAT, "layout": VECTOR_LAYOUT, "ids": self.ids}))
+        }
+        if self.centroids is not None:
+            arrays["centroids"] = self.centroids
+            arrays["list_offsets"] = self.list_offsets
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityIndex":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["format"] != INDEX_FORMAT or [tuple(e) for e in meta["layout"]] != list(VECTOR_LAYOUT):
+                raise ValueError("Índice gerado por outra versão; reconstrua com o comando 'index'")
+            index = cls()
+            index.ids = meta["ids"]
+            index._raw = data["raw"]
+            index.mean = data["mean"]
+            index.scale = data["scale"]
+            if "centroids" in data:
+                index.centroids = data["centroids"]
+                index.list_offsets = data["list_offsets"]
+        index.matrix = np.ascontiguousarray(_normalize_rows((index._raw - index.mean) / index.scale), dtype=np.float32)
+        return index
+
+    @classmethod
+    def from_results(cls, paths, approximate: bool = None) -> tuple:
+        """Índice a partir de arquivos JSONL do modo batch; retorna (índice, faixas ignoradas)"""
+        index = cls()
+        skipped = 0
+        seen = set()
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if record.get("status") != "ok" or record.get("file") in seen:
+                        continue
+                    if index.add(record["file"], record.get("features", {})):
+                        seen.add(record["file"])
+                    else:
+                        skipped += 1
+        index.build(approximate=approximate)
+        return index, skipped
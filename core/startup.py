@@ -0,0 +1,90 @@
+"""
+Music-Makro - Startup
+Inicialização rápida: verificação leve de dependências, cache do JIT e pré-carga
+
+O librosa carrega seus submódulos sob demanda, mas o primeiro acesso a
+librosa.beat, librosa.core e librosa.feature importa scipy e numba e compila
+(ou lê do cache) os kernels numba, alguns segundos por processo. As interfaces
+abrem sem esses imports e chamam preload() em segundo plano.
+
+O numba guarda os kernels compilados com cache=True em __pycache__ ao lado do
+librosa (ou no cache do usuário, se a instalação não for gravável), ou em
+settings.NUMBA_CACHE_DIR quando configurado. O kernel de beat tracking
+(__beat_local_score) é declarado com cache=False e seria recompilado em todo
+processo; enable_jit_cache() importa librosa.beat com o cache ligado também
+para ele.
+"""
+
+import functools
+import importlib
+import importlib.util
+import os
+import sys
+
+from config import settings
+
+# Módulos necessários para a análise (verificados sem importar)
+REQUIRED_MODULES = ("librosa", "numpy", "soundfile", "mutagen")
+
+# Módulos importados por preload(): os analisadores e os submódulos do librosa que eles usam
+PRELOAD_MODULES = (
+    "core.audio_analyzer",
+    "core.preview_analyzer",
+    "librosa.core",
+    "librosa.beat",
+    "librosa.feature",
+    "librosa.onset",
+    "librosa.decompose",
+    "librosa.segment"
+)
+
+_jit_cache_enabled = False
+
+
+def missing_dependencies(modules=REQUIRED_MODULES) -> list:
+    """Módulos não instalados, verificados por importlib.util.find_spec (sem importá-los)"""
+    return [module for module in modules if importlib.util.find_spec(module) is None]
+
+
+def enable_jit_cache():
+    """Ativa o cache persistente dos kernels numba do librosa (chamar antes do primeiro uso do librosa)
+
+    numba.guvectorize só é substituído durante a importação de librosa.beat e
+    restaurado logo depois: o resto do processo usa o numba sem alterações.
+    Se librosa.beat já foi importado, o kernel continua sem cache.
+    """
+    global _jit_cache_enabled
+    if _jit_cache_enabled:
+        return
+    _jit_cache_enabled = True
+
+    # NUMBA_CACHE_DIR é lido quando o numba é importado
+    if settings.NUMBA_CACHE_DIR:
+        os.environ.setdefault("NUMBA_CACHE_DIR", settings.NUMBA_CACHE_DIR)
+    if "librosa.beat" in sys.modules:
+        return
+
+    import numba
+
+    guvectorize = numba.guvectorize
+
+    @functools.wraps(guvectorize)
+    def cached_guvectorize(*args, **kwargs):
+        def decorate(func):
+            if func.__module__.startswith("librosa."):
+                kwargs["cache"] = True
+            return guvectorize(*args, **kwargs)(func)
+        return decorate
+
+    numba.guvectorize = cached_guvectorize
+    try:
+        importlib.import_module("librosa.beat")
+    finally:
+        numba.guvectorize = guvectorize
+
+
+def preload(modules=PRELOAD_MODULES):
+    """Importa os módulos pesados da análise (para rodar numa thread enquanto a interface abre)"""
+    enable_jit_cache()
+    for module in modules:
+        importlib.import_module(module)
@@ -0,0 +1,385 @@
+"""
+Music-Makro - Streaming Analyzer
+Análise em blocos com memória constante para gravações longas
+
+O arquivo é lido em blocos de BLOCK_FRAMES frames via librosa.stream e cada
+estatística do resultado é mantida por acumuladores: o pico de memória depende
+do tamanho do bloco, não da duração da gravação. A única estrutura que cresce
+com a duração são os envelopes de onset (um float32 por frame, cerca de
+1,2 MB por hora a 44,1 kHz), necessários para o beat tracking global.
+
+Métricas exatas: total_energy (soma em float64 das amostras de cada bloco) e
+rms_mean/std/max e dynamic_range: os frames centrados das pontas, que
+librosa.feature.rms(center=True) completa com zeros, são calculados à parte a
+partir do início e do fim do arquivo e somados aos frames dos blocos.
+
+Métricas exatas sobre o enquadramento em blocos: loudness_mean/max/min
+(histograma com resolução de 0,01 dB). O tempograma e a estimativa de tempo
+usada pelo beat tracking são acumulados em fatias sobre o envelope de onset
+inteiro, sem aproximação além da do próprio envelope.
+
+Métricas aproximadas:
+    - As demais estatísticas por frame (zcr, espectrais, chroma, mfcc,
+      onset): os blocos são enquadrados com center=False, então faltam os
+      frames parcialmente preenchidos com zeros nas duas pontas do arquivo.
+    - harmonic_ratio, percussive_ratio e tonnetz: o HPSS (filtro de mediana
+      de 31 frames) e a CQT do tonnetz são calculados por bloco, com efeitos
+      de borda a cada BLOCK_FRAMES frames.
+    - chroma: a afinação é estimada por bloco, não para a faixa inteira.
+    - mfcc: o corte de 80 dB do espectrograma mel é relativo ao máximo do
+      bloco, não ao máximo global.
+    - tempo_bpm/beats_count: o envelope de onset é deslocado em
+      n_fft / (2 * hop_length) frames; o tempo não muda, mas a posição das
+      batidas pode diferir em um beat nas bordas.
+
+Arquivos precisam ser legíveis pelo soundfile (WAV, FLAC, OGG e MP3 com
+libsndfile >= 1.1).
+"""
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from core.audio_analyzer import AudioAnalyzer, HOP_LENGTH, N_FFT, N_MFCC
+from core.ingest import AudioSource
+from core.timeline import TimelineBuilder
+
+# Frames por bloco (~12 s a 44,1 kHz com hop de 512)
+BLOCK_FRAMES = 1024
+
+# Faixa e resolução do histograma de loudness (dB absolutos)
+_DB_FLOOR = -100.0
+_DB_CEIL = 160.0
+_DB_STEP = 0.01
+_TOP_DB = 80.0
+
+
+class RunningStats:
+    """Média, desvio padrão, mínimo e máximo acumulados (Chan et al.)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        n = values.size
+        if n == 0:
+            return
+        mean = float(np.mean(values))
+        m2 = float(np.sum((values - mean) ** 2))
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(np.min(values)))
+        self.max = max(self.max, float(np.max(values)))
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.m2 / self.count)) if self.count else 0.0
+
+
+class RunningRowStats:
+    """Média e desvio padrão por linha (coeficiente x frames), acumulados por blocos"""
+
+    def __init__(self, rows: int):
+        self.count = 0
+        self.mean = np.zeros(rows)
+        self.m2 = np.zeros(rows)
+
+    def update(self, matrix):
+        matrix = np.asarray(matrix, dtype=np.float64)
+        n = matrix.shape[1]
+        if n == 0:
+            return
+        mean = matrix.mean(axis=1)
+        m2 = np.sum((matrix - mean[:, np.newaxis]) ** 2, axis=1)
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.m2 / self.count) if self.count else np.zeros_like(self.mean)
+
+
+def _edge_rms(head: np.ndarray, tail: np.ndarray, total: int) -> np.ndarray:
+    """RMS dos frames centrados que os blocos (center=False) não cobrem
+
+    head são as primeiras N_FFT amostras do arquivo e tail as últimas 2 * N_FFT
+    (ou o arquivo inteiro, se menor); total é o número de amostras. O frame
+    centrado t cobre [t * hop - N_FFT / 2, t * hop + N_FFT / 2), com zeros fora
+    do arquivo, como em librosa.feature.rms(center=True).
+    """
+    offset = N_FFT // (2 * HOP_LENGTH)
+    frames = 1 + total // HOP_LENGTH
+    covered = 1 + (total - N_FFT) // HOP_LENGTH if total >= N_FFT else 0
+    edges = list(range(min(offset, frames))) + list(range(max(covered + offset, offset), frames))
+    tail_start = total - tail.size
+    values = []
+    for t in edges:
+        start = t * HOP_LENGTH - N_FFT // 2
+        if t < offset:
+            window = head[:max(start + N_FFT, 0)]
+        else:
+            window = tail[max(start - tail_start, 0):max(start + N_FFT - tail_start, 0)]
+        window = window.astype(np.float64)
+        values.append(np.sqrt(np.sum(window ** 2) / N_FFT))
+    return np.array(values)
+
+
+class _LoudnessHistogram:
+    """Histograma de magnitudes em dB para reproduzir amplitude_to_db(ref=np.max)"""
+
+    def __init__(self):
+        bins = int((_DB_CEIL - _DB_FLOOR) / _DB_STEP) + 1
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.sums = np.zeros(bins, dtype=np.float64)
+        self.max_db = -np.inf
+        self.min_db = np.inf
+
+    def update(self, magnitude):
+        db = librosa.amplitude_to_db(magnitude, ref=1.0, top_db=None).ravel().astype(np.float64)
+        idx = np.clip(((db - _DB_FLOOR) / _DB_STEP).astype(np.int64), 0, self.counts.size - 1)
+        self.counts += np.bincount(idx, minlength=self.counts.size)
+        self.sums += np.bincount(idx, weights=db, minlength=self.counts.size)
+        self.max_db = max(self.max_db, float(db.max()))
+        self.min_db = min(self.min_db, float(db.min()))
+
+    def result(self) -> dict:
+        threshold = self.max_db - _TOP_DB
+        cut = int((threshold - _DB_FLOOR) / _DB_STEP)
+        above = slice(max(cut, 0), None)
+        below = int(self.counts[:max(cut, 0)].sum())
+        total = int(self.counts.sum())
+        clipped_sum = float(self.sums[above].sum()) - self.max_db * int(self.counts[above].sum())
+        clipped_sum += -_TOP_DB * below
+        return {
+            "loudness_mean": clipped_sum / total,
+            "loudness_max": 0.0,
+            "loudness_min": max(self.min_db, threshold) - self.max_db
+        }
+
+
+class StreamingAnalyzer(AudioAnalyzer):
+    """Analisador em blocos com memória limitada, para DJ sets e gravações ao vivo"""
+
+    # Etapas: leitura e extração por bloco, beat tracking global e metadados
+    stage_weights = {"cache": 1, "blocks": 92, "rhythmic": 6, "timeline": 1, "metadata": 1, "description": 1}
+    # O sinal inteiro nunca fica em memória
+    supports_fingerprint = False
+
+    def __init__(self, file_path: str, cache=None, block_frames: int = BLOCK_FRAMES, **hooks):
+        super().__init__(file_path, cache=cache, **hooks)
+        self.block_frames = block_frames
+
+    def params(self) -> dict:
+        params = super().params()
+        params.update({"mode": "stream", "block_frames": self.block_frames})
+        return params
+
+    def _stages(self, requested=None) -> list:
+        return ["blocks", "rhythmic"] + (["timeline"] if self._wants_timeline(requested) else []) + ["metadata"]
+
+    def _open_source(self) -> AudioSource:
+        # Gravações longas não cabem na memória: hash e metadados leem do disco
+        return AudioSource(self.file_path, load=False)
+
+    def _prefetch_audio(self):
+        # O áudio é lido em blocos durante a análise: não há o que decodificar antes
+        pass
+
+    def _compute(self, requested=None) -> dict:
+        # Os acumuladores compartilham a mesma leitura em blocos: calcula tudo
+        # e deixa analyze() filtrar o subconjunto pedido
+        self.sr = librosa.get_samplerate(self.file_path)
+        stats = {name: RunningStats() for name in (
+            "rms", "zcr", "centroid", "bandwidth", "rolloff", "contrast", "flatness",
+            "chroma", "mfcc", "tonnetz"
+        )}
+        rows = {"chroma": RunningRowStats(12), "mfcc": RunningRowStats(N_MFCC), "tonnetz": RunningRowStats(6)}
+        loudness = _LoudnessHistogram()
+        onset_blocks, beat_onset_blocks = [], []
+        total_energy = 0.0
+        total_amplitude = harmonic_amplitude = percussive_amplitude = 0.0
+        previous_log_mel = None
+        timeline = TimelineBuilder(self.sr, HOP_LENGTH) if self._wants_timeline(requested) else None
+        advance = self.block_frames * HOP_LENGTH
+        head = tail = np.zeros(0, dtype=np.float32)
+        total_read = 0
+
+        print("→ Analisando em blocos...")
+        blocks = librosa.stream(
+            self.file_path,
+            block_length=self.block_frames,
+            frame_length=N_FFT,
+            hop_length=HOP_LENGTH
+        )
+        total_samples = sf.info(self.file_path).frames
+        with self._stage("blocks"):
+            for index, y in enumerate(blocks):
+                # Amostras novas deste bloco: o início repete o fim do bloco anterior
+                skip = 0 if index == 0 else N_FFT - HOP_LENGTH
+                fresh = y[skip:]
+                total_energy += float(np.sum(fresh.astype(np.float64) ** 2))
+                total_amplitude += float(np.sum(np.abs(fresh)))
+                total_read += fresh.size
+                if index == 0:
+                    head = y[:N_FFT].copy()
+                tail = np.concatenate([tail, fresh])[-2 * N_FFT:]
+
+                # Um bloco menor que N_FFT não tem frames inteiros dentro do arquivo
+                complete = y.size >= N_FFT
+                if not complete:
+                    y = np.pad(y, (0, N_FFT - y.size))
+
+                S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False))
+                power = S ** 2
+
+                rms = librosa.feature.rms(y=y, frame_length=N_FFT, hop_length=HOP_LENGTH, center=False)[0]
+                if complete:
+                    stats["rms"].update(rms)
+                stats["zcr"].update(librosa.feature.zero_crossing_rate(
+                    y, frame_length=N_FFT, hop_length=HOP_LENGTH, center=False)[0])
+                centroid = librosa.feature.spectral_centroid(S=S, sr=self.sr)[0]
+                stats["centroid"].update(centroid)
+                stats["bandwidth"].update(librosa.feature.spectral_bandwidth(S=S, sr=self.sr))
+                stats["rolloff"].update(librosa.feature.spectral_rolloff(S=S, sr=self.sr))
+                stats["contrast"].update(librosa.feature.spectral_contrast(S=S, sr=self.sr))
+                stats["flatness"].update(librosa.feature.spectral_flatness(S=S))
+                chroma = librosa.feature.chroma_stft(S=power, sr=self.sr)
+                stats["chroma"].update(chroma)
+                rows["chroma"].update(chroma)
+                loudness.update(S)
+
+                log_mel = librosa.power_to_db(librosa.feature.melspectrogram(S=power, sr=self.sr))
+                mfccs = librosa.feature.mfcc(S=log_mel, n_mfcc=N_MFCC)
+                stats["mfcc"].update(mfccs)
+                rows["mfcc"].update(mfccs)
+
+                if timeline is not None:
+                    # Os frames de cada bloco começam em index * block_frames na faixa
+                    start = index * self.block_frames
+                    timeline.add("rms", rms, start)
+                    timeline.add("centroid", centroid, start)
+                    timeline.add("timbre", mfccs, start)
+
+                # Fluxo espectral com continuidade entre blocos (lag = 1)
+                reference = log_mel if previous_log_mel is None else np.hstack([previous_log_mel, log_mel])
+                flux = np.maximum(0.0, np.diff(reference, axis=1))
+                if previous_log_mel is None:
+                    flux = np.hstack([np.zeros((flux.shape[0], 1), dtype=flux.dtype), flux])
+                onset_blocks.append(np.mean(flux, axis=0).astype(np.float32))
+                beat_onset_blocks.append(np.median(flux, axis=0).astype(np.float32))
+                previous_log_mel = log_mel[:, -1:]
+
+                D = librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)
+                harm, perc = librosa.decompose.hpss(D)
+                y_harmonic = librosa.istft(harm, hop_length=HOP_LENGTH, length=y.size)
+                y_percussive = librosa.istft(perc, hop_length=HOP_LENGTH, length=y.size)
+                harmonic_amplitude += float(np.sum(np.abs(y_harmonic[skip:skip + fresh.size])))
+                percussive_amplitude += float(np.sum(np.abs(y_percussive[skip:skip + fresh.size])))
+                tonnetz = librosa.feature.tonnetz(y=y_harmonic, sr=self.sr, hop_length=HOP_LENGTH)
+                stats["tonnetz"].update(tonnetz)
+                rows["tonnetz"].update(tonnetz)
+                self._advance(min((index + 1) * advance / max(total_samples, 1), 1.0))
+            stats["rms"].update(_edge_rms(head, tail, total_read))
+
+        with self._stage("rhythmic"):
+            onset_env = np.concatenate(onset_blocks)
+            beat_onset_env = np.concatenate(beat_onset_blocks)
+            del onset_blocks, beat_onset_blocks
+
+            # beat_track estimaria o tempo a partir do tempograma completo (O(duração));
+            # a média temporal do tempograma, acumulada em fatias, dá o mesmo tempo
+            _, beat_tempogram = self._tempogram(
+                beat_onset_env, librosa.time_to_frames(8.0, sr=self.sr, hop_length=HOP_LENGTH).item()
+            )
+            tempo = librosa.feature.tempo(tg=beat_tempogram[:, np.newaxis], sr=self.sr, hop_length=HOP_LENGTH)
+            tempo, beats = librosa.beat.beat_track(
+                onset_envelope=beat_onset_env, sr=self.sr, hop_length=HOP_LENGTH, bpm=float(tempo[0])
+            )
+            tempogram, _ = self._tempogram(onset_env, 384)
+
+        def summary(name, prefix):
+            result = {f"{prefix}_mean": stats[name].mean, f"{prefix}_std": stats[name].std}
+            if name in rows:
+                result[f"{prefix}_means"] = [float(v) for v in rows[name].mean]
+                result[f"{prefix}_stds"] = [float(v) for v in rows[name].std]
+            return result
+
+        spectral = {}
+        for name in ("centroid", "bandwidth", "rolloff", "contrast", "flatness"):
+            spectral.update(summary(name, name))
+
+        energy = {"total_energy": total_energy}
+        energy.update(loudness.result())
+        energy["dynamic_range"] = stats["rms"].max - stats["rms"].min
+
+        if timeline is not None:
+            with self._stage("timeline"):
+                timeline.add_onsets(onset_env)
+                timeline_result = timeline.result()
+
+        with self._stage("metadata"):
+            metadata = self._extract_metadata()
+
+        result = {
+            "metadata": metadata,
+            "temporal": {
+                "rms_mean": stats["rms"].mean,
+                "rms_std": stats["rms"].std,
+                "rms_max": stats["rms"].max,
+                "zcr_mean": stats["zcr"].mean,
+                "zcr_std": stats["zcr"].std
+            },
+            "spectral": spectral,
+            "rhythmic": {
+                "tempo_bpm": float(np.atleast_1d(tempo)[0]),
+                "beats_count": len(beats),
+                "onset_strength_mean": float(np.mean(onset_env)),
+                "onset_strength_max": float(np.max(onset_env)),
+                "tempogram_mean": tempogram.mean,
+                "tempogram_std": tempogram.std
+            },
+            "harmonic": {
+                "harmonic_ratio": harmonic_amplitude / total_amplitude,
+                "percussive_ratio": percussive_amplitude / total_amplitude,
+                **summary("chroma", "chroma"),
+                **summary("mfcc", "mfcc"),
+                **summary("tonnetz", "tonnetz")
+            },
+            "energy": energy
+        }
+
+        if timeline is not None:
+            result["timeline"] = timeline_result
+        return result
+
+    def _tempogram(self, onset_env, win_length: int, chunk_frames: int = 4096) -> tuple:
+        """Tempograma calculado em fatias, sem materializar a matriz inteira
+
+        Reproduz o padding de tempogram(center=True) e retorna as estatísticas
+        globais junto com a média temporal de cada lag.
+        """
+        padded = np.pad(onset_env, (win_length // 2, win_length // 2),
+                        mode="linear_ramp", end_values=[0, 0])
+        stats = RunningStats()
+        lag_sum = np.zeros(win_length, dtype=np.float64)
+        for start in range(0, onset_env.size, chunk_frames):
+            stop = min(start + chunk_frames, onset_env.size)
+            segment = padded[start:stop + win_length - 1]
+            tempogram = librosa.feature.tempogram(
+                onset_envelope=segment, sr=self.sr, hop_length=HOP_LENGTH,
+                win_length=win_length, center=False
+            )
+            stats.update(tempogram)
+            lag_sum += tempogram.sum(axis=1)
+        return stats, lag_sum / onset_env.size
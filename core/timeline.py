@@ -0,0 +1,119 @@
+"""
+Music-Makro - Timeline
+Evolução das features ao longo da faixa, em janelas de tempo
+
+Os vetores por frame que os extratores já calculam (RMS, centróide espectral,
+envelope de onset e MFCC) são somados em janelas de TIMELINE_WINDOW segundos,
+sem reanalisar o áudio janela a janela. Os frames podem chegar de uma vez
+(análise completa) ou bloco a bloco (análise em streaming), com memória
+proporcional ao número de janelas.
+
+A segmentação estrutural agrupa janelas vizinhas de timbre parecido
+(librosa.segment.agglomerative sobre as médias de MFCC por janela) em seções.
+"""
+
+import librosa
+import numpy as np
+
+# Duração de cada janela da timeline, em segundos
+TIMELINE_WINDOW = 2.0
+
+# Duração típica de uma seção: define quantas seções procurar
+SEGMENT_SECONDS = 30.0
+MAX_SEGMENTS = 12
+# Seções mais curtas que isto são absorvidas pela anterior
+MIN_SEGMENT_SECONDS = 8.0
+
+
+class TimelineBuilder:
+    """Acumula somas por janela das séries por frame e monta a timeline"""
+
+    def __init__(self, sr: int, hop_length: int, window_seconds: float = TIMELINE_WINDOW):
+        self.sr = sr
+        self.hop_length = hop_length
+        self.window_frames = max(1, int(round(window_seconds * sr / hop_length)))
+        self.frames = 0
+        self._sums = {}
+        self._counts = {}
+
+    @property
+    def window_seconds(self) -> float:
+        return self.window_frames * self.hop_length / self.sr
+
+    def add(self, name: str, values, start_frame: int = 0):
+        """Soma frames de uma série (vetor, ou matriz com frames no último eixo) a partir de start_frame"""
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        n = values.shape[1]
+        if not n:
+            return
+        windows = (start_frame + np.arange(n)) // self.window_frames
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(windows)) + 1])
+        size = windows[-1] + 1
+
+        sums = self._sums.get(name, np.zeros((values.shape[0], 0)))
+        counts = self._counts.get(name, np.zeros(0))
+        if sums.shape[1] < size:
+            sums = np.pad(sums, ((0, 0), (0, size - sums.shape[1])))
+            counts = np.pad(counts, (0, size - counts.size))
+        sums[:, windows[starts]] += np.add.reduceat(values, starts, axis=1)
+        counts[windows[starts]] += np.diff(np.concatenate([starts, [n]]))
+        self._sums[name], self._counts[name] = sums, counts
+        self.frames = max(self.frames, start_frame + n)
+
+    def add_onsets(self, onset_env, start_frame: int = 0):
+        """Marca os onsets detectados no envelope (base da densidade de onsets)"""
+        onsets = librosa.onset.onset_detect(onset_envelope=onset_env, sr=self.sr, hop_length=self.hop_length)
+        indicator = np.zeros(len(onset_env))
+        indicator[onsets] = 1.0
+        self.add("onsets", indicator, start_frame)
+
+    def _means(self, name: str, windows: int) -> np.ndarray:
+        sums = self._sums[name][:, :windows]
+        counts = self._counts[name][:windows]
+        return sums / np.maximum(counts, 1)
+
+    def result(self) -> dict:
+        """Séries por janela (rms, centroid, onset_density em onsets/s) e seções detectadas"""
+        windows = min(counts.size for counts in self._counts.values())
+        frame_seconds = self.hop_length / self.sr
+        series = {
+            "rms": self._means("rms", windows)[0],
+            "centroid": self._means("centroid", windows)[0],
+            "onset_density": self._means("onsets", windows)[0] / frame_seconds
+        }
+        weights = self._counts["rms"][:windows]
+        duration = self.frames * frame_seconds
+
+        segments = []
+        bounds = self._boundaries(self._means("timbre", windows), duration)
+        for start, stop in zip(bounds, list(bounds[1:]) + [windows]):
+            segment = {
+                "start": round(start * self.window_seconds, 2),
+                "end": round(min(stop * self.window_seconds, duration), 2)
+            }
+            for name, values in series.items():
+                segment[name] = float(np.average(values[start:stop], weights=weights[start:stop]))
+            segments.append(segment)
+
+        timeline = {
+            "window_seconds": round(self.window_seconds, 3),
+            "times": [round(i * self.window_seconds, 2) for i in range(windows)]
+        }
+        timeline.update({name: [float(v) for v in values] for name, values in series.items()})
+        timeline["segments"] = segments
+        return timeline
+
+    def _boundaries(self, timbre: np.ndarray, duration: float) -> list:
+        """Janelas iniciais de cada seção (sempre começa em 0)"""
+        windows = timbre.shape[1]
+        k = int(np.clip(round(duration / SEGMENT_SECONDS), 1, min(MAX_SEGMENTS, windows)))
+        if k < 2:
+            return [0]
+        # Coeficientes padronizados: o MFCC 0 (volume) não domina a distância
+        data = (timbre - timbre.mean(axis=1, keepdims=True)) / (timbre.std(axis=1, keepdims=True) + 1e-9)
+        bounds = [0]
+        min_windows = max(1, int(round(MIN_SEGMENT_SECONDS / self.window_seconds)))
+        for bound in librosa.segment.agglomerative(data, k)[1:]:
+            if bound - bounds[-1] >= min_windows and windows - bound >= min_windows:
+                bounds.append(int(bound))
+        return bounds
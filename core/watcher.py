@@ -0,0 +1,356 @@
+"""
+Music-Makro - Watcher
+Monitoramento de pastas com indexação incremental da biblioteca
+
+O índice (SQLite) guarda caminho, tamanho, mtime, hash do conteúdo e o último
+registro de análise de cada arquivo. A cada varredura só os arquivos novos ou
+alterados são analisados, e os removidos saem do índice:
+
+- a varredura compara tamanho e mtime (os.scandir) com uma cópia do índice em
+  memória, sem abrir nenhum arquivo; uma biblioteca sem mudanças é revista em
+  uma fração de segundo;
+- um arquivo só é processado depois de ficar estável (tamanho e mtime sem
+  mudar) por settle segundos, para não analisar um bounce ainda sendo gravado;
+- antes de analisar, o hash do conteúdo é comparado com o índice: um arquivo
+  apenas tocado, renomeado ou copiado reaproveita o registro existente;
+- a análise roda em poucos processos de baixa prioridade (BatchRunner), em
+  lotes de no máximo batch_size arquivos por ciclo.
+
+Com o pacote opcional watchdog instalado, eventos do sistema de arquivos
+antecipam a próxima varredura; sem ele, a pasta é varrida a cada interval
+segundos.
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from config import settings
+from core.feature_cache import file_digest
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    status TEXT NOT NULL,
+    analyzed_at REAL NOT NULL,
+    record BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_digest ON files (digest);
+"""
+
+# Variáveis de ambiente que limitam as threads de BLAS/OpenMP dos workers
+_THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMBA_NUM_THREADS")
+
+
+def default_index_path() -> str:
+    """Local padrão do índice da biblioteca"""
+    return settings.WATCH_INDEX
+
+
+def scan_tree(roots, extensions=None) -> dict:
+    """{caminho: (tamanho, mtime_ns)} dos arquivos de áudio sob os diretórios (ou arquivos) dados"""
+    extensions = tuple(ext.lower() for ext in (extensions or settings.AUDIO_EXTENSIONS))
+    found = {}
+    stack = [os.path.abspath(root) for root in roots]
+    while stack:
+        path = stack.pop()
+        if not os.path.isdir(path):
+            with contextlib.suppress(OSError):
+                stat = os.stat(path)
+                found[path] = (stat.st_size, stat.st_mtime_ns)
+            continue
+        try:
+            entries = os.scandir(path)
+        except OSError:
+            # Diretório removido ou sem permissão durante a varredura
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(extensions) and entry.is_file():
+                        stat = entry.stat()
+                        found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+    return found
+
+
+def lower_priority(niceness: int = None):
+    """Reduz a prioridade do processo e limita threads numéricas (herdadas pelos workers)"""
+    niceness = settings.WATCH_NICE if niceness is None else niceness
+    if niceness and hasattr(os, "nice"):
+        with contextlib.suppress(OSError):
+            os.nice(niceness)
+    for name in _THREAD_VARIABLES:
+        os.environ.setdefault(name, "1")
+
+
+class LibraryIndex:
+    """Índice SQLite dos arquivos monitorados e de seus registros de análise"""
+
+    def __init__(self, path: str = None):
+        self.path = path or default_index_path()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def snapshot(self) -> dict:
+        """{caminho: (tamanho, mtime_ns)} de todos os arquivos indexados"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT path, size, mtime_ns FROM files").fetchall()
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def digest(self, path: str):
+        """Hash registrado para o caminho, ou None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT digest FROM files WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def find(self, digest: str):
+        """Registro bem-sucedido de algum arquivo com o mesmo conteúdo, ou None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT record FROM files WHERE digest = ? AND status = 'ok' LIMIT 1", (digest,)
+            ).fetchone()
+        return json.loads(zlib.decompress(row[0]).decode('utf-8')) if row else None
+
+    def put(self, path: str, size: int, mtime_ns: int, digest: str, record: dict):
+        """Grava (ou substitui) a entrada e o registro de análise de um arquivo"""
+        data = zlib.compress(json.dumps(record, ensure_ascii=False).encode('utf-8'))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, digest, record.get("status", "ok"), time.time(), data)
+            )
+
+    def touch(self, path: str, size: int, mtime_ns: int):
+        """Atualiza tamanho e mtime de um arquivo cujo conteúdo não mudou"""
+        with self._connect() as conn:
+            conn.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?", (size, mtime_ns, path))
+
+    def remove(self, paths) -> int:
+        """Remove entradas; retorna quantas existiam"""
+        with self._connect() as conn:
+            return conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths]).rowcount
+
+    def records(self):
+        """Itera os registros de análise, em ordem de caminho"""
+        with self._connect() as conn:
+            for (data,) in conn.execute("SELECT record FROM files ORDER BY path"):
+                yield json.loads(zlib.decompress(data).decode('utf-8'))
+
+    def stats(self) -> dict:
+        """Número de arquivos por status"""
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall())
+        return {"files": sum(counts.values()), **counts}
+
+
+class FolderWatcher:
+    """Mantém o índice em dia com as pastas monitoradas
+
+    scan() compara as pastas com o índice, process() analisa os arquivos
+    estáveis e run() repete os dois até stop() (ou uma única vez com once=True).
+    """
+
+    def __init__(self, roots, index: LibraryIndex = None, interval: float = None, settle: float = None,
+                 batch_size: int = None, workers: int = None, timeout: float = None, cache_path: str = None,
+                 mode: str = "full", features=None, extensions=None, on_record=None):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.index = index or LibraryIndex()
+        self.interval = settings.WATCH_INTERVAL if interval is None else interval
+        self.settle = settings.WATCH_SETTLE if settle is None else settle
+        self.batch_size = batch_size or settings.WATCH_BATCH
+        self.workers = workers or settings.WATCH_WORKERS
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.mode = mode
+        self.features = features
+        self.extensions = extensions
+        self.on_record = on_record
+
+        # Cópia em memória do índice: a varredura não consulta o SQLite
+        self.known = self.index.snapshot()
+        # Arquivos novos ou alterados aguardando estabilidade: caminho -> (tamanho, mtime_ns, visto_em)
+        self.pending = {}
+        self.deleted = set()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def scan(self) -> dict:
+        """Varre as pastas; retorna a contagem de arquivos novos, alterados e removidos"""
+        current = scan_tree(self.roots, self.extensions)
+        now = time.time()
+        counts = {"new": 0, "changed": 0, "deleted": 0}
+
+        for path, stat in current.items():
+            if self.known.get(path) == stat:
+                self.pending.pop(path, None)
+                continue
+            previous = self.pending.get(path)
+            if previous is None or previous[:2] != stat:
+                # Novo, alterado ou ainda sendo gravado: o prazo de estabilidade recomeça
+                self.pending[path] = stat + (now,)
+                if previous is None:
+                    counts["changed" if path in self.known else "new"] += 1
+
+        for path in list(self.pending):
+            if path not in current:
+                del self.pending[path]
+        self.deleted = self.known.keys() - current.keys()
+        counts["deleted"] = len(self.deleted)
+        return counts
+
+    def _settled(self, now: float) -> list:
+        """Pendentes sem mudança há settle segundos (pela varredura ou pelo mtime), mais antigos primeiro"""
+        ready = [
+            path for path, (_, mtime_ns, seen) in self.pending.items()
+            if now - seen >= self.settle or now - mtime_ns / 1e9 >= self.settle
+        ]
+        return sorted(ready, key=lambda path: self.pending[path][2])
+
+    def process(self) -> dict:
+        """Analisa até batch_size arquivos estáveis e aplica as remoções
+
+        Retorna a contagem de arquivos analisados, reaproveitados (mesmo
+        conteúdo já indexado), apenas tocados, removidos e ainda pendentes.
+        """
+        counts = {"analyzed": 0, "reused": 0, "touched": 0, "removed": 0, "pending": 0}
+        queue, digests = [], {}
+
+        for path in self._settled(time.time()):
+            if len(queue) >= self.batch_size:
+                break
+            size, mtime_ns, _ = self.pending.pop(path)
+            try:
+                digest = file_digest(path)
+            except OSError:
+                # Removido entre a varredura e o processamento
+                continue
+
+            if path in self.known and self.index.digest(path) == digest:
+                self.index.touch(path, size, mtime_ns)
+                self.known[path] = (size, mtime_ns)
+                counts["touched"] += 1
+                continue
+
+            record = self.index.find(digest)
+            if record is not None:
+                # Renomeado ou copiado: o conteúdo já foi analisado
+                record["file"] = path
+                self._store(path, size, mtime_ns, digest, record)
+                counts["reused"] += 1
+                continue
+
+            queue.append(path)
+            digests[path] = (size, mtime_ns, digest)
+
+        if queue:
+            from core.batch import BatchRunner
+
+            def store(record, summary):
+                size, mtime_ns, digest = digests[record["file"]]
+                self._store(record["file"], size, mtime_ns, digest, record)
+                counts["analyzed"] += 1
+
+            runner = BatchRunner(workers=min(self.workers, len(queue)), timeout=self.timeout,
+                                 cache_path=self.cache_path, mode=self.mode, features=self.features)
+            runner.run(queue, on_record=store)
+
+        # Remoções depois das análises: um arquivo movido ainda encontra o registro do caminho antigo
+        if self.deleted:
+            counts["removed"] = self.index.remove(self.deleted)
+            for path in self.deleted:
+                self.known.pop(path, None)
+            self.deleted = set()
+
+        counts["pending"] = len(self.pending)
+        return counts
+
+    def _store(self, path: str, size: int, mtime_ns: int, digest: str, record: dict):
+        self.index.put(path, size, mtime_ns, digest, record)
+        self.known[path] = (size, mtime_ns)
+        if self.on_record:
+            self.on_record(record)
+
+    def run(self, once: bool = False, on_cycle=None):
+        """Varre e processa em ciclos; once=True para depois do primeiro ciclo
+
+        on_cycle(scan, process) recebe as contagens de cada ciclo com alguma mudança.
+        """
+        observer = self._observe() if not once else None
+        try:
+            while not self._stopped.is_set():
+                scanned = self.scan()
+                processed = self.process()
+                changed = any(scanned.values()) or any(v for k, v in processed.items() if k != "pending")
+                if on_cycle and changed:
+                    on_cycle(scanned, processed)
+                if once:
+                    break
+                if self._settled(time.time()):
+                    # Ainda há arquivos prontos além do lote: segue sem esperar
+                    continue
+                self._wake.wait(self._next_wait())
+                self._wake.clear()
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def _next_wait(self) -> float:
+        """Espera até a próxima varredura: interval, ou menos se algum pendente estabiliza antes"""
+        if not self.pending:
+            return self.interval
+        soonest = min(seen for _, _, seen in self.pending.values()) + self.settle
+        return max(0.5, min(self.interval, soonest - time.time()))
+
+    def _observe(self):
+        """Eventos do sistema de arquivos (watchdog) antecipam a próxima varredura"""
+        if not WATCHDOG_AVAILABLE:
+            return None
+
+        wake = self._wake
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        observer = Observer()
+        for root in self.roots:
+            if os.path.isdir(root):
+                observer.schedule(Handler(), root, recursive=True)
+        observer.start()
+        return observer
+
+    def stop(self):
+        """Interrompe run() depois do ciclo em andamento"""
+        self._stopped.set()
+        self._wake.set()
@@ -0,0 +1,5 @@
+@echo off
+title Music-Makro Batch
+cd /d "%~dp0\.."
+call venv\Scripts\activate
+python app\music_makro_cli.py batch %*